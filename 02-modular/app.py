@@ -8,15 +8,17 @@ Mesma aplicação monolítica, mas com separação clara de responsabilidades:
 - Ainda é um monolito (deploy único, BD único)
 """
 
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from config import config
-from shared import init_db
+from shared import init_db, init_outbox, init_query_profiler
 
 # Importar blueprints dos módulos
 from modules.auth import auth_bp
 from modules.products import products_bp
 from modules.orders import orders_bp
 from modules.payment import payment_bp
+from modules.products.sweeper import init_hold_sweeper
+from modules.orders.archive import init_order_archiver
 
 
 def create_app(config_name='development'):
@@ -27,12 +29,24 @@ def create_app(config_name='development'):
     # Inicializar banco de dados
     init_db(app)
     
+    # Profiler de consultas (por blueprint/rota)
+    init_query_profiler(app)
+    
     # Registrar blueprints (módulos)
     app.register_blueprint(auth_bp)
     app.register_blueprint(products_bp)
     app.register_blueprint(orders_bp)
     app.register_blueprint(payment_bp)
     
+    # Relay do outbox (publica eventos de pedidos/pagamentos)
+    init_outbox(app)
+    
+    # Sweeper de reservas de estoque expiradas
+    init_hold_sweeper(app)
+    
+    # Arquivamento de pedidos antigos em partições mensais
+    init_order_archiver(app)
+    
     # Rota principal
     @app.route('/')
     def home():
@@ -71,6 +85,37 @@ def create_app(config_name='development'):
     def health():
         return jsonify({'status': 'healthy', 'architecture': 'modular'})
     
+    @app.route('/admin/outbox')
+    def outbox_metrics():
+        """Métricas do outbox (pendentes, lag de entrega)"""
+        return jsonify(app.extensions['outbox_relay'].get_metrics())
+    
+    @app.route('/admin/holds')
+    def hold_metrics():
+        """Reservas de estoque ativas e métricas do sweeper"""
+        return jsonify(app.extensions['hold_sweeper'].get_metrics())
+    
+    @app.route('/admin/archive', methods=['GET'])
+    def archive_metrics():
+        """Métricas do arquivamento de pedidos"""
+        return jsonify(app.extensions['order_archiver'].get_metrics())
+    
+    @app.route('/admin/archive/run', methods=['POST'])
+    def run_archive():
+        """Executa um ciclo de arquivamento imediatamente"""
+        archived = app.extensions['order_archiver'].archive_once()
+        return jsonify({'archived_orders': archived})
+    
+    @app.route('/admin/queries', methods=['GET'])
+    def query_report():
+        """Consultas por blueprint/rota, N+1 detectados e consultas lentas"""
+        profiler = app.extensions['query_profiler']
+        if request.args.get('reset') == '1':
+            report = profiler.get_report()
+            profiler.reset()
+            return jsonify(report)
+        return jsonify(profiler.get_report())
+    
     return app
 
 
@@ -149,4 +194,6 @@ if __name__ == '__main__':
     print("🚀 Servidor: http://localhost:5001")
     print("="*60 + "\n")
     
-    app.run(debug=True, port=5001)
+    # Sem reloader: o processo vigia do Werkzeug também chamaria create_app()
+    # e subiria um segundo relay do outbox, sweeper e arquivador no mesmo banco
+    app.run(debug=True, port=5001, use_reloader=False)
@@ -0,0 +1,98 @@
+"""
+ARQUITETURA MODULAR - Variante ASGI (async)
+===========================================
+Mesmos módulos (models e regras de negócio), servidos por handlers async:
+- Rotas async (Quart, API compatível com Flask)
+- SQLAlchemy async (aiosqlite local) em vez da sessão bloqueante
+- Uma requisição esperando I/O não prende uma thread
+
+A aplicação Flask (app.py) continua funcionando como antes. Aqui ela é
+criada apenas para inicializar o banco e rodar os workers em background
+(relay do outbox e sweeper de reservas), que seguem síncronos.
+
+Executar:
+    hypercorn asgi_app:app --bind 0.0.0.0:5002
+"""
+import asyncio
+
+from quart import Quart, jsonify
+
+from app import create_app
+from config import config
+from shared import db
+from shared.async_database import async_session, init_async_db
+
+from modules.auth.async_routes import auth_async_bp
+from modules.products.async_routes import products_async_bp
+from modules.orders.async_routes import orders_async_bp
+from modules.payment.async_routes import payment_async_bp
+
+
+def create_asgi_app(config_name='development'):
+    """Factory da aplicação ASGI"""
+    flask_app = create_app(config_name)
+    with flask_app.app_context():
+        # Mesmo arquivo/banco resolvido pelo Flask-SQLAlchemy
+        database_uri = db.engine.url.render_as_string(hide_password=False)
+
+    app = Quart(__name__)
+    app.config.from_object(config[config_name])
+    app.extensions['flask_app'] = flask_app
+
+    app.register_blueprint(auth_async_bp)
+    app.register_blueprint(products_async_bp)
+    app.register_blueprint(orders_async_bp)
+    app.register_blueprint(payment_async_bp)
+
+    @app.before_serving
+    async def startup():
+        app.extensions['async_engine'] = await init_async_db(database_uri)
+
+    @app.after_serving
+    async def shutdown():
+        await app.extensions['async_engine'].dispose()
+
+    @app.teardown_request
+    async def remove_session(exception=None):
+        # Devolve a conexão ao pool ao fim de cada requisição
+        await async_session.remove()
+
+    @app.route('/')
+    async def home():
+        return jsonify({
+            'message': 'E-commerce Modular - FIAP Demo',
+            'architecture': 'Modular Monolith (ASGI)',
+            'description': 'Mesmos módulos, handlers async e SQLAlchemy async'
+        })
+
+    @app.route('/health')
+    async def health():
+        return jsonify({'status': 'healthy', 'architecture': 'modular', 'server': 'asgi'})
+
+    @app.route('/admin/outbox')
+    async def outbox_metrics():
+        """Métricas do outbox (consulta síncrona fora do event loop)"""
+        relay = flask_app.extensions['outbox_relay']
+        return jsonify(await asyncio.to_thread(relay.get_metrics))
+
+    @app.route('/admin/holds')
+    async def hold_metrics():
+        """Reservas de estoque ativas e métricas do sweeper"""
+        sweeper = flask_app.extensions['hold_sweeper']
+        return jsonify(await asyncio.to_thread(sweeper.get_metrics))
+
+    return app
+
+
+app = create_asgi_app('development')
+
+
+if __name__ == '__main__':
+    print("\n" + "="*60)
+    print("⚡ ARQUITETURA MODULAR - Variante ASGI (async)")
+    print("="*60)
+    print("🚀 Servidor: http://localhost:5002")
+    print("   (produção: hypercorn asgi_app:app --bind 0.0.0.0:5002)")
+    print("="*60 + "\n")
+
+    app.run(port=5002)
@@ -0,0 +1,163 @@
+"""
+Benchmark - Flask (thread por requisição) x ASGI (tasks async)
+==============================================================
+Requisições chegam em ritmo constante; cada uma consulta o catálogo de
+produtos e depois espera I/O (ex: gateway de pagamento lento). Pela lei de
+Little, concorrência = taxa de chegada x espera, então o ritmo é ajustado
+para manter N requisições em andamento.
+Cada cenário roda em um subprocesso e mede o pico de memória residente
+extra; o resultado é a maior concorrência que cabe no orçamento de memória.
+
+Uso:
+    python benchmark_async.py [orcamento_mb] [espera_io_s]
+"""
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+LEVELS = [100, 250, 500, 1000, 2000, 4000, 8000]
+REQUESTS_PER_SLOT = 3  # total de requisições = concorrência x 3
+
+
+def pace(started, offset):
+    """Espera até o instante da próxima chegada"""
+    delay = started + offset - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+
+def rss_mb():
+    """Pico de memória residente do processo (MB)"""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+
+
+def prepare_app(db_path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['OUTBOX_RELAY_ENABLED'] = '0'
+    os.environ['HOLD_SWEEPER_ENABLED'] = '0'
+
+    from app import create_app, seed_database
+    app = create_app('production')
+    seed_database(app)
+    return app
+
+
+def run_sync(concurrency, io_wait, db_path):
+    """Uma thread por requisição (modelo do Flask/WSGI)"""
+    app = prepare_app(db_path)
+    from shared import db
+    from modules.products.services import ProductService
+
+    baseline = rss_mb()
+
+    def handle_request():
+        with app.app_context():
+            ProductService.get_all_products()
+            db.session.remove()
+        time.sleep(io_wait)  # thread presa esperando I/O
+
+    interval = io_wait / concurrency
+    started = time.perf_counter()
+    threads = []
+    for i in range(concurrency * REQUESTS_PER_SLOT):
+        thread = threading.Thread(target=handle_request)
+        thread.start()
+        threads.append(thread)
+        pace(started, (i + 1) * interval)
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    return rss_mb() - baseline, elapsed
+
+
+def run_async(concurrency, io_wait, db_path):
+    """Uma task por requisição (modelo ASGI)"""
+    app = prepare_app(db_path)
+    from shared import db
+    from shared.async_database import async_session, init_async_db
+    from modules.products.async_services import AsyncProductService
+
+    with app.app_context():
+        database_uri = db.engine.url.render_as_string(hide_password=False)
+
+    async def main():
+        engine = await init_async_db(database_uri)
+        baseline = rss_mb()
+
+        async def handle_request():
+            await AsyncProductService.get_all_products()
+            await async_session.remove()
+            await asyncio.sleep(io_wait)  # task suspensa, sem thread
+
+        interval = io_wait / concurrency
+        started = time.perf_counter()
+        tasks = []
+        for i in range(concurrency * REQUESTS_PER_SLOT):
+            tasks.append(asyncio.create_task(handle_request()))
+            delay = started + (i + 1) * interval - time.perf_counter()
+            await asyncio.sleep(max(0, delay))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+        await engine.dispose()
+        return rss_mb() - baseline, elapsed
+
+    return asyncio.run(main())
+
+
+def worker(mode, concurrency, io_wait):
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    runner = run_sync if mode == 'sync' else run_async
+    try:
+        memory, elapsed = runner(concurrency, io_wait, db_path)
+        print(json.dumps({'memory_mb': memory, 'elapsed': elapsed}))
+    except (RuntimeError, MemoryError) as exc:  # ex: limite de threads
+        print(json.dumps({'error': str(exc)}))
+
+
+def measure(mode, concurrency, io_wait):
+    output = subprocess.run(
+        [sys.executable, __file__, '--worker', mode, str(concurrency), str(io_wait)],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    lines = [l for l in output.stdout.splitlines() if l.startswith('{')]
+    return json.loads(lines[-1]) if lines else {'error': output.stderr.strip()[-200:]}
+
+
+def main(budget_mb=64.0, io_wait=2.0):
+    print(f"Orçamento de memória: {budget_mb:.0f} MB | Espera de I/O: {io_wait}s\n")
+    print(f"{'modo':<6} {'concorrência':>12} {'memória (MB)':>13} {'tempo (s)':>10} {'req/s':>8}")
+
+    best = {}
+    for mode in ('sync', 'async'):
+        for level in LEVELS:
+            result = measure(mode, level, io_wait)
+            if 'error' in result:
+                print(f"{mode:<6} {level:>12}   erro: {result['error']}")
+                break
+            print(f"{mode:<6} {level:>12} {result['memory_mb']:>13.1f} "
+                  f"{result['elapsed']:>10.2f} {level * REQUESTS_PER_SLOT / result['elapsed']:>8.0f}")
+            if result['memory_mb'] > budget_mb:
+                break
+            best[mode] = level
+
+    print()
+    for mode in ('sync', 'async'):
+        print(f"✅ {mode}: {best.get(mode, 0)} requisições simultâneas dentro de {budget_mb:.0f} MB")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        worker(sys.argv[2], int(sys.argv[3]), float(sys.argv[4]))
+    else:
+        args = [float(a) for a in sys.argv[1:3]]
+        main(*args)
@@ -8,6 +8,38 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'chave-secreta-modular'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///ecommerce_modular.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLITE_WAL = True  # leituras longas não bloqueiam escritas
+
+    # Outbox transacional (eventos de pedidos e pagamentos)
+    OUTBOX_RELAY_ENABLED = os.environ.get('OUTBOX_RELAY_ENABLED', '1') == '1'
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 1.0))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+    OUTBOX_FILE_PATH = os.environ.get('OUTBOX_FILE_PATH')  # ex: outbox_events.jsonl
+    OUTBOX_WEBHOOK_URL = os.environ.get('OUTBOX_WEBHOOK_URL')
+
+    # Reservas temporárias de estoque para pedidos pendentes
+    INVENTORY_HOLD_TTL = int(os.environ.get('INVENTORY_HOLD_TTL', 900))  # segundos
+    HOLD_SWEEPER_ENABLED = os.environ.get('HOLD_SWEEPER_ENABLED', '1') == '1'
+    HOLD_SWEEP_INTERVAL = float(os.environ.get('HOLD_SWEEP_INTERVAL', 5.0))
+    HOLD_SWEEP_BATCH_SIZE = int(os.environ.get('HOLD_SWEEP_BATCH_SIZE', 500))
+
+    # Exportação de pedidos: linhas lidas do cursor por lote
+    EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 5000))
+
+    # Arquivamento de pedidos finalizados (partições mensais em SQLite)
+    ORDER_ARCHIVER_ENABLED = os.environ.get('ORDER_ARCHIVER_ENABLED', '1') == '1'
+    ORDER_ARCHIVE_DIR = os.environ.get('ORDER_ARCHIVE_DIR')  # padrão: instance/archive
+    ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 90))
+    ORDER_ARCHIVE_BATCH_SIZE = int(os.environ.get('ORDER_ARCHIVE_BATCH_SIZE', 500))
+    ORDER_ARCHIVE_INTERVAL = float(os.environ.get('ORDER_ARCHIVE_INTERVAL', 3600))
+
+    # Profiler de consultas por requisição (N+1 e log de consultas lentas)
+    QUERY_PROFILER_ENABLED = os.environ.get('QUERY_PROFILER_ENABLED', '1') == '1'
+    QUERY_PROFILER_N_PLUS_ONE_THRESHOLD = int(os.environ.get('QUERY_PROFILER_N_PLUS_ONE_THRESHOLD', 5))
+    QUERY_PROFILER_SLOW_MS = float(os.environ.get('QUERY_PROFILER_SLOW_MS', 100.0))
+    QUERY_PROFILER_SLOW_SAMPLE_RATE = float(os.environ.get('QUERY_PROFILER_SLOW_SAMPLE_RATE', 1.0))
+    QUERY_PROFILER_SLOW_LOG_PATH = os.environ.get('QUERY_PROFILER_SLOW_LOG_PATH')  # ex: slow_queries.jsonl
 
 
 class DevelopmentConfig(Config):
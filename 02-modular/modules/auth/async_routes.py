@@ -0,0 +1,58 @@
+"""
+Módulo de Autenticação - Routes (variante async/ASGI)
+Responsabilidade: Endpoints HTTP de autenticação com handlers async
+"""
+from quart import Blueprint, request, jsonify
+from .async_services import AsyncAuthService
+
+auth_async_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
+
+
+@auth_async_bp.route('/register', methods=['POST'])
+async def register():
+    """Endpoint de registro de usuário"""
+    data = await request.get_json()
+
+    if not all(k in data for k in ['username', 'email', 'password']):
+        return jsonify({'error': 'Dados incompletos'}), 400
+
+    user, error = await AsyncAuthService.register_user(
+        data['username'],
+        data['email'],
+        data['password']
+    )
+
+    if error:
+        return jsonify({'error': error}), 400
+
+    return jsonify(user.to_dict()), 201
+
+
+@auth_async_bp.route('/login', methods=['POST'])
+async def login():
+    """Endpoint de login"""
+    data = await request.get_json()
+
+    if not all(k in data for k in ['username', 'password']):
+        return jsonify({'error': 'Dados incompletos'}), 400
+
+    user = await AsyncAuthService.authenticate(data['username'], data['password'])
+
+    if not user:
+        return jsonify({'error': 'Credenciais inválidas'}), 401
+
+    return jsonify({
+        **user.to_dict(),
+        'token': f'token-{user.id}'  # Simplificado para demo
+    })
+
+
+@auth_async_bp.route('/users/<int:user_id>', methods=['GET'])
+async def get_user(user_id):
+    """Endpoint para buscar usuário"""
+    user = await AsyncAuthService.get_user_by_id(user_id)
+
+    if not user:
+        return jsonify({'error': 'Usuário não encontrado'}), 404
+
+    return jsonify(user.to_dict())
@@ -0,0 +1,64 @@
+"""
+Módulo de Autenticação - Services (variante async)
+Responsabilidade: Lógica de negócio de autenticação sobre AsyncSession
+"""
+import asyncio
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from .models import User
+from shared.database import db
+from shared.async_database import async_session
+
+
+class AsyncAuthService:
+    """Serviço de autenticação (async)"""
+
+    @staticmethod
+    async def register_user(username, email, password):
+        """
+        Registra um novo usuário
+
+        Returns:
+            tuple: (User, error_message)
+        """
+        # Validar se usuário já existe
+        if await AsyncAuthService.get_user_by_username(username):
+            return None, "Usuário já existe"
+
+        if await async_session.scalar(db.select(User).where(User.email == email)):
+            return None, "Email já cadastrado"
+
+        # Hash de senha é CPU-bound: roda fora do event loop
+        user = User(username=username, email=email)
+        user.password_hash = await asyncio.to_thread(generate_password_hash, password)
+
+        async_session.add(user)
+        await async_session.commit()
+
+        return user, None
+
+    @staticmethod
+    async def authenticate(username, password):
+        """
+        Autentica um usuário
+
+        Returns:
+            User or None
+        """
+        user = await AsyncAuthService.get_user_by_username(username)
+
+        if user and await asyncio.to_thread(check_password_hash, user.password_hash, password):
+            return user
+
+        return None
+
+    @staticmethod
+    async def get_user_by_id(user_id):
+        """Busca usuário por ID"""
+        return await async_session.get(User, user_id)
+
+    @staticmethod
+    async def get_user_by_username(username):
+        """Busca usuário por username"""
+        return await async_session.scalar(db.select(User).where(User.username == username))
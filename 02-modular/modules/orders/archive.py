@@ -0,0 +1,356 @@
+"""
+Módulo de Pedidos - Arquivamento
+Responsabilidade: Mover pedidos antigos em estado final para armazenamento
+frio particionado por mês, mantendo as tabelas quentes pequenas
+
+Armazenamento frio: um arquivo SQLite por mês (orders_AAAA_MM.db) e um
+catálogo (catalog.db) que aponta pedido -> partição, para que leituras
+consultem apenas as partições necessárias.
+
+Ordem das operações por lote: grava no arquivo frio (idempotente) e só
+depois remove das tabelas quentes. Se o processo cair no meio, o pedido
+fica nos dois lugares e as leituras priorizam a cópia quente.
+"""
+import os
+import sqlite3
+import threading
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from .models import Order, OrderItem
+from modules.products.models import Product
+from shared.database import db
+
+TERMINAL_STATUSES = ('delivered', 'cancelled')
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+ExportRow = namedtuple('ExportRow', [
+    'order_id', 'user_id', 'status', 'order_total', 'created_at',
+    'item_id', 'product_id', 'product_name', 'quantity', 'price'
+])
+
+PARTITION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    total REAL NOT NULL,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    archived_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_orders_user_id ON orders (user_id);
+CREATE INDEX IF NOT EXISTS ix_orders_created_at ON orders (created_at);
+CREATE TABLE IF NOT EXISTS order_items (
+    id INTEGER PRIMARY KEY,
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    product_name TEXT,
+    quantity INTEGER NOT NULL,
+    price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_order_items_order_id ON order_items (order_id);
+"""
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_index (
+    order_id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    partition TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_order_index_user_id ON order_index (user_id);
+"""
+
+
+class ArchiveStore:
+    """Partições mensais de pedidos arquivados (arquivos SQLite)"""
+
+    def __init__(self, directory):
+        # Diretório e catálogo só são criados no primeiro arquivamento
+        self.directory = directory
+
+    @staticmethod
+    def partition_for(created_at):
+        """Nome da partição mensal de um pedido"""
+        return f"orders_{created_at.year:04d}_{created_at.month:02d}"
+
+    def _path(self, partition):
+        return os.path.join(self.directory, f"{partition}.db")
+
+    @contextmanager
+    def _connect(self, partition):
+        """Conexão curta: commit ao sair do bloco e fechamento garantido"""
+        conn = sqlite3.connect(self._path(partition), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _has_catalog(self):
+        return os.path.exists(self._path('catalog'))
+
+    def partitions(self):
+        """Partições existentes, em ordem cronológica"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[:-3] for name in os.listdir(self.directory)
+            if name.startswith('orders_') and name.endswith('.db')
+        )
+
+    def write_batch(self, orders):
+        """
+        Grava um lote de pedidos (dicts com 'items') nas partições
+        INSERT OR REPLACE: regravar o mesmo pedido é seguro
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        archived_at = datetime.utcnow().strftime(DATETIME_FORMAT)
+        by_partition = defaultdict(list)
+        for order in orders:
+            by_partition[self.partition_for(order['created_at'])].append(order)
+
+        for partition, partition_orders in by_partition.items():
+            with self._connect(partition) as conn:
+                conn.executescript(PARTITION_SCHEMA)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?)",
+                    [(o['id'], o['user_id'], o['total'], o['status'],
+                      o['created_at'].strftime(DATETIME_FORMAT), archived_at)
+                     for o in partition_orders]
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO order_items VALUES (?, ?, ?, ?, ?, ?)",
+                    [(i['id'], o['id'], i['product_id'], i['product_name'], i['quantity'], i['price'])
+                     for o in partition_orders for i in o['items']]
+                )
+
+        with self._connect('catalog') as conn:
+            conn.executescript(CATALOG_SCHEMA)
+            conn.executemany(
+                "INSERT OR REPLACE INTO order_index VALUES (?, ?, ?)",
+                [(o['id'], o['user_id'], self.partition_for(o['created_at'])) for o in orders]
+            )
+
+    def get_order(self, order_id):
+        """Pedido arquivado com itens (mesmo formato de Order.to_dict)"""
+        if not self._has_catalog():
+            return None
+
+        with self._connect('catalog') as conn:
+            entry = conn.execute(
+                "SELECT partition FROM order_index WHERE order_id = ?", (order_id,)
+            ).fetchone()
+        if not entry:
+            return None
+
+        with self._connect(entry['partition']) as conn:
+            order = conn.execute("SELECT * FROM orders WHERE id = ?", (order_id,)).fetchone()
+            items = conn.execute(
+                "SELECT * FROM order_items WHERE order_id = ? ORDER BY id", (order_id,)
+            ).fetchall()
+
+        result = self._order_dict(order, len(items))
+        result['items'] = [{
+            'id': item['id'],
+            'product_id': item['product_id'],
+            'product_name': item['product_name'] or 'N/A',
+            'quantity': item['quantity'],
+            'price': item['price'],
+            'subtotal': item['quantity'] * item['price']
+        } for item in items]
+        return result
+
+    def get_user_orders(self, user_id):
+        """Pedidos arquivados de um usuário (só as partições onde ele aparece)"""
+        if not self._has_catalog():
+            return []
+
+        with self._connect('catalog') as conn:
+            rows = conn.execute(
+                "SELECT partition, order_id FROM order_index WHERE user_id = ?", (user_id,)
+            ).fetchall()
+
+        by_partition = defaultdict(list)
+        for row in rows:
+            by_partition[row['partition']].append(row['order_id'])
+
+        result = []
+        for partition, order_ids in by_partition.items():
+            placeholders = ','.join('?' * len(order_ids))
+            with self._connect(partition) as conn:
+                orders = conn.execute(
+                    f"SELECT o.*, (SELECT COUNT(*) FROM order_items i WHERE i.order_id = o.id) AS items_count "
+                    f"FROM orders o WHERE o.id IN ({placeholders})", order_ids
+                ).fetchall()
+            result.extend(self._order_dict(o, o['items_count']) for o in orders)
+        return result
+
+    def iter_export_rows(self, start, end):
+        """Linhas (pedido + item) em [start, end), ordenadas por data"""
+        first, last = self.partition_for(start), self.partition_for(end - timedelta(microseconds=1))
+        for partition in self.partitions():
+            if not first <= partition <= last:
+                continue
+            with self._connect(partition) as conn:
+                cursor = conn.execute(
+                    "SELECT o.id, o.user_id, o.status, o.total, o.created_at, "
+                    "i.id, i.product_id, i.product_name, i.quantity, i.price "
+                    "FROM orders o JOIN order_items i ON i.order_id = o.id "
+                    "WHERE o.created_at >= ? AND o.created_at < ? "
+                    "ORDER BY o.created_at, o.id, i.id",
+                    (start.strftime(DATETIME_FORMAT), end.strftime(DATETIME_FORMAT))
+                )
+                for row in cursor:
+                    values = list(row)
+                    values[4] = datetime.strptime(values[4], DATETIME_FORMAT)
+                    yield ExportRow(*values)
+
+    @staticmethod
+    def _order_dict(row, items_count):
+        return {
+            'id': row['id'],
+            'user_id': row['user_id'],
+            'total': row['total'],
+            'status': row['status'],
+            'created_at': datetime.strptime(row['created_at'], DATETIME_FORMAT).isoformat(),
+            'items_count': items_count,
+            'archived': True
+        }
+
+
+class OrderArchiver:
+    """Move pedidos em estado final mais antigos que N dias para o arquivo"""
+
+    def __init__(self, app, store, after_days=90, batch_size=500, interval=3600.0):
+        self.app = app
+        self.store = store
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {'runs': 0, 'archived_orders': 0, 'batches': 0}
+        self._last_run_at = None
+
+    def start(self):
+        """Inicia a thread de arquivamento"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='order-archiver', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Para a thread de arquivamento"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.archive_once()
+            except Exception as exc:  # mantém a thread viva
+                print(f"⚠️  Order archiver: {exc}")
+
+    def archive_once(self):
+        """
+        Arquiva todos os pedidos elegíveis, em lotes de batch_size
+
+        Returns:
+            int: quantidade de pedidos arquivados
+        """
+        archived = 0
+        batches = 0
+        with self.app.app_context():
+            cutoff = datetime.utcnow() - timedelta(days=self.after_days)
+            while True:
+                orders = (Order.query
+                          .filter(Order.status.in_(TERMINAL_STATUSES),
+                                  Order.created_at < cutoff)
+                          .order_by(Order.created_at)
+                          .limit(self.batch_size)
+                          .all())
+                if not orders:
+                    break
+
+                order_ids = [o.id for o in orders]
+                items = (db.session.query(OrderItem, Product.name)
+                         .outerjoin(Product, Product.id == OrderItem.product_id)
+                         .filter(OrderItem.order_id.in_(order_ids))
+                         .all())
+                items_by_order = defaultdict(list)
+                for item, product_name in items:
+                    items_by_order[item.order_id].append({
+                        'id': item.id,
+                        'product_id': item.product_id,
+                        'product_name': product_name,
+                        'quantity': item.quantity,
+                        'price': item.price
+                    })
+
+                # 1) Grava no armazenamento frio  2) Remove das tabelas quentes
+                self.store.write_batch([{
+                    'id': o.id,
+                    'user_id': o.user_id,
+                    'total': o.total,
+                    'status': o.status,
+                    'created_at': o.created_at,
+                    'items': items_by_order[o.id]
+                } for o in orders])
+
+                OrderItem.query.filter(OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+                Order.query.filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+                db.session.commit()
+                db.session.expunge_all()
+
+                archived += len(orders)
+                batches += 1
+                if len(orders) < self.batch_size:
+                    break
+
+        with self._lock:
+            self._stats['runs'] += 1
+            self._stats['archived_orders'] += archived
+            self._stats['batches'] += batches
+            self._last_run_at = datetime.utcnow()
+
+        return archived
+
+    def get_metrics(self):
+        """Métricas do arquivamento e tamanho da base quente"""
+        with self.app.app_context():
+            hot_orders = db.session.scalar(db.select(db.func.count(Order.id)))
+
+        with self._lock:
+            return {
+                **self._stats,
+                'hot_orders': hot_orders,
+                'partitions': self.store.partitions(),
+                'after_days': self.after_days,
+                'running': bool(self._thread and self._thread.is_alive()),
+                'last_run_at': self._last_run_at.isoformat() if self._last_run_at else None
+            }
+
+
+def init_order_archiver(app):
+    """Cria o arquivador de pedidos e o registra na aplicação"""
+    directory = app.config.get('ORDER_ARCHIVE_DIR') or os.path.join(app.instance_path, 'archive')
+    archiver = OrderArchiver(
+        app,
+        ArchiveStore(directory),
+        after_days=app.config.get('ORDER_ARCHIVE_AFTER_DAYS', 90),
+        batch_size=app.config.get('ORDER_ARCHIVE_BATCH_SIZE', 500),
+        interval=app.config.get('ORDER_ARCHIVE_INTERVAL', 3600.0)
+    )
+    app.extensions['order_archiver'] = archiver
+
+    if app.config.get('ORDER_ARCHIVER_ENABLED'):
+        archiver.start()
+
+    return archiver
@@ -0,0 +1,73 @@
+"""
+Módulo de Pedidos - Routes (variante async/ASGI)
+Responsabilidade: Endpoints HTTP de pedidos com handlers async
+"""
+from quart import Blueprint, request, jsonify, current_app
+from .async_services import AsyncOrderService
+
+orders_async_bp = Blueprint('orders', __name__, url_prefix='/api/orders')
+
+
+@orders_async_bp.route('', methods=['POST'])
+async def create_order():
+    """Cria um novo pedido"""
+    data = await request.get_json()
+
+    if 'user_id' not in data or 'items' not in data:
+        return jsonify({'error': 'Dados incompletos'}), 400
+
+    order, error = await AsyncOrderService.create_order(
+        data['user_id'],
+        data['items'],
+        hold_ttl=current_app.config.get('INVENTORY_HOLD_TTL', 900)
+    )
+
+    if error:
+        return jsonify({'error': error}), 400
+
+    return jsonify(order.to_dict(include_items=True)), 201
+
+
+@orders_async_bp.route('/<int:order_id>', methods=['GET'])
+async def get_order(order_id):
+    """Busca um pedido específico"""
+    order = await AsyncOrderService.get_order(order_id)
+
+    if not order:
+        return jsonify({'error': 'Pedido não encontrado'}), 404
+
+    return jsonify(order.to_dict(include_items=True))
+
+
+@orders_async_bp.route('/user/<int:user_id>', methods=['GET'])
+async def get_user_orders(user_id):
+    """Lista pedidos de um usuário"""
+    orders = await AsyncOrderService.get_user_orders(user_id)
+    return jsonify([o.to_dict() for o in orders])
+
+
+@orders_async_bp.route('/<int:order_id>/status', methods=['PUT'])
+async def update_order_status(order_id):
+    """Atualiza status do pedido"""
+    data = await request.get_json()
+
+    if 'status' not in data:
+        return jsonify({'error': 'Status não informado'}), 400
+
+    order, error = await AsyncOrderService.update_order_status(order_id, data['status'])
+
+    if error:
+        return jsonify({'error': error}), 400
+
+    return jsonify(order.to_dict())
+
+
+@orders_async_bp.route('/<int:order_id>/cancel', methods=['POST'])
+async def cancel_order(order_id):
+    """Cancela um pedido"""
+    success, error = await AsyncOrderService.cancel_order(order_id)
+
+    if not success:
+        return jsonify({'error': error}), 400
+
+    return jsonify({'message': 'Pedido cancelado com sucesso'})
@@ -0,0 +1,192 @@
+"""
+Módulo de Pedidos - Services (variante async)
+Responsabilidade: Lógica de negócio de pedidos sobre AsyncSession
+"""
+from sqlalchemy.orm import selectinload
+
+from .models import Order, OrderItem
+from modules.products.async_services import AsyncProductService
+from modules.auth.async_services import AsyncAuthService
+from shared.database import db
+from shared.async_database import async_session
+from shared.outbox import record_event
+
+
+class AsyncOrderService:
+    """Serviço de pedidos (async)"""
+
+    VALID_STATUSES = ['pending', 'paid', 'processing', 'shipped', 'delivered', 'cancelled']
+
+    # Sem lazy loading em AsyncSession: itens e produtos vêm junto
+    LOAD_ITEMS = selectinload(Order.items).selectinload(OrderItem.product)
+
+    @staticmethod
+    async def create_order(user_id, items, hold_ttl=900):
+        """
+        Cria um novo pedido com reservas temporárias de estoque
+
+        Returns:
+            tuple: (Order, error_message)
+        """
+        user = await AsyncAuthService.get_user_by_id(user_id)
+        if not user:
+            return None, "Usuário não encontrado"
+
+        if not items or len(items) == 0:
+            return None, "Pedido deve conter ao menos um item"
+
+        total = 0
+        order_items = []
+
+        for item in items:
+            product = await AsyncProductService.get_product(item['product_id'])
+
+            if not product:
+                return None, f"Produto {item['product_id']} não encontrado"
+
+            quantity = item['quantity']
+
+            available, error = await AsyncProductService.check_availability(product.id, quantity)
+            if not available:
+                return None, error
+
+            total += product.price * quantity
+            order_items.append({
+                'product': product,
+                'quantity': quantity,
+                'price': product.price
+            })
+
+        # items=[]: coleção já carregada, sem lazy load após o flush
+        order = Order(user_id=user_id, total=total, status='pending', items=[])
+        async_session.add(order)
+        await async_session.flush()  # Para obter o ID do pedido
+
+        for item_data in order_items:
+            order.items.append(OrderItem(
+                product=item_data['product'],
+                quantity=item_data['quantity'],
+                price=item_data['price']
+            ))
+
+            hold, error = await AsyncProductService.hold_stock(
+                item_data['product'].id,
+                item_data['quantity'],
+                order.id,
+                hold_ttl
+            )
+
+            if not hold:
+                await async_session.rollback()
+                return None, error
+
+        record_event('order', order.id, 'order.created', {
+            'order_id': order.id,
+            'user_id': user_id,
+            'total': total,
+            'items': [
+                {'product_id': i['product'].id, 'quantity': i['quantity'], 'price': i['price']}
+                for i in order_items
+            ]
+        }, session=async_session)
+        await async_session.commit()
+        return order, None
+
+    @staticmethod
+    async def get_order(order_id):
+        """Busca pedido por ID (com itens)"""
+        return await async_session.scalar(
+            db.select(Order)
+            .where(Order.id == order_id)
+            .options(AsyncOrderService.LOAD_ITEMS)
+        )
+
+    @staticmethod
+    async def get_user_orders(user_id):
+        """Lista pedidos de um usuário"""
+        result = await async_session.scalars(
+            db.select(Order)
+            .where(Order.user_id == user_id)
+            .order_by(Order.created_at.desc())
+            .options(AsyncOrderService.LOAD_ITEMS)
+        )
+        return result.all()
+
+    @staticmethod
+    async def update_order_status(order_id, status):
+        """
+        Atualiza status do pedido (saindo de 'pending' converte reservas)
+        Sem volta para 'pending' nem saída de 'cancelled'; cancelar passa
+        por cancel_order.
+        """
+        valid_statuses = AsyncOrderService.VALID_STATUSES
+
+        if status not in valid_statuses:
+            return None, f"Status inválido. Use: {', '.join(valid_statuses)}"
+
+        order = await AsyncOrderService.get_order(order_id)
+
+        if not order:
+            return None, "Pedido não encontrado"
+
+        previous_status = order.status
+
+        if previous_status == 'cancelled' and status != 'cancelled':
+            return None, "Pedido cancelado não pode mudar de status"
+
+        if status == 'pending' and previous_status != 'pending':
+            return None, "Pedido não pode voltar para 'pending'"
+
+        if status == 'cancelled':
+            success, error = await AsyncOrderService.cancel_order(order.id)
+            if not success:
+                return None, error
+            return await AsyncOrderService.get_order(order.id), None
+
+        if previous_status == 'pending' and status != 'pending':
+            success, error = await AsyncProductService.convert_holds_to_sale(
+                order.id,
+                [(item.product_id, item.quantity) for item in order.items]
+            )
+            if not success:
+                await async_session.rollback()
+                return None, error
+
+        order.status = status
+        record_event('order', order.id, 'order.status_changed', {
+            'order_id': order.id,
+            'from': previous_status,
+            'to': status
+        }, session=async_session)
+        await async_session.commit()
+
+        return order, None
+
+    @staticmethod
+    async def cancel_order(order_id):
+        """Cancela um pedido e libera reservas ou devolve estoque"""
+        order = await AsyncOrderService.get_order(order_id)
+
+        if not order:
+            return False, "Pedido não encontrado"
+
+        if order.status in ['shipped', 'delivered']:
+            return False, "Não é possível cancelar pedido já enviado"
+
+        if order.status == 'cancelled':
+            return False, "Pedido já cancelado"
+
+        if order.status == 'pending':
+            await AsyncProductService.release_holds(order.id)
+        else:
+            for item in order.items:
+                await AsyncProductService.release_stock(item.product_id, item.quantity)
+
+        order.status = 'cancelled'
+        record_event('order', order.id, 'order.cancelled', {
+            'order_id': order.id,
+            'items': [{'product_id': i.product_id, 'quantity': i.quantity} for i in order.items]
+        }, session=async_session)
+        await async_session.commit()
+
+        return True, None
@@ -0,0 +1,132 @@
+"""
+Módulo de Pedidos - Exportação
+Responsabilidade: Serializar lotes de linhas de pedidos em streaming
+(CSV ou Parquet, opcionalmente gzip) sem montar o arquivo em memória
+"""
+import csv
+import io
+import zlib
+
+EXPORT_COLUMNS = [
+    'order_id', 'user_id', 'status', 'order_total', 'created_at',
+    'item_id', 'product_id', 'product_name', 'quantity', 'price', 'subtotal'
+]
+
+
+def _export_values(row):
+    """Valores de uma linha (pedido + item) na ordem de EXPORT_COLUMNS"""
+    return [
+        row.order_id, row.user_id, row.status, row.order_total,
+        row.created_at.isoformat(), row.item_id, row.product_id,
+        row.product_name, row.quantity, row.price, row.quantity * row.price
+    ]
+
+
+def stream_csv(chunks):
+    """Gera o CSV em pedaços de bytes, um por lote de linhas"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(EXPORT_COLUMNS)
+    for chunk in chunks:
+        writer.writerows(_export_values(row) for row in chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _DrainableSink(io.RawIOBase):
+    """Arquivo de escrita que acumula bytes até serem drenados"""
+
+    def __init__(self):
+        self._pending = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._pending.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._pending)
+        self._pending = []
+        return data
+
+
+def parquet_available():
+    """Parquet depende do pyarrow (dependência opcional)"""
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def stream_parquet(chunks):
+    """
+    Gera o Parquet em pedaços de bytes: cada lote de linhas vira um
+    row group colunar, escrito e liberado antes do próximo lote
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('order_id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('status', pa.string()),
+        ('order_total', pa.float64()),
+        ('created_at', pa.timestamp('us')),
+        ('item_id', pa.int64()),
+        ('product_id', pa.int64()),
+        ('product_name', pa.string()),
+        ('quantity', pa.int64()),
+        ('price', pa.float64()),
+        ('subtotal', pa.float64()),
+    ])
+
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+
+    for chunk in chunks:
+        columns = {name: [] for name in EXPORT_COLUMNS}
+        for row in chunk:
+            columns['order_id'].append(row.order_id)
+            columns['user_id'].append(row.user_id)
+            columns['status'].append(row.status)
+            columns['order_total'].append(row.order_total)
+            columns['created_at'].append(row.created_at)
+            columns['item_id'].append(row.item_id)
+            columns['product_id'].append(row.product_id)
+            columns['product_name'].append(row.product_name)
+            columns['quantity'].append(row.quantity)
+            columns['price'].append(row.price)
+            columns['subtotal'].append(row.quantity * row.price)
+
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        data = sink.drain()
+        if data:
+            yield data
+
+    writer.close()
+    yield sink.drain()
+
+
+def gzip_stream(byte_chunks, level=6):
+    """Comprime um stream de bytes em formato gzip, pedaço a pedaço"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    for data in byte_chunks:
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
@@ -11,13 +11,21 @@ class Order(db.Model):
     __tablename__ = 'orders'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     total = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(20), default='pending')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # exportação por período
     
     items = db.relationship('OrderItem', backref='order', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        # Seleção de pedidos em estado final para arquivamento
+        db.Index('ix_orders_status_created_at', 'status', 'created_at'),
+        # Ids nunca reaproveitados: sem AUTOINCREMENT o SQLite reusaria os ids
+        # mais altos depois que o arquivamento os apaga (colidindo com o frio)
+        {'sqlite_autoincrement': True},
+    )
+    
     def to_dict(self, include_items=False):
         """Converte para dicionário"""
         result = {
@@ -40,13 +48,15 @@ class OrderItem(db.Model):
     __tablename__ = 'order_items'
     
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
     
     product = db.relationship('Product', foreign_keys=[product_id])
     
+    __table_args__ = {'sqlite_autoincrement': True}  # idem Order (itens arquivados)
+    
     def to_dict(self):
         """Converte para dicionário"""
         return {
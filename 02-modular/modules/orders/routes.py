@@ -2,12 +2,25 @@
 Módulo de Pedidos - Routes
 Responsabilidade: Endpoints HTTP de pedidos
 """
-from flask import Blueprint, request, jsonify
+from datetime import date, datetime, time, timedelta
+
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from .services import OrderService
+from .export import gzip_stream, parquet_available, stream_csv, stream_parquet
 
 orders_bp = Blueprint('orders', __name__, url_prefix='/api/orders')
 
 
+def _flag(name):
+    """Query param booleano (1/true)"""
+    return request.args.get(name, '').lower() in ('1', 'true')
+
+
+def _include_archived():
+    """Leituras só consultam o armazenamento frio quando pedido"""
+    return _flag('include_archived')
+
+
 @orders_bp.route('', methods=['POST'])
 def create_order():
     """Cria um novo pedido"""
@@ -28,11 +41,69 @@ def create_order():
     return jsonify(order.to_dict(include_items=True)), 201
 
 
+@orders_bp.route('/export', methods=['GET'])
+def export_orders():
+    """
+    Exporta pedidos com itens de um período em streaming
+    
+    Query params:
+        start, end: datas ISO (YYYY-MM-DD), end inclusivo
+        format: csv (padrão) ou parquet
+        gzip: 1/true para comprimir o arquivo
+        include_archived: 1/true para incluir pedidos arquivados
+    """
+    try:
+        start = date.fromisoformat(request.args['start'])
+        end = date.fromisoformat(request.args['end'])
+    except KeyError:
+        return jsonify({'error': 'Informe start e end (YYYY-MM-DD)'}), 400
+    except ValueError:
+        return jsonify({'error': 'Datas inválidas, use YYYY-MM-DD'}), 400
+    
+    if end < start:
+        return jsonify({'error': 'end deve ser maior ou igual a start'}), 400
+    
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'parquet'):
+        return jsonify({'error': 'Formato inválido. Use: csv, parquet'}), 400
+    
+    if export_format == 'parquet' and not parquet_available():
+        return jsonify({'error': 'Exportação parquet requer o pacote pyarrow'}), 501
+    
+    chunks = OrderService.iter_export_chunks(
+        datetime.combine(start, time.min),
+        datetime.combine(end + timedelta(days=1), time.min),
+        chunk_size=current_app.config.get('EXPORT_CHUNK_SIZE', 5000),
+        include_archived=_include_archived()
+    )
+    
+    if export_format == 'csv':
+        body, mimetype = stream_csv(chunks), 'text/csv'
+    else:
+        body, mimetype = stream_parquet(chunks), 'application/vnd.apache.parquet'
+    
+    filename = f"orders_{start.isoformat()}_{end.isoformat()}.{export_format}"
+    if _flag('gzip'):
+        body, mimetype = gzip_stream(body), 'application/gzip'
+        filename += '.gz'
+    
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
 @orders_bp.route('/<int:order_id>', methods=['GET'])
 def get_order(order_id):
     """Busca um pedido específico"""
     order = OrderService.get_order(order_id)
     
+    if not order and _include_archived():
+        archived = OrderService.get_archived_order(order_id)
+        if archived:
+            return jsonify(archived)
+    
     if not order:
         return jsonify({'error': 'Pedido não encontrado'}), 404
     
@@ -41,7 +112,10 @@ def get_order(order_id):
 
 @orders_bp.route('/user/<int:user_id>', methods=['GET'])
 def get_user_orders(user_id):
-    """Lista pedidos de um usuário"""
+    """Lista pedidos de um usuário (?include_archived=1 inclui o arquivo)"""
+    if _include_archived():
+        return jsonify(OrderService.get_user_order_history(user_id))
+    
     orders = OrderService.get_user_orders(user_id)
     return jsonify([o.to_dict() for o in orders])
 
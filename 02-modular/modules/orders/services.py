@@ -2,10 +2,17 @@
 Módulo de Pedidos - Services
 Responsabilidade: Lógica de negócio de pedidos
 """
+import heapq
+from itertools import chain
+
+from flask import current_app
+
 from .models import Order, OrderItem
+from modules.products.models import Product
 from modules.products.services import ProductService
 from modules.auth.services import AuthService
 from shared.database import db
+from shared.outbox import record_event
 
 
 class OrderService:
@@ -64,7 +71,8 @@ class OrderService:
         db.session.add(order)
         db.session.flush()  # Para obter o ID do pedido
         
-        # Adicionar itens e reservar estoque
+        # Adicionar itens e criar reservas temporárias de estoque
+        # (a baixa definitiva acontece quando o pedido é pago)
         for item_data in order_items:
             order_item = OrderItem(
                 order_id=order.id,
@@ -74,16 +82,25 @@ class OrderService:
             )
             db.session.add(order_item)
             
-            # Reservar estoque
-            success, error = ProductService.reserve_stock(
+            hold, error = ProductService.hold_stock(
                 item_data['product'].id,
-                item_data['quantity']
+                item_data['quantity'],
+                order.id
             )
             
-            if not success:
+            if not hold:
                 db.session.rollback()
                 return None, error
         
+        record_event('order', order.id, 'order.created', {
+            'order_id': order.id,
+            'user_id': user_id,
+            'total': total,
+            'items': [
+                {'product_id': i['product'].id, 'quantity': i['quantity'], 'price': i['price']}
+                for i in order_items
+            ]
+        })
         db.session.commit()
         return order, None
     
@@ -97,9 +114,100 @@ class OrderService:
         """Lista pedidos de um usuário"""
         return Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
     
+    @staticmethod
+    def get_user_order_history(user_id):
+        """
+        Pedidos do usuário nas tabelas quentes e no arquivo (dicts),
+        mais recentes primeiro
+        """
+        orders = [o.to_dict() for o in OrderService.get_user_orders(user_id)]
+        hot_ids = {o['id'] for o in orders}
+        
+        archive = current_app.extensions['order_archiver'].store
+        orders.extend(o for o in archive.get_user_orders(user_id) if o['id'] not in hot_ids)
+        
+        return sorted(orders, key=lambda o: o['created_at'], reverse=True)
+    
+    @staticmethod
+    def get_archived_order(order_id):
+        """Busca pedido no armazenamento frio (dict com itens)"""
+        return current_app.extensions['order_archiver'].store.get_order(order_id)
+    
+    @staticmethod
+    def iter_export_chunks(start, end, chunk_size=5000, include_archived=False):
+        """
+        Gera lotes de linhas (pedido + item) criadas em [start, end)
+        
+        Lê de um cursor server-side em lotes de chunk_size, em conexão
+        própria (fora da sessão da requisição): a memória fica limitada a
+        um lote, independente do tamanho do período exportado.
+        
+        include_archived: intercala (merge ordenado por data) as linhas das
+        partições arquivadas do período
+        """
+        hot_chunks = OrderService._iter_hot_export_chunks(start, end, chunk_size)
+        
+        if not include_archived:
+            yield from hot_chunks
+            return
+        
+        archive = current_app.extensions['order_archiver'].store
+        rows = heapq.merge(
+            chain.from_iterable(hot_chunks),
+            archive.iter_export_rows(start, end),
+            key=lambda r: (r.created_at, r.order_id, r.item_id)
+        )
+        
+        chunk, last_key = [], None
+        for row in rows:
+            key = (row.order_id, row.item_id)
+            if key == last_key:
+                continue  # pedido nos dois lugares (arquivamento interrompido)
+            last_key = key
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    @staticmethod
+    def _iter_hot_export_chunks(start, end, chunk_size):
+        """Lotes de linhas das tabelas quentes (cursor server-side)"""
+        query = (db.select(
+                    Order.id.label('order_id'),
+                    Order.user_id,
+                    Order.status,
+                    Order.total.label('order_total'),
+                    Order.created_at,
+                    OrderItem.id.label('item_id'),
+                    OrderItem.product_id,
+                    Product.name.label('product_name'),
+                    OrderItem.quantity,
+                    OrderItem.price)
+                 .join(OrderItem, OrderItem.order_id == Order.id)
+                 .outerjoin(Product, Product.id == OrderItem.product_id)
+                 .where(Order.created_at >= start, Order.created_at < end)
+                 .order_by(Order.created_at, Order.id, OrderItem.id))
+        
+        with db.engine.connect() as conn:
+            result = conn.execution_options(
+                stream_results=True,
+                yield_per=chunk_size
+            ).execute(query)
+            
+            for chunk in result.partitions():
+                yield chunk
+    
     @staticmethod
     def update_order_status(order_id, status):
-        """Atualiza status do pedido"""
+        """
+        Atualiza status do pedido
+        Ao sair de 'pending' (exceto cancelamento), as reservas temporárias
+        de estoque viram baixa definitiva na mesma transação. Não há volta
+        para 'pending' nem saída de 'cancelled'; cancelar passa por
+        cancel_order (libera reservas ou devolve estoque).
+        """
         valid_statuses = ['pending', 'paid', 'processing', 'shipped', 'delivered', 'cancelled']
         
         if status not in valid_statuses:
@@ -110,7 +218,35 @@ class OrderService:
         if not order:
             return None, "Pedido não encontrado"
         
+        previous_status = order.status
+        
+        if previous_status == 'cancelled' and status != 'cancelled':
+            return None, "Pedido cancelado não pode mudar de status"
+        
+        if status == 'pending' and previous_status != 'pending':
+            return None, "Pedido não pode voltar para 'pending'"
+        
+        if status == 'cancelled':
+            success, error = OrderService.cancel_order(order.id)
+            if not success:
+                return None, error
+            return Order.query.get(order.id), None
+        
+        if previous_status == 'pending' and status != 'pending':
+            success, error = ProductService.convert_holds_to_sale(
+                order.id,
+                [(item.product_id, item.quantity) for item in order.items]
+            )
+            if not success:
+                db.session.rollback()
+                return None, error
+        
         order.status = status
+        record_event('order', order.id, 'order.status_changed', {
+            'order_id': order.id,
+            'from': previous_status,
+            'to': status
+        })
         db.session.commit()
         
         return order, None
@@ -126,13 +262,22 @@ class OrderService:
         if order.status in ['shipped', 'delivered']:
             return False, "Não é possível cancelar pedido já enviado"
         
-        # Devolver estoque
-        for item in order.items:
-            product = ProductService.get_product(item.product_id)
-            if product:
-                product.stock += item.quantity
+        if order.status == 'cancelled':
+            return False, "Pedido já cancelado"
+        
+        if order.status == 'pending':
+            # Pedido pendente só possui reservas temporárias
+            ProductService.release_holds(order.id)
+        else:
+            # Devolver estoque já baixado
+            for item in order.items:
+                ProductService.release_stock(item.product_id, item.quantity)
         
         order.status = 'cancelled'
+        record_event('order', order.id, 'order.cancelled', {
+            'order_id': order.id,
+            'items': [{'product_id': i.product_id, 'quantity': i.quantity} for i in order.items]
+        })
         db.session.commit()
         
         return True, None
@@ -0,0 +1,57 @@
+"""
+Módulo de Pagamento - Routes (variante async/ASGI)
+Responsabilidade: Endpoints HTTP de pagamento com handlers async
+"""
+from quart import Blueprint, request, jsonify
+from .async_services import AsyncPaymentService
+from .services import PaymentService
+
+payment_async_bp = Blueprint('payment', __name__, url_prefix='/api/payment')
+
+
+@payment_async_bp.route('/methods', methods=['GET'])
+async def get_payment_methods():
+    """Lista métodos de pagamento disponíveis"""
+    return jsonify(PaymentService.get_payment_methods())
+
+
+@payment_async_bp.route('/process', methods=['POST'])
+async def process_payment():
+    """Processa um pagamento"""
+    data = await request.get_json()
+
+    if 'order_id' not in data or 'payment_method' not in data:
+        return jsonify({'error': 'Dados incompletos'}), 400
+
+    success, message = await AsyncPaymentService.process_payment(
+        data['order_id'],
+        data['payment_method'],
+        data.get('payment_data')
+    )
+
+    if not success:
+        return jsonify({'error': message}), 400
+
+    return jsonify({
+        'success': True,
+        'message': message
+    })
+
+
+@payment_async_bp.route('/refund', methods=['POST'])
+async def refund_payment():
+    """Processa estorno de pagamento"""
+    data = await request.get_json()
+
+    if 'order_id' not in data:
+        return jsonify({'error': 'order_id não informado'}), 400
+
+    success, message = await AsyncPaymentService.refund_payment(data['order_id'])
+
+    if not success:
+        return jsonify({'error': message}), 400
+
+    return jsonify({
+        'success': True,
+        'message': message
+    })
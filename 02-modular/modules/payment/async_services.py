@@ -0,0 +1,79 @@
+"""
+Módulo de Pagamento - Services (variante async)
+Responsabilidade: Lógica de negócio de pagamentos sobre AsyncSession
+"""
+from .services import PaymentService
+from modules.orders.async_services import AsyncOrderService
+from shared.async_database import async_session
+from shared.outbox import record_event
+
+
+class AsyncPaymentService:
+    """Serviço de pagamento (async) - regras de validação do PaymentService"""
+
+    @staticmethod
+    async def process_payment(order_id, payment_method, payment_data=None):
+        """
+        Processa um pagamento
+
+        Returns:
+            tuple: (success, message)
+        """
+        if payment_method not in PaymentService.VALID_METHODS:
+            return False, f"Método inválido. Use: {', '.join(PaymentService.VALID_METHODS)}"
+
+        order = await AsyncOrderService.get_order(order_id)
+
+        if not order:
+            return False, "Pedido não encontrado"
+
+        if order.status == 'paid':
+            return False, "Pedido já foi pago"
+
+        if order.status == 'cancelled':
+            return False, "Pedido foi cancelado"
+
+        # Em produção: await no cliente HTTP do gateway de pagamento
+        success = PaymentService._simulate_payment(payment_method, order.total, payment_data)
+
+        if not success:
+            return False, "Pagamento recusado"
+
+        record_event('payment', order_id, 'payment.approved', {
+            'order_id': order_id,
+            'amount': order.total,
+            'payment_method': payment_method
+        }, session=async_session)
+
+        order, error = await AsyncOrderService.update_order_status(order_id, 'paid')
+        if error:
+            return False, error
+        return True, f"Pagamento aprovado via {payment_method}"
+
+    @staticmethod
+    async def refund_payment(order_id):
+        """
+        Processa estorno de pagamento
+
+        Returns:
+            tuple: (success, message)
+        """
+        order = await AsyncOrderService.get_order(order_id)
+
+        if not order:
+            return False, "Pedido não encontrado"
+
+        if order.status != 'paid':
+            return False, "Apenas pedidos pagos podem ser estornados"
+
+        record_event('payment', order_id, 'payment.refunded', {
+            'order_id': order_id,
+            'amount': order.total
+        }, session=async_session)
+
+        success, error = await AsyncOrderService.cancel_order(order_id)
+
+        if success:
+            return True, "Estorno processado com sucesso"
+
+        return False, error or "Erro ao processar estorno"
@@ -3,6 +3,7 @@ Módulo de Pagamento - Services
 Responsabilidade: Lógica de negócio de pagamentos
 """
 from modules.orders.services import OrderService
+from shared.outbox import record_event
 
 
 class PaymentService:
@@ -43,8 +44,16 @@ class PaymentService:
         success = PaymentService._simulate_payment(payment_method, order.total, payment_data)
         
         if success:
-            # Atualizar status do pedido
-            OrderService.update_order_status(order_id, 'paid')
+            # Evento gravado no mesmo commit que marca o pedido como pago
+            record_event('payment', order_id, 'payment.approved', {
+                'order_id': order_id,
+                'amount': order.total,
+                'payment_method': payment_method
+            })
+            # Atualizar status do pedido (converte reservas em venda)
+            order, error = OrderService.update_order_status(order_id, 'paid')
+            if error:
+                return False, error
             return True, f"Pagamento aprovado via {payment_method}"
         else:
             return False, "Pagamento recusado"
@@ -125,6 +134,12 @@ class PaymentService:
         # Simular estorno
         # Em produção: integração com gateway
         
+        # Evento gravado no mesmo commit do cancelamento
+        record_event('payment', order_id, 'payment.refunded', {
+            'order_id': order_id,
+            'amount': order.total
+        })
+        
         # Cancelar pedido e devolver estoque
         success, error = OrderService.cancel_order(order_id)
         
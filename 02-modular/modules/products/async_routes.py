@@ -0,0 +1,90 @@
+"""
+Módulo de Produtos - Routes (variante async/ASGI)
+Responsabilidade: Endpoints HTTP de produtos com handlers async
+"""
+from quart import Blueprint, request, jsonify
+from .async_services import AsyncProductService
+from .services import ProductService
+
+products_async_bp = Blueprint('products', __name__, url_prefix='/api/products')
+
+
+@products_async_bp.route('', methods=['GET'])
+async def get_products():
+    """Lista todos os produtos"""
+    products = await AsyncProductService.get_all_products()
+    return jsonify([p.to_dict() for p in products])
+
+
+@products_async_bp.route('/concurrency-stats', methods=['GET'])
+async def get_concurrency_stats():
+    """Conflitos e retries da reserva otimista de estoque"""
+    return jsonify(ProductService.get_concurrency_stats())
+
+
+@products_async_bp.route('/<int:product_id>', methods=['GET'])
+async def get_product(product_id):
+    """Busca um produto específico"""
+    product = await AsyncProductService.get_product(product_id)
+
+    if not product:
+        return jsonify({'error': 'Produto não encontrado'}), 404
+
+    return jsonify(product.to_dict())
+
+
+@products_async_bp.route('', methods=['POST'])
+async def create_product():
+    """Cria um novo produto"""
+    data = await request.get_json()
+
+    required_fields = ['name', 'price']
+    if not all(k in data for k in required_fields):
+        return jsonify({'error': 'Dados incompletos'}), 400
+
+    product = await AsyncProductService.create_product(
+        name=data['name'],
+        description=data.get('description', ''),
+        price=data['price'],
+        stock=data.get('stock', 0)
+    )
+
+    return jsonify(product.to_dict()), 201
+
+
+@products_async_bp.route('/<int:product_id>', methods=['PUT'])
+async def update_product(product_id):
+    """Atualiza um produto"""
+    data = await request.get_json()
+
+    product, error = await AsyncProductService.update_product(product_id, **data)
+
+    if error:
+        return jsonify({'error': error}), 404
+
+    return jsonify(product.to_dict())
+
+
+@products_async_bp.route('/<int:product_id>', methods=['DELETE'])
+async def delete_product(product_id):
+    """Remove um produto"""
+    success = await AsyncProductService.delete_product(product_id)
+
+    if not success:
+        return jsonify({'error': 'Produto não encontrado'}), 404
+
+    return jsonify({'message': 'Produto removido com sucesso'}), 200
+
+
+@products_async_bp.route('/<int:product_id>/availability', methods=['POST'])
+async def check_availability(product_id):
+    """Verifica disponibilidade de estoque"""
+    data = await request.get_json()
+    quantity = data.get('quantity', 1)
+
+    available, error = await AsyncProductService.check_availability(product_id, quantity)
+
+    if not available:
+        return jsonify({'available': False, 'error': error}), 400
+
+    return jsonify({'available': True})
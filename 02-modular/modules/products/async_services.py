@@ -0,0 +1,193 @@
+"""
+Módulo de Produtos - Services (variante async)
+Responsabilidade: Lógica de negócio de produtos sobre AsyncSession
+Mesmas regras do ProductService (compare-and-swap, reservas com TTL).
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from .models import Product, InventoryHold
+from .services import ProductService
+from shared.database import db
+from shared.async_database import async_session
+
+
+class AsyncProductService:
+    """Serviço de produtos (async)"""
+
+    @staticmethod
+    async def create_product(name, description, price, stock=0):
+        """Cria um novo produto"""
+        product = Product(
+            name=name,
+            description=description,
+            price=price,
+            stock=stock
+        )
+
+        async_session.add(product)
+        await async_session.commit()
+
+        return product
+
+    @staticmethod
+    async def get_all_products():
+        """Lista todos os produtos"""
+        return (await async_session.scalars(db.select(Product))).all()
+
+    @staticmethod
+    async def get_product(product_id):
+        """Busca produto por ID"""
+        return await async_session.get(Product, product_id)
+
+    @staticmethod
+    async def update_product(product_id, **kwargs):
+        """Atualiza um produto"""
+        product = await async_session.get(Product, product_id)
+
+        if not product:
+            return None, "Produto não encontrado"
+
+        for key, value in kwargs.items():
+            if hasattr(product, key):
+                setattr(product, key, value)
+
+        await async_session.commit()
+        return product, None
+
+    @staticmethod
+    async def delete_product(product_id):
+        """Remove um produto"""
+        product = await async_session.get(Product, product_id)
+
+        if not product:
+            return False
+
+        await async_session.delete(product)
+        await async_session.commit()
+        return True
+
+    @staticmethod
+    async def get_stock_snapshot(product_id):
+        """Estoque, versão e reservas ativas (uma consulta indexada)"""
+        result = await async_session.execute(ProductService.stock_snapshot_query(product_id))
+        return result.first()
+
+    @staticmethod
+    async def get_available_stock(product_id):
+        """Disponível = stock - reservas ativas (None se produto não existe)"""
+        snapshot = await AsyncProductService.get_stock_snapshot(product_id)
+        if snapshot is None:
+            return None
+        return snapshot.stock - snapshot.held
+
+    @staticmethod
+    async def check_availability(product_id, quantity):
+        """Verifica disponibilidade de estoque"""
+        available = await AsyncProductService.get_available_stock(product_id)
+
+        if available is None:
+            return False, "Produto não encontrado"
+
+        if available < quantity:
+            return False, f"Estoque insuficiente. Disponível: {available}"
+
+        return True, None
+
+    @staticmethod
+    async def reserve_stock(product_id, quantity):
+        """Reserva estoque de um produto (baixa definitiva)"""
+        success, error = await AsyncProductService._optimistic_update(
+            product_id, quantity, -quantity
+        )
+
+        if success:
+            await async_session.commit()
+
+        return success, error
+
+    @staticmethod
+    async def hold_stock(product_id, quantity, order_id, ttl_seconds):
+        """Cria uma reserva temporária para um pedido pendente (sem commit)"""
+        success, error = await AsyncProductService._optimistic_update(product_id, quantity, 0)
+
+        if not success:
+            return None, error
+
+        hold = InventoryHold(
+            product_id=product_id,
+            order_id=order_id,
+            quantity=quantity,
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        )
+        async_session.add(hold)
+        return hold, None
+
+    @staticmethod
+    async def convert_holds_to_sale(order_id, items):
+        """Converte as reservas de um pedido em baixa de estoque (sem commit)"""
+        now = datetime.utcnow()
+        active = defaultdict(list)
+        holds = await async_session.scalars(
+            db.select(InventoryHold).where(InventoryHold.order_id == order_id)
+        )
+        for hold in holds:
+            if hold.is_active(now):
+                active[hold.product_id].append(hold)
+
+        for product_id, quantity in items:
+            if active[product_id]:
+                active[product_id].pop()
+                await async_session.execute(Product.adjust_stock_statement(product_id, -quantity))
+                continue
+
+            success, error = await AsyncProductService._optimistic_update(
+                product_id, quantity, -quantity
+            )
+            if not success:
+                return False, f"Reserva do produto {product_id} expirou: {error}"
+
+        await AsyncProductService.release_holds(order_id)
+        return True, None
+
+    @staticmethod
+    async def release_holds(order_id):
+        """Remove as reservas de um pedido (sem commit)"""
+        result = await async_session.execute(
+            db.delete(InventoryHold).where(InventoryHold.order_id == order_id)
+        )
+        return result.rowcount
+
+    @staticmethod
+    async def release_stock(product_id, quantity):
+        """Devolve estoque (incremento atômico no banco, sem commit)"""
+        result = await async_session.execute(Product.adjust_stock_statement(product_id, quantity))
+        return result.rowcount == 1
+
+    @staticmethod
+    async def _optimistic_update(product_id, quantity, stock_delta):
+        """Loop de compare-and-swap com backoff; espera sem bloquear o loop"""
+        for attempt in range(ProductService.MAX_RESERVE_RETRIES):
+            snapshot = await AsyncProductService.get_stock_snapshot(product_id)
+
+            if snapshot is None:
+                return False, "Produto não encontrado"
+
+            if snapshot.stock - snapshot.held < quantity:
+                return False, "Estoque insuficiente"
+
+            result = await async_session.execute(
+                Product.compare_and_swap_statement(product_id, snapshot.version, stock_delta)
+            )
+            if result.rowcount == 1:
+                ProductService._record_stat('reservations')
+                if attempt:
+                    ProductService._record_stat('retries', attempt)
+                return True, None
+
+            ProductService._record_stat('conflicts')
+            await asyncio.sleep(ProductService.retry_delay(attempt))
+
+        ProductService._record_stat('exhausted')
+        return False, "Conflito de concorrência ao reservar estoque, tente novamente"
@@ -15,8 +15,12 @@ class Product(db.Model):
     description = db.Column(db.Text)
     price = db.Column(db.Float, nullable=False)
     stock = db.Column(db.Integer, default=0)
+    version = db.Column(db.Integer, nullable=False, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Concorrência otimista: todo UPDATE via ORM confere e incrementa a versão
+    __mapper_args__ = {'version_id_col': version}
+    
     def to_dict(self):
         """Converte para dicionário"""
         return {
@@ -25,6 +29,7 @@ class Product(db.Model):
             'description': self.description,
             'price': self.price,
             'stock': self.stock,
+            'version': self.version,
             'created_at': self.created_at.isoformat()
         }
     
@@ -33,8 +38,89 @@ class Product(db.Model):
         return self.stock >= quantity
     
     def decrease_stock(self, quantity):
-        """Diminui o estoque"""
-        if self.has_stock(quantity):
-            self.stock -= quantity
-            return True
-        return False
+        """
+        Diminui o estoque com compare-and-swap pela coluna version
+        
+        O UPDATE só é aplicado se a versão no banco ainda for a versão
+        carregada neste objeto. Não faz commit.
+        
+        Returns:
+            bool: True se atualizou; False se faltou estoque ou se outra
+            transação alterou o produto (conflito)
+        """
+        if not self.has_stock(quantity):
+            return False
+        
+        updated = Product.compare_and_swap(self.id, self.version, -quantity)
+        
+        # Valores em memória ficaram desatualizados
+        db.session.expire(self, ['stock', 'version'])
+        return updated
+    
+    @staticmethod
+    def compare_and_swap(product_id, expected_version, stock_delta=0):
+        """
+        UPDATE condicional: aplica stock_delta e incrementa a versão
+        somente se a versão no banco for expected_version. Não faz commit.
+        
+        Returns:
+            bool: True se a linha foi atualizada
+        """
+        result = db.session.execute(
+            Product.compare_and_swap_statement(product_id, expected_version, stock_delta)
+        )
+        return result.rowcount == 1
+    
+    @staticmethod
+    def adjust_stock(product_id, stock_delta):
+        """UPDATE incondicional do estoque (incremento atômico no banco)"""
+        result = db.session.execute(Product.adjust_stock_statement(product_id, stock_delta))
+        return result.rowcount == 1
+    
+    @staticmethod
+    def compare_and_swap_statement(product_id, expected_version, stock_delta=0):
+        """Statement do UPDATE condicional (compartilhado com a variante async)"""
+        return (db.update(Product)
+                .where(Product.id == product_id, Product.version == expected_version)
+                .values(stock=Product.stock + stock_delta, version=Product.version + 1))
+    
+    @staticmethod
+    def adjust_stock_statement(product_id, stock_delta):
+        """Statement do UPDATE incondicional (compartilhado com a variante async)"""
+        return (db.update(Product)
+                .where(Product.id == product_id)
+                .values(stock=Product.stock + stock_delta, version=Product.version + 1))
+
+
+class InventoryHold(db.Model):
+    """
+    Reserva temporária de estoque para um pedido pendente
+    Disponível = stock - soma das reservas não expiradas
+    """
+    __tablename__ = 'inventory_holds'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    order_id = db.Column(db.Integer, nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # varredura
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Cálculo de disponibilidade: soma por produto filtrando expiração
+        db.Index('ix_inventory_holds_product_expires', 'product_id', 'expires_at', 'quantity'),
+    )
+    
+    def is_active(self, now=None):
+        """Reserva ainda dentro do prazo"""
+        return self.expires_at > (now or datetime.utcnow())
+    
+    def to_dict(self):
+        """Converte para dicionário"""
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'order_id': self.order_id,
+            'quantity': self.quantity,
+            'expires_at': self.expires_at.isoformat()
+        }
@@ -15,6 +15,12 @@ def get_products():
     return jsonify([p.to_dict() for p in products])
 
 
+@products_bp.route('/concurrency-stats', methods=['GET'])
+def get_concurrency_stats():
+    """Conflitos e retries da reserva otimista de estoque"""
+    return jsonify(ProductService.get_concurrency_stats())
+
+
 @products_bp.route('/<int:product_id>', methods=['GET'])
 def get_product(product_id):
     """Busca um produto específico"""
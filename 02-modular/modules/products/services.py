@@ -2,13 +2,29 @@
 Módulo de Produtos - Services
 Responsabilidade: Lógica de negócio de produtos
 """
-from .models import Product
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from .models import Product, InventoryHold
 from shared.database import db
 
 
 class ProductService:
     """Serviço de produtos"""
     
+    # Retry da reserva otimista (compare-and-swap na coluna version)
+    MAX_RESERVE_RETRIES = 10
+    RETRY_BASE_DELAY = 0.001  # segundos
+    RETRY_MAX_DELAY = 0.05
+    
+    _stats_lock = threading.Lock()
+    _stats = {'reservations': 0, 'conflicts': 0, 'retries': 0, 'exhausted': 0}
+    
     @staticmethod
     def create_product(name, description, price, stock=0):
         """Cria um novo produto"""
@@ -61,29 +77,187 @@ class ProductService:
         db.session.commit()
         return True
     
+    @staticmethod
+    def get_stock_snapshot(product_id):
+        """
+        Estoque, versão e quantidade em reservas ativas do produto
+        Uma única consulta, coberta pelo índice (product_id, expires_at)
+        
+        Returns:
+            Row(stock, version, held) ou None
+        """
+        return db.session.execute(ProductService.stock_snapshot_query(product_id)).first()
+    
+    @staticmethod
+    def stock_snapshot_query(product_id):
+        """SELECT do snapshot de estoque (compartilhado com a variante async)"""
+        now = datetime.utcnow()
+        return (db.select(
+                    Product.stock,
+                    Product.version,
+                    db.func.coalesce(db.func.sum(InventoryHold.quantity), 0).label('held'))
+                .outerjoin(InventoryHold, db.and_(
+                    InventoryHold.product_id == Product.id,
+                    InventoryHold.expires_at > now))
+                .where(Product.id == product_id)
+                .group_by(Product.id, Product.stock, Product.version))
+    
+    @staticmethod
+    def get_available_stock(product_id):
+        """Disponível = stock - reservas ativas (None se produto não existe)"""
+        snapshot = ProductService.get_stock_snapshot(product_id)
+        if snapshot is None:
+            return None
+        return snapshot.stock - snapshot.held
+    
     @staticmethod
     def check_availability(product_id, quantity):
         """Verifica disponibilidade de estoque"""
-        product = Product.query.get(product_id)
+        available = ProductService.get_available_stock(product_id)
         
-        if not product:
+        if available is None:
             return False, "Produto não encontrado"
         
-        if not product.has_stock(quantity):
-            return False, f"Estoque insuficiente. Disponível: {product.stock}"
+        if available < quantity:
+            return False, f"Estoque insuficiente. Disponível: {available}"
         
         return True, None
     
     @staticmethod
     def reserve_stock(product_id, quantity):
-        """Reserva estoque de um produto"""
-        product = Product.query.get(product_id)
+        """
+        Reserva estoque de um produto (baixa definitiva)
         
-        if not product:
-            return False, "Produto não encontrado"
+        Usa concorrência otimista: lê estoque e versão, tenta o UPDATE
+        condicional e, em caso de conflito, repete com backoff exponencial
+        e jitter (limitado a MAX_RESERVE_RETRIES tentativas).
+        
+        Returns:
+            tuple: (success, error_message)
+        """
+        success, error = ProductService._optimistic_update(product_id, quantity, -quantity)
         
-        if product.decrease_stock(quantity):
+        if success:
             db.session.commit()
-            return True, None
         
-        return False, "Estoque insuficiente"
+        return success, error
+    
+    @staticmethod
+    def hold_stock(product_id, quantity, order_id, ttl_seconds=None):
+        """
+        Cria uma reserva temporária (hold) para um pedido pendente
+        O estoque não é baixado; a reserva apenas reduz o disponível até
+        expirar ou ser convertida em venda. Não faz commit.
+        
+        Returns:
+            tuple: (InventoryHold, error_message)
+        """
+        # Incrementar a versão sem mexer no estoque invalida leituras
+        # concorrentes do disponível, evitando reservas acima do estoque
+        success, error = ProductService._optimistic_update(product_id, quantity, 0)
+        
+        if not success:
+            return None, error
+        
+        if ttl_seconds is None:
+            ttl_seconds = current_app.config.get('INVENTORY_HOLD_TTL', 900)
+        
+        hold = InventoryHold(
+            product_id=product_id,
+            order_id=order_id,
+            quantity=quantity,
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds)
+        )
+        db.session.add(hold)
+        return hold, None
+    
+    @staticmethod
+    def convert_holds_to_sale(order_id, items):
+        """
+        Converte as reservas de um pedido em baixa definitiva de estoque
+        Reservas expiradas são refeitas se ainda houver estoque. Não faz commit.
+        
+        Args:
+            order_id: ID do pedido
+            items: Lista de tuplas (product_id, quantity)
+        
+        Returns:
+            tuple: (success, error_message)
+        """
+        now = datetime.utcnow()
+        active = defaultdict(list)
+        for hold in InventoryHold.query.filter_by(order_id=order_id).all():
+            if hold.is_active(now):
+                active[hold.product_id].append(hold)
+        
+        for product_id, quantity in items:
+            if active[product_id]:
+                # Unidades já reservadas: o disponível não muda
+                active[product_id].pop()
+                Product.adjust_stock(product_id, -quantity)
+                continue
+            
+            success, error = ProductService._optimistic_update(product_id, quantity, -quantity)
+            if not success:
+                return False, f"Reserva do produto {product_id} expirou: {error}"
+        
+        ProductService.release_holds(order_id)
+        return True, None
+    
+    @staticmethod
+    def release_holds(order_id):
+        """Remove as reservas de um pedido (sem commit)"""
+        return (InventoryHold.query
+                .filter_by(order_id=order_id)
+                .delete(synchronize_session=False))
+    
+    @staticmethod
+    def release_stock(product_id, quantity):
+        """Devolve estoque (incremento atômico no banco, sem commit)"""
+        return Product.adjust_stock(product_id, quantity)
+    
+    @staticmethod
+    def _optimistic_update(product_id, quantity, stock_delta):
+        """
+        Loop de compare-and-swap: confere o disponível e aplica
+        stock_delta se a versão lida ainda for a atual. Não faz commit.
+        """
+        for attempt in range(ProductService.MAX_RESERVE_RETRIES):
+            snapshot = ProductService.get_stock_snapshot(product_id)
+            
+            if snapshot is None:
+                return False, "Produto não encontrado"
+            
+            if snapshot.stock - snapshot.held < quantity:
+                return False, "Estoque insuficiente"
+            
+            if Product.compare_and_swap(product_id, snapshot.version, stock_delta):
+                ProductService._record_stat('reservations')
+                if attempt:
+                    ProductService._record_stat('retries', attempt)
+                return True, None
+            
+            # Outra transação alterou o produto entre a leitura e o UPDATE
+            ProductService._record_stat('conflicts')
+            time.sleep(ProductService.retry_delay(attempt))
+        
+        ProductService._record_stat('exhausted')
+        return False, "Conflito de concorrência ao reservar estoque, tente novamente"
+    
+    @staticmethod
+    def retry_delay(attempt):
+        """Backoff exponencial com jitter entre tentativas de compare-and-swap"""
+        delay = min(ProductService.RETRY_MAX_DELAY,
+                    ProductService.RETRY_BASE_DELAY * (2 ** attempt))
+        return random.uniform(0, delay)
+    
+    @staticmethod
+    def _record_stat(name, amount=1):
+        with ProductService._stats_lock:
+            ProductService._stats[name] += amount
+    
+    @staticmethod
+    def get_concurrency_stats():
+        """Contadores de conflitos e retries da reserva de estoque"""
+        with ProductService._stats_lock:
+            return dict(ProductService._stats)
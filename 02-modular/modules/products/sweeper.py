@@ -0,0 +1,117 @@
+"""
+Módulo de Produtos - Sweeper de reservas
+Responsabilidade: Remover em background as reservas de estoque expiradas
+"""
+import threading
+from datetime import datetime
+
+from .models import InventoryHold
+from shared.database import db
+
+
+class HoldSweeper:
+    """
+    Remove reservas expiradas em lotes
+    Cada lote é um único DELETE guiado pelo índice de expires_at, com
+    commit curto para não segurar o lock de escrita do banco.
+    """
+
+    def __init__(self, app, interval=5.0, batch_size=500):
+        self.app = app
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {'sweeps': 0, 'released': 0}
+        self._last_sweep_at = None
+
+    def start(self):
+        """Inicia a thread de varredura"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='hold-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Para a thread de varredura"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep_once()
+            except Exception as exc:  # mantém a thread viva
+                print(f"⚠️  Hold sweeper: {exc}")
+
+    def sweep_once(self):
+        """
+        Remove todas as reservas expiradas, em lotes de batch_size
+
+        Returns:
+            int: quantidade de reservas removidas
+        """
+        released = 0
+        with self.app.app_context():
+            now = datetime.utcnow()
+            while True:
+                expired_ids = (db.select(InventoryHold.id)
+                               .where(InventoryHold.expires_at <= now)
+                               .order_by(InventoryHold.expires_at)
+                               .limit(self.batch_size))
+                result = db.session.execute(
+                    db.delete(InventoryHold).where(InventoryHold.id.in_(expired_ids))
+                )
+                db.session.commit()
+
+                released += result.rowcount
+                if result.rowcount < self.batch_size:
+                    break
+
+        with self._lock:
+            self._stats['sweeps'] += 1
+            self._stats['released'] += released
+            self._last_sweep_at = now
+
+        return released
+
+    def get_metrics(self):
+        """Métricas do sweeper e reservas ativas"""
+        with self.app.app_context():
+            now = datetime.utcnow()
+            active = db.session.scalar(
+                db.select(db.func.count(InventoryHold.id))
+                .where(InventoryHold.expires_at > now)
+            )
+            expired = db.session.scalar(
+                db.select(db.func.count(InventoryHold.id))
+                .where(InventoryHold.expires_at <= now)
+            )
+
+        with self._lock:
+            return {
+                **self._stats,
+                'active_holds': active,
+                'expired_pending_sweep': expired,
+                'running': bool(self._thread and self._thread.is_alive()),
+                'last_sweep_at': self._last_sweep_at.isoformat() if self._last_sweep_at else None
+            }
+
+
+def init_hold_sweeper(app):
+    """Cria o sweeper de reservas e o registra na aplicação"""
+    sweeper = HoldSweeper(
+        app,
+        interval=app.config.get('HOLD_SWEEP_INTERVAL', 5.0),
+        batch_size=app.config.get('HOLD_SWEEP_BATCH_SIZE', 500)
+    )
+    app.extensions['hold_sweeper'] = sweeper
+
+    if app.config.get('HOLD_SWEEPER_ENABLED'):
+        sweeper.start()
+
+    return sweeper
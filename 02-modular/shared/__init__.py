@@ -1,4 +1,7 @@
 """Módulo compartilhado"""
 from .database import db, init_db
+from .outbox import OutboxEvent, record_event
+from .outbox_relay import init_outbox
+from .query_profiler import init_query_profiler
 
-__all__ = ['db', 'init_db']
+__all__ = ['db', 'init_db', 'OutboxEvent', 'record_event', 'init_outbox', 'init_query_profiler']
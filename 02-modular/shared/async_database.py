@@ -0,0 +1,49 @@
+"""
+Banco de dados assíncrono (variante ASGI)
+=========================================
+Engine async do SQLAlchemy sobre os MESMOS models (db.Model) da versão
+Flask. Localmente usa aiosqlite; em produção, asyncpg/aiomysql.
+
+A sessão é escopada por task do asyncio: cada requisição (ou task de
+benchmark) tem a sua, e deve chamar `await async_session.remove()` ao final.
+"""
+import asyncio
+
+from sqlalchemy.ext.asyncio import (
+    async_scoped_session,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from .database import db, upgrade_schema
+
+# Drivers async equivalentes aos drivers síncronos da DATABASE_URL
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+async_session = async_scoped_session(
+    async_sessionmaker(expire_on_commit=False),
+    scopefunc=asyncio.current_task
+)
+
+
+def to_async_url(database_uri):
+    """Converte a URL síncrona (sqlite:///...) para o driver async"""
+    scheme, sep, rest = database_uri.partition('://')
+    dialect = scheme.split('+')[0]
+    return f"{ASYNC_DRIVERS.get(dialect, scheme)}{sep}{rest}"
+
+
+async def init_async_db(database_uri, **engine_options):
+    """Cria a engine async, vincula a sessão e garante as tabelas"""
+    engine = create_async_engine(to_async_url(database_uri), **engine_options)
+    async_session.configure(bind=engine)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(db.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+
+    return engine
@@ -2,13 +2,61 @@
 Instância compartilhada do banco de dados
 """
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, inspect, text
 
 db = SQLAlchemy()
 
+# Colunas novas em tabelas que já existiam: create_all() só cria tabelas,
+# então bancos antigos (ex: ecommerce_modular.db) recebem a coluna aqui
+COLUMN_UPGRADES = (
+    ('products', 'version', 'INTEGER NOT NULL DEFAULT 1'),  # concorrência otimista
+)
+
 
 def init_db(app):
     """Inicializa o banco de dados com a aplicação"""
     db.init_app(app)
     
     with app.app_context():
+        if db.engine.dialect.name == 'sqlite' and app.config.get('SQLITE_WAL', True):
+            event.listen(db.engine, 'connect', _enable_sqlite_wal)
+        
         db.create_all()
+        with db.engine.begin() as connection:
+            upgrade_schema(connection)
+
+
+def upgrade_schema(connection):
+    """
+    Atualiza bancos criados por versões anteriores: ALTER TABLE para as
+    colunas de COLUMN_UPGRADES e criação dos índices que faltam (create_all
+    não mexe em tabela existente). Recebe uma Connection síncrona.
+    """
+    inspector = inspect(connection)
+    for table, column, ddl in COLUMN_UPGRADES:
+        if not inspector.has_table(table):
+            continue
+        if column not in {c['name'] for c in inspector.get_columns(table)}:
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+            print(f"🛠️  Banco atualizado: {table}.{column} adicionada")
+    
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+        if connection.dialect.name == 'sqlite' and table.dialect_options['sqlite']['autoincrement']:
+            ddl = connection.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' "
+                                          "AND name = :name"), {'name': table.name}).scalar()
+            if ddl and 'AUTOINCREMENT' not in ddl.upper():
+                # SQLite não altera a chave de uma tabela existente
+                print(f"⚠️  {table.name} criada sem AUTOINCREMENT: ids apagados podem ser "
+                      f"reaproveitados. Recrie o banco para corrigir.")
+
+
+def _enable_sqlite_wal(dbapi_connection, connection_record):
+    """
+    WAL: leituras longas (ex: exportação em streaming) não bloqueiam
+    escritas concorrentes, e escritas não bloqueiam leituras
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.close()
@@ -0,0 +1,62 @@
+"""
+Outbox transacional
+===================
+Eventos de domínio gravados na mesma transação que altera o estado
+(pedido, pagamento). Quem altera o estado apenas adiciona a linha na
+sessão; o commit do próprio serviço grava tudo de forma atômica.
+A entrega para fora do monolito fica a cargo do OutboxRelay.
+"""
+import json
+from datetime import datetime
+
+from .database import db
+
+
+class OutboxEvent(db.Model):
+    """Evento pendente de publicação"""
+    __tablename__ = 'outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    aggregate_type = db.Column(db.String(50), nullable=False)
+    aggregate_id = db.Column(db.Integer, nullable=False)
+    event_type = db.Column(db.String(80), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    published_at = db.Column(db.DateTime)
+
+    @property
+    def aggregate_key(self):
+        """Chave usada para garantir ordem por agregado"""
+        return f"{self.aggregate_type}:{self.aggregate_id}"
+
+    def to_dict(self):
+        """Converte para dicionário (formato entregue aos sinks)"""
+        return {
+            'id': self.id,
+            'aggregate_type': self.aggregate_type,
+            'aggregate_id': self.aggregate_id,
+            'event_type': self.event_type,
+            'payload': json.loads(self.payload),
+            'created_at': self.created_at.isoformat()
+        }
+
+
+def record_event(aggregate_type, aggregate_id, event_type, payload, session=None):
+    """
+    Adiciona um evento ao outbox na sessão corrente.
+    NÃO faz commit: o evento é gravado junto com a alteração de estado
+    quando o serviço chamador fizer db.session.commit().
+    
+    session: sessão alternativa (ex: AsyncSession da variante ASGI)
+    """
+    event = OutboxEvent(
+        aggregate_type=aggregate_type,
+        aggregate_id=aggregate_id,
+        event_type=event_type,
+        payload=json.dumps(payload, default=str)
+    )
+    (session or db.session).add(event)
+    return event
@@ -0,0 +1,260 @@
+"""
+Relay do Outbox
+===============
+Thread em background que lê o outbox em lotes e entrega os eventos
+aos sinks configurados (arquivo local, assinantes em processo, webhook).
+
+Garantias:
+- Entrega at-least-once (um evento pode ser reentregue após falha)
+- Ordem preservada por agregado: se um evento de um agregado falha,
+  os eventos seguintes do mesmo agregado esperam a próxima rodada
+- Eventos que falham OUTBOX_MAX_ATTEMPTS vezes vão para status 'failed'
+"""
+import json
+import threading
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime
+
+from .database import db
+from .outbox import OutboxEvent
+
+
+class FileSink:
+    """Grava eventos como JSON lines em um arquivo local"""
+
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def deliver(self, events):
+        lines = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in events)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+
+
+class InProcessSink:
+    """Entrega eventos para assinantes no mesmo processo"""
+
+    name = 'in_process'
+
+    def __init__(self):
+        self._subscribers = defaultdict(list)
+
+    def subscribe(self, event_type, callback):
+        """Assina um tipo de evento ('*' recebe todos)"""
+        self._subscribers[event_type].append(callback)
+
+    def deliver(self, events):
+        for event in events:
+            for callback in self._subscribers.get(event['event_type'], []):
+                callback(event)
+            for callback in self._subscribers.get('*', []):
+                callback(event)
+
+
+class WebhookSink:
+    """
+    Substituto de um webhook HTTP
+    Monta o corpo que seria enviado via POST e guarda os últimos envios
+    (em produção: requests.post(self.url, json=body))
+    """
+
+    name = 'webhook'
+
+    def __init__(self, url, history=100):
+        self.url = url
+        self.sent = deque(maxlen=history)
+
+    def deliver(self, events):
+        self.sent.append({
+            'url': self.url,
+            'body': {'events': events},
+            'sent_at': datetime.utcnow().isoformat()
+        })
+
+
+class OutboxRelay:
+    """Lê o outbox em lotes e publica nos sinks"""
+
+    def __init__(self, app, sinks=None, batch_size=100, poll_interval=1.0, max_attempts=5):
+        self.app = app
+        self.sinks = list(sinks or [])
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._lags = deque(maxlen=1000)
+        self._counters = {
+            'batches': 0,
+            'published': 0,
+            'failed_deliveries': 0,
+            'dead': 0
+        }
+        self._last_run_at = None
+
+    def add_sink(self, sink):
+        """Adiciona um sink de entrega"""
+        self.sinks.append(sink)
+
+    def start(self):
+        """Inicia a thread de relay"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='outbox-relay', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Para a thread de relay"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as exc:  # mantém a thread viva
+                print(f"⚠️  Outbox relay: {exc}")
+                processed = 0
+            # Lote cheio: provavelmente há mais eventos, não espera
+            if processed < self.batch_size:
+                self._stop.wait(self.poll_interval)
+
+    def run_once(self):
+        """
+        Processa um lote de eventos pendentes
+
+        Returns:
+            int: quantidade de eventos lidos do outbox
+        """
+        with self.app.app_context():
+            events = (OutboxEvent.query
+                      .filter_by(status='pending')
+                      .order_by(OutboxEvent.id)
+                      .limit(self.batch_size)
+                      .all())
+            if not events:
+                self._last_run_at = datetime.utcnow()
+                return 0
+
+            # Agrupar por agregado mantendo a ordem de gravação
+            groups = OrderedDict()
+            for event in events:
+                groups.setdefault(event.aggregate_key, []).append(event)
+
+            if self._deliver(events):
+                delivered, failed = events, {}
+            else:
+                # Falha no lote inteiro: tenta agregado por agregado para
+                # isolar o problema sem bloquear os demais
+                delivered, failed = [], {}
+                for key, group in groups.items():
+                    error = self._deliver(group, return_error=True)
+                    if error is True:
+                        delivered.extend(group)
+                    else:
+                        failed[key] = (group, error)
+
+            now = datetime.utcnow()
+            lags = [(now - e.created_at).total_seconds() for e in delivered]
+            if delivered:
+                OutboxEvent.query.filter(
+                    OutboxEvent.id.in_([e.id for e in delivered])
+                ).update({'status': 'published', 'published_at': now},
+                         synchronize_session=False)
+
+            dead = 0
+            for group, error in failed.values():
+                for event in group:
+                    event.attempts += 1
+                    event.last_error = str(error)
+                    if event.attempts >= self.max_attempts:
+                        event.status = 'failed'
+                        dead += 1
+
+            db.session.commit()
+
+            with self._lock:
+                self._counters['batches'] += 1
+                self._counters['published'] += len(delivered)
+                self._counters['failed_deliveries'] += sum(len(g) for g, _ in failed.values())
+                self._counters['dead'] += dead
+                self._lags.extend(lags)
+                self._last_run_at = now
+
+            return len(events)
+
+    def _deliver(self, events, return_error=False):
+        """Entrega para todos os sinks; True se todos aceitaram"""
+        payloads = [e.to_dict() for e in events]
+        for sink in self.sinks:
+            try:
+                sink.deliver(payloads)
+            except Exception as exc:
+                return exc if return_error else False
+        return True
+
+    def get_metrics(self):
+        """Métricas de entrega e atraso (lag)"""
+        with self.app.app_context():
+            pending = OutboxEvent.query.filter_by(status='pending').count()
+            oldest = (OutboxEvent.query
+                      .filter_by(status='pending')
+                      .order_by(OutboxEvent.id)
+                      .first())
+            oldest_age = ((datetime.utcnow() - oldest.created_at).total_seconds()
+                          if oldest else 0.0)
+
+        with self._lock:
+            lags = sorted(self._lags)
+            counters = dict(self._counters)
+            last_run_at = self._last_run_at
+
+        def percentile(p):
+            if not lags:
+                return 0.0
+            return lags[min(len(lags) - 1, int(len(lags) * p))]
+
+        return {
+            **counters,
+            'pending': pending,
+            'oldest_pending_age_seconds': oldest_age,
+            'lag_seconds': {
+                'p50': percentile(0.50),
+                'p99': percentile(0.99),
+                'max': lags[-1] if lags else 0.0
+            },
+            'sinks': [s.name for s in self.sinks],
+            'running': bool(self._thread and self._thread.is_alive()),
+            'last_run_at': last_run_at.isoformat() if last_run_at else None
+        }
+
+
+def init_outbox(app):
+    """Cria o relay com os sinks configurados e o registra na aplicação"""
+    sinks = [InProcessSink()]
+    if app.config.get('OUTBOX_FILE_PATH'):
+        sinks.append(FileSink(app.config['OUTBOX_FILE_PATH']))
+    if app.config.get('OUTBOX_WEBHOOK_URL'):
+        sinks.append(WebhookSink(app.config['OUTBOX_WEBHOOK_URL']))
+
+    relay = OutboxRelay(
+        app,
+        sinks=sinks,
+        batch_size=app.config.get('OUTBOX_BATCH_SIZE', 100),
+        poll_interval=app.config.get('OUTBOX_POLL_INTERVAL', 1.0),
+        max_attempts=app.config.get('OUTBOX_MAX_ATTEMPTS', 5)
+    )
+    app.extensions['outbox_relay'] = relay
+
+    if app.config.get('OUTBOX_RELAY_ENABLED'):
+        relay.start()
+
+    return relay
@@ -0,0 +1,243 @@
+"""
+Profiler de consultas por requisição
+====================================
+Eventos do SQLAlchemy atribuem cada statement ao blueprint e à rota da
+requisição corrente (ou a 'background' para threads como o relay do outbox).
+
+Por requisição: número de consultas, tempo total de banco e linhas
+(afetadas por DML + entidades carregadas pelo ORM). Detecta N+1 (mesmo
+formato de statement repetido mais de K vezes) e mantém um log amostrado
+de consultas lentas com os parâmetros mascarados.
+"""
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from .database import db
+
+_WHITESPACE = re.compile(r'\s+')
+_NUMBER = re.compile(r'\b\d+(\.\d+)?\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST = re.compile(r'\((\s*\?\s*,)+\s*\?\s*\)')
+
+
+def statement_shape(statement):
+    """Formato normalizado do SQL (literais e listas IN colapsados)"""
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    shape = _STRING.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    return _IN_LIST.sub('(?...)', shape)
+
+
+def redact_parameters(parameters):
+    """Troca valores por seus tipos: nada sensível vai para o log"""
+    if isinstance(parameters, dict):
+        return {key: f'<{type(value).__name__}>' for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [redact_parameters(p) if isinstance(p, (list, tuple, dict))
+                else f'<{type(p).__name__}>' for p in parameters]
+    return f'<{type(parameters).__name__}>'
+
+
+class _RouteStats:
+    """Agregado de uma rota (blueprint + regra + método)"""
+
+    __slots__ = ('requests', 'queries', 'db_time_ms', 'rows', 'max_queries', 'n_plus_one_requests')
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_time_ms = 0.0
+        self.rows = 0
+        self.max_queries = 0
+        self.n_plus_one_requests = 0
+
+    def to_dict(self):
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'queries': self.queries,
+            'db_time_ms': round(self.db_time_ms, 3),
+            'rows': self.rows,
+            'avg_queries_per_request': round(self.queries / requests, 2),
+            'avg_db_time_ms_per_request': round(self.db_time_ms / requests, 3),
+            'max_queries_per_request': self.max_queries,
+            'n_plus_one_requests': self.n_plus_one_requests
+        }
+
+
+class QueryProfiler:
+    """Coleta e agrega métricas de consultas por blueprint e rota"""
+
+    def __init__(self, n_plus_one_threshold=5, slow_query_ms=100.0,
+                 slow_sample_rate=1.0, slow_log_size=200, slow_log_path=None):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_query_ms = slow_query_ms
+        self.slow_sample_rate = slow_sample_rate
+        self.slow_log_path = slow_log_path
+
+        self._lock = threading.Lock()
+        self._routes = defaultdict(_RouteStats)
+        self._slow_queries = deque(maxlen=slow_log_size)
+        self._n_plus_one = deque(maxlen=100)
+
+    # Eventos do SQLAlchemy ------------------------------------------------
+
+    def attach(self, engine):
+        """Registra os eventos na engine e no carregamento de entidades"""
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(db.Model, 'load', self._on_load, propagate=True)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._profiler_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - context._profiler_started) * 1000
+        rows = cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else 0
+
+        if has_request_context() and 'query_profile' in g:
+            profile = g.query_profile
+            profile['queries'] += 1
+            profile['db_time_ms'] += elapsed_ms
+            profile['rows'] += rows
+            profile['shapes'][statement_shape(statement)] += 1
+            blueprint, route = profile['blueprint'], profile['route']
+        else:
+            blueprint, route = 'background', None
+            with self._lock:
+                stats = self._routes[(blueprint, None, None)]
+                stats.queries += 1
+                stats.db_time_ms += elapsed_ms
+                stats.rows += rows
+
+        if elapsed_ms >= self.slow_query_ms and random.random() < self.slow_sample_rate:
+            self._log_slow_query(statement, parameters, elapsed_ms, blueprint, route)
+
+    def _on_load(self, target, context):
+        if has_request_context() and 'query_profile' in g:
+            g.query_profile['rows'] += 1
+
+    # Ciclo da requisição --------------------------------------------------
+
+    def start_request(self):
+        rule = request.url_rule.rule if request.url_rule else request.path
+        g.query_profile = {
+            'blueprint': request.blueprint or 'app',
+            'route': f"{request.method} {rule}",
+            'method': request.method,
+            'rule': rule,
+            'queries': 0,
+            'db_time_ms': 0.0,
+            'rows': 0,
+            'shapes': Counter()
+        }
+
+    def finish_request(self, exception=None):
+        profile = g.pop('query_profile', None)
+        if profile is None:
+            return
+
+        repeated = {shape: count for shape, count in profile['shapes'].items()
+                    if count > self.n_plus_one_threshold}
+
+        with self._lock:
+            stats = self._routes[(profile['blueprint'], profile['rule'], profile['method'])]
+            stats.requests += 1
+            stats.queries += profile['queries']
+            stats.db_time_ms += profile['db_time_ms']
+            stats.rows += profile['rows']
+            stats.max_queries = max(stats.max_queries, profile['queries'])
+
+            if repeated:
+                stats.n_plus_one_requests += 1
+                for shape, count in repeated.items():
+                    self._n_plus_one.append({
+                        'blueprint': profile['blueprint'],
+                        'route': profile['route'],
+                        'statement': shape,
+                        'count': count,
+                        'detected_at': datetime.utcnow().isoformat()
+                    })
+
+    # Log de consultas lentas ---------------------------------------------
+
+    def _log_slow_query(self, statement, parameters, elapsed_ms, blueprint, route):
+        entry = {
+            'blueprint': blueprint,
+            'route': route,
+            'duration_ms': round(elapsed_ms, 3),
+            'statement': _WHITESPACE.sub(' ', statement).strip(),
+            'parameters': redact_parameters(parameters),
+            'logged_at': datetime.utcnow().isoformat()
+        }
+        with self._lock:
+            self._slow_queries.append(entry)
+            if self.slow_log_path:
+                with open(self.slow_log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    # Consulta ------------------------------------------------------------
+
+    def get_report(self):
+        """Agregados por blueprint e rota, N+1 recentes e consultas lentas"""
+        with self._lock:
+            routes = {key: stats.to_dict() for key, stats in self._routes.items()}
+            n_plus_one = list(self._n_plus_one)
+            slow_queries = list(self._slow_queries)
+
+        blueprints = defaultdict(lambda: {'requests': 0, 'queries': 0, 'db_time_ms': 0.0, 'rows': 0})
+        for (blueprint, _, _), stats in routes.items():
+            totals = blueprints[blueprint]
+            for field in ('requests', 'queries', 'db_time_ms', 'rows'):
+                totals[field] += stats[field]
+
+        return {
+            'blueprints': {name: {**t, 'db_time_ms': round(t['db_time_ms'], 3)}
+                           for name, t in blueprints.items()},
+            'routes': [
+                {'blueprint': blueprint, 'route': f"{method} {rule}" if rule else None, **stats}
+                for (blueprint, rule, method), stats in sorted(
+                    routes.items(), key=lambda item: item[1]['db_time_ms'], reverse=True)
+            ],
+            'n_plus_one': n_plus_one,
+            'slow_queries': slow_queries,
+            'settings': {
+                'n_plus_one_threshold': self.n_plus_one_threshold,
+                'slow_query_ms': self.slow_query_ms,
+                'slow_sample_rate': self.slow_sample_rate
+            }
+        }
+
+    def reset(self):
+        """Zera os agregados"""
+        with self._lock:
+            self._routes.clear()
+            self._slow_queries.clear()
+            self._n_plus_one.clear()
+
+
+def init_query_profiler(app):
+    """Cria o profiler e o conecta à engine e ao ciclo das requisições"""
+    profiler = QueryProfiler(
+        n_plus_one_threshold=app.config.get('QUERY_PROFILER_N_PLUS_ONE_THRESHOLD', 5),
+        slow_query_ms=app.config.get('QUERY_PROFILER_SLOW_MS', 100.0),
+        slow_sample_rate=app.config.get('QUERY_PROFILER_SLOW_SAMPLE_RATE', 1.0),
+        slow_log_path=app.config.get('QUERY_PROFILER_SLOW_LOG_PATH')
+    )
+    app.extensions['query_profiler'] = profiler
+
+    if app.config.get('QUERY_PROFILER_ENABLED'):
+        with app.app_context():
+            profiler.attach(db.engine)
+        app.before_request(profiler.start_request)
+        app.teardown_request(profiler.finish_request)
+
+    return profiler
@@ -0,0 +1,88 @@
+"""
+Stress de estoque - concorrência otimista
+=========================================
+Várias threads disputam as últimas unidades de um mesmo produto.
+Verifica que nunca há venda acima do estoque (oversell) e mostra
+throughput e contadores de conflito/retry da reserva.
+
+Uso:
+    python stress_stock.py [threads] [estoque]
+    python -m pytest tests/   (mesma verificação, automatizada)
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from app import create_app
+from config import DevelopmentConfig, config
+from shared import db
+
+
+class StressConfig(DevelopmentConfig):
+    """Banco temporário e timeout maior para o lock de escrita do SQLite"""
+    DEBUG = False
+    OUTBOX_RELAY_ENABLED = False
+    HOLD_SWEEPER_ENABLED = False
+    ORDER_ARCHIVER_ENABLED = False
+    SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+
+
+def run(threads=32, stock=200, verbose=True):
+    """Dispara a disputa; retorna vendidos, estoque final e contadores"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'stress.db')
+    StressConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+    config['stress'] = StressConfig
+
+    app = create_app('stress')
+
+    from modules.products.models import Product
+    from modules.products.services import ProductService
+
+    with app.app_context():
+        product_id = ProductService.create_product('Produto disputado', '', 10.0, stock).id
+
+    sold = [0] * threads
+    barrier = threading.Barrier(threads)
+
+    def buyer(index):
+        barrier.wait()
+        with app.app_context():
+            while True:
+                success, error = ProductService.reserve_stock(product_id, 1)
+                if success:
+                    sold[index] += 1
+                elif error == "Estoque insuficiente":
+                    return
+
+    workers = [threading.Thread(target=buyer, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        final_stock = db.session.get(Product, product_id).stock
+
+    stats = ProductService.get_concurrency_stats()
+    total_sold = sum(sold)
+
+    if verbose:
+        print(f"Threads: {threads} | Estoque inicial: {stock}")
+        print(f"Vendidos: {total_sold} | Estoque final: {final_stock}")
+        print(f"Tempo: {elapsed:.3f}s | Throughput: {total_sold / elapsed:.0f} reservas/s")
+        print(f"Contadores: {stats}")
+
+    assert final_stock >= 0, "Oversell: estoque negativo"
+    assert total_sold + final_stock == stock, "Atualização perdida"
+    if verbose:
+        print("✅ Nenhum oversell")
+    return {'sold': total_sold, 'final_stock': final_stock, 'stats': stats}
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,24 @@
+"""
+Concorrência otimista no estoque: threads disputando as últimas unidades
+nunca vendem acima do estoque (roda o stress_stock.py com asserções)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stress_stock  # noqa: E402
+
+
+def test_no_oversell_when_threads_exhaust_stock():
+    result = stress_stock.run(threads=16, stock=60, verbose=False)
+    
+    assert result['final_stock'] == 0
+    assert result['sold'] == 60
+
+
+def test_no_oversell_when_buyers_outnumber_units():
+    result = stress_stock.run(threads=24, stock=5, verbose=False)
+    
+    assert result['final_stock'] == 0
+    assert result['sold'] == 5
@@ -0,0 +1,441 @@
+"""
+Enterprise Service Bus (ESB) - Variante asyncio
+===============================================
+Mesmo contrato do MessageBus, mas com send_message assíncrono:
+- Uma mensagem esperando o serviço destino não prende uma thread
+- Semáforo por destino limita chamadas simultâneas a cada serviço
+- Fila de entrada limitada: quando saturada, rejeita ou faz o chamador
+  esperar (backpressure), em vez de acumular trabalho sem limite
+- Pool de conexões keep-alive (aiohttp) por instância; várias réplicas por
+  serviço, com o mesmo balanceamento do MessageBus (registry.ServiceRegistry)
+- Circuit breaker por destino e timeout adaptativo: com o breaker aberto a
+  mensagem falha antes de ocupar vaga no semáforo do serviço
+- Corpo no codec negociado com cada instância (codec.EnvelopeCodecs)
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import aiohttp
+
+try:
+    from .dispatch import (BATCH_ROUTES, OPERATION_ROUTES, DispatchError, DispatchTimeout,
+                           LatencyHistogram, resolve_route)
+    from .circuit_breaker import BreakerRegistry, CircuitOpenError, create_breakers_from_env
+    from .message_log import MessageLog, SegmentSpill
+    from .registry import POWER_OF_TWO, ServiceInstance, ServiceRegistry
+    from .transformer import ANY_OPERATION, TransformError, TransformerRegistry
+    from .codec import DEFAULT_PREFERENCE, CodecError, EnvelopeCodecs, accept_header
+except ImportError:  # executado como script
+    from dispatch import (BATCH_ROUTES, OPERATION_ROUTES, DispatchError, DispatchTimeout,
+                          LatencyHistogram, resolve_route)
+    from circuit_breaker import BreakerRegistry, CircuitOpenError, create_breakers_from_env
+    from message_log import MessageLog, SegmentSpill
+    from registry import POWER_OF_TWO, ServiceInstance, ServiceRegistry
+    from transformer import ANY_OPERATION, TransformError, TransformerRegistry
+    from codec import DEFAULT_PREFERENCE, CodecError, EnvelopeCodecs, accept_header
+
+
+class AsyncMessageBus:
+    """
+    Barramento de mensagens assíncrono
+
+    Fluxo: send_message -> fila de entrada (limitada) -> despachante ->
+    semáforo do destino -> HTTP. O despachante só retira uma mensagem da
+    fila quando há vaga em max_in_flight; com tudo ocupado a fila enche e
+    a política de backpressure entra em ação.
+    """
+
+    def __init__(self,
+                 max_in_flight: int = 1000,
+                 per_service_limit: int = 100,
+                 queue_size: int = 1000,
+                 backpressure: str = 'reject',
+                 queue_timeout: Optional[float] = None,
+                 pool_size: int = 100,
+                 default_timeout: float = 5.0,
+                 log_max_messages: int = 10000,
+                 log_max_bytes: int = 16 * 1024 * 1024,
+                 log_spill_dir: Optional[str] = None,
+                 breakers: Optional[BreakerRegistry] = None,
+                 load_balancing: str = POWER_OF_TWO,
+                 codecs: Sequence[str] = DEFAULT_PREFERENCE):
+        if backpressure not in ('reject', 'wait'):
+            raise ValueError("backpressure deve ser 'reject' ou 'wait'")
+
+        self.services = {}  # Registro de serviços
+        self.transformers = TransformerRegistry()  # (origem, destino, operação)
+        self.routes = dict(OPERATION_ROUTES)
+        self.batch_routes = dict(BATCH_ROUTES)
+        spill = SegmentSpill(log_spill_dir) if log_spill_dir else None
+        self.message_log = MessageLog(log_max_messages, log_max_bytes, spill)
+
+        self.max_in_flight = max_in_flight
+        self.per_service_limit = per_service_limit
+        self.queue_size = queue_size
+        self.backpressure = backpressure
+        self.queue_timeout = queue_timeout
+        self.pool_size = pool_size
+        self.default_timeout = default_timeout
+        self.breakers = breakers
+        self.registry = ServiceRegistry(load_balancing, on_remove=self._instance_removed,
+                                        codec_preference=codecs)
+        self.codecs = EnvelopeCodecs()
+
+        self._message_ids = itertools.count(1)
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._sessions: Dict[Tuple[str, str], aiohttp.ClientSession] = {}
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._active = 0
+        self._rejected = 0
+
+    # Ciclo de vida (precisa de um event loop rodando) ----------------------
+
+    async def start(self):
+        """Cria a fila de entrada e inicia o despachante"""
+        if self._dispatcher is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._in_flight = asyncio.Semaphore(self.max_in_flight)
+            self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def close(self):
+        """Para o despachante e fecha os pools de conexão"""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+
+    # Registro ------------------------------------------------------------
+
+    def register_service(self, service_name: str, endpoint: str,
+                         pool_size: Optional[int] = None,
+                         max_concurrency: Optional[int] = None,
+                         instance_id: Optional[str] = None,
+                         codecs: Optional[Sequence[str]] = None) -> str:
+        """
+        Registra uma instância do serviço (pool e semáforo são criados sob demanda)
+        Outro endpoint do mesmo serviço vira outra réplica; retorna o id da instância
+        codecs: formatos de corpo que a instância entende (padrão: só json)
+        """
+        instance = self.registry.add(service_name, endpoint, instance_id=instance_id, codecs=codecs)
+        entry = self.services.get(service_name) or {
+            'status': 'active',
+            'registered_at': datetime.utcnow().isoformat()
+        }
+        entry.update(pool_size=pool_size or entry.get('pool_size') or self.pool_size,
+                     max_concurrency=max_concurrency or entry.get('max_concurrency') or self.per_service_limit,
+                     endpoints=self.registry.endpoints(service_name))
+        self.services[service_name] = entry
+        self._semaphores.pop(service_name, None)
+        print(f"✅ Serviço registrado (async): {service_name} -> {endpoint} ({instance.id}, {instance.codec})")
+        return instance.id
+
+    def unregister_service(self, service_name: str, instance_id: Optional[str] = None):
+        """Remove uma instância do serviço (ou o serviço inteiro, sem instance_id)"""
+        if self.registry.remove(service_name, instance_id):
+            print(f"❌ Serviço removido: {service_name}" + (f" ({instance_id})" if instance_id else ""))
+
+    def drain_instance(self, service_name: str, instance_id: str, remove: bool = False) -> bool:
+        """Tira a instância da rotação; com remove=True sai quando a última requisição terminar"""
+        return self.registry.drain(service_name, instance_id, remove) is not None
+
+    def _instance_removed(self, instance: ServiceInstance):
+        session = self._sessions.pop((instance.service_name, instance.id), None)
+        if session:
+            asyncio.ensure_future(session.close())
+        entry = self.services.get(instance.service_name)
+        if entry is None:
+            return
+        entry['endpoints'] = self.registry.endpoints(instance.service_name)
+        if not entry['endpoints']:
+            del self.services[instance.service_name]
+            self._semaphores.pop(instance.service_name, None)
+
+    def register_route(self, service_name: str, operation: str, method: str,
+                       path: str, timeout: Optional[float] = None):
+        """Mapeia uma operação para uma rota HTTP do serviço"""
+        self.routes[(service_name, operation)] = (method.upper(), path, timeout)
+
+    def register_transformer(self, from_service: str, to_service: str, *transformers,
+                             operation: str = ANY_OPERATION) -> Callable:
+        """Registra um transformador (função ou spec) ou uma cadeia entre dois serviços"""
+        transformer = self.transformers.register(from_service, to_service, *transformers,
+                                                 operation=operation)
+        suffix = '' if operation == ANY_OPERATION else f" ({operation})"
+        print(f"🔄 Transformador registrado: {from_service}->{to_service}{suffix}")
+        return transformer
+
+    # Envio ---------------------------------------------------------------
+
+    async def send_message(self,
+                           from_service: str,
+                           to_service: str,
+                           operation: str,
+                           payload: Dict[Any, Any],
+                           transform: bool = True,
+                           correlation_id: Optional[str] = None) -> Dict[Any, Any]:
+        """
+        Envia mensagem de um serviço para outro através do ESB
+
+        Returns:
+            Resposta do serviço destino, ou {'error': ...} em caso de falha
+            ou rejeição por backpressure ('status': 'rejected')
+        """
+        if self._dispatcher is None:
+            await self.start()
+
+        message_id = f"msg-{next(self._message_ids)}"
+        message = {
+            'id': message_id,
+            'correlation_id': correlation_id or message_id,
+            'from': from_service,
+            'to': to_service,
+            'operation': operation,
+            'payload': payload,
+            'timestamp': datetime.utcnow().isoformat(),
+            'status': 'routing'
+        }
+        self.message_log.append(message)
+
+        if to_service not in self.services:
+            return self._fail(message, f"Serviço {to_service} não encontrado no ESB")
+
+        transformer = self.transformers.lookup(from_service, to_service, operation) if transform else None
+        if transformer:
+            try:
+                payload = transformer(payload)
+            except TransformError as exc:
+                return self._fail(message, f"Transformação recusou a mensagem: {exc}", status='invalid')
+
+        future = asyncio.get_running_loop().create_future()
+        item = (message, payload, future)
+
+        # Backpressure na fila de entrada
+        try:
+            if self.backpressure == 'reject':
+                self._queue.put_nowait(item)
+            else:
+                await asyncio.wait_for(self._queue.put(item), self.queue_timeout)
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            self._rejected += 1
+            return self._fail(message, 'ESB saturado, tente novamente', status='rejected')
+
+        return await future
+
+    def _fail(self, message: Dict[str, Any], error: str, status: str = 'error',
+              **extra) -> Dict[str, Any]:
+        message = {key: value for key, value in message.items() if key != 'payload'}
+        message.update(status=status, error=error, **extra)
+        self.message_log.append(message)
+        response = {'message_id': message['id'], 'error': error, **extra}
+        if status in ('rejected', 'circuit_open', 'invalid'):
+            response['status'] = status
+        return response
+
+    async def _dispatch_loop(self):
+        """Retira mensagens da fila enquanto houver vaga em max_in_flight"""
+        while True:
+            await self._in_flight.acquire()
+            item = await self._queue.get()
+            self._active += 1
+            task = asyncio.create_task(self._deliver(*item))
+            task.add_done_callback(self._delivery_done)
+
+    def _delivery_done(self, task: asyncio.Task):
+        self._active -= 1
+        self._in_flight.release()
+
+    async def _deliver(self, message: Dict[str, Any], payload: Dict[str, Any],
+                       future: asyncio.Future):
+        """Entrega uma mensagem; o future de quem enviou é sempre resolvido"""
+        try:
+            result = await self._attempt(message, payload)
+        except Exception as exc:
+            result = self._fail(message, f"Erro interno na entrega: {exc.__class__.__name__}: {exc}")
+        except BaseException:
+            if not future.done():
+                future.cancel()
+            raise
+        if not future.done():
+            future.set_result(result)
+
+    async def _attempt(self, message: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+        to_service, operation = message['to'], message['operation']
+
+        try:
+            method, path, timeout = resolve_route(self.routes, self.batch_routes,
+                                                  to_service, operation, payload)
+            timeout = timeout or self.default_timeout
+            if self.breakers:
+                timeout = self.breakers.before_call(to_service, operation, timeout)
+        except (CircuitOpenError, DispatchError) as exc:
+            status = 'circuit_open' if isinstance(exc, CircuitOpenError) else 'error'
+            return self._fail(message, str(exc), status=status)
+
+        semaphore = self._semaphores.get(to_service)
+        if semaphore is None:
+            limit = self.services.get(to_service, {}).get('max_concurrency', self.per_service_limit)
+            semaphore = self._semaphores[to_service] = asyncio.Semaphore(limit)
+
+        instance = None
+        started = time.perf_counter()
+        error = True
+        try:
+            async with semaphore:
+                instance = self.registry.acquire(to_service)
+                started = time.perf_counter()
+                if instance is None:
+                    raise DispatchError(f"Serviço {to_service} sem instância disponível")
+                status_code, body, wire = await self._call(instance, method, path, operation,
+                                                           payload, timeout)
+                error = status_code >= 500
+        except DispatchError as exc:
+            return self._fail(message, str(exc))
+        finally:
+            # Qualquer saída (inclusive exceção inesperada ou cancelamento)
+            # devolve a vaga da instância e a permissão do breaker
+            latency_ms = self._observe(to_service, operation, started, error=error)
+            if instance is not None:
+                self.registry.release(instance, error=error)
+            if self.breakers:
+                self.breakers.after_call(to_service, operation, latency_ms, error=error)
+
+        return self._result(message, status_code, body, latency_ms, wire)
+
+    def _result(self, message: Dict[str, Any], status_code: int, body: Any,
+                latency_ms: float, wire: Dict[str, Any]) -> Dict[str, Any]:
+        if status_code >= 400:
+            error_msg = body.get('error') if isinstance(body, dict) else None
+            return self._fail(message, error_msg or f"HTTP {status_code}",
+                              status_code=status_code, payload=body)
+
+        entry = {key: value for key, value in message.items() if key != 'payload'}
+        entry.update(status='delivered', status_code=status_code, latency_ms=round(latency_ms, 3),
+                     wire=wire)
+        self.message_log.append(entry)
+        return {
+            'message_id': message['id'],
+            'status': 'delivered',
+            'status_code': status_code,
+            'payload': body
+        }
+
+    async def _call(self, instance: ServiceInstance, method: str, path: str, operation: str,
+                    payload: Dict[str, Any], timeout: float) -> Tuple[int, Any, Dict[str, Any]]:
+        """(status HTTP, corpo, métricas do corpo) no codec negociado com a instância"""
+        session = self._session(instance)
+        url = instance.endpoint + path
+        if method == 'GET':
+            data, headers = None, {'Accept': accept_header(instance.codec)}
+            wire = {'codec': None, 'bytes_out': 0, 'encode_us': 0.0, 'reused': False}
+        else:
+            try:
+                data, headers, wire = self.codecs.encode(instance.codec, instance.service_name,
+                                                         operation, payload)
+            except CodecError as exc:
+                raise DispatchError(f"Payload de {operation} não serializável: {exc}")
+        try:
+            async with session.request(method, url, data=data, headers=headers,
+                                       timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                content = await response.read()
+                body = self.codecs.decode(content, response.headers.get('Content-Type'), wire)
+                return response.status, body, wire
+        except asyncio.TimeoutError:
+            raise DispatchTimeout(f"Timeout após {timeout}s em {url}")
+        except aiohttp.ClientError as exc:
+            raise DispatchError(f"Falha de conexão com {url}: {exc.__class__.__name__}")
+
+    def _session(self, instance: ServiceInstance) -> aiohttp.ClientSession:
+        """Pool keep-alive da instância (criado no event loop em uso)"""
+        key = (instance.service_name, instance.id)
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            pool_size = self.services.get(instance.service_name, {}).get('pool_size', self.pool_size)
+            connector = aiohttp.TCPConnector(limit=pool_size)
+            session = self._sessions[key] = aiohttp.ClientSession(connector=connector)
+        return session
+
+    def _observe(self, service_name: str, operation: str, started: float, error: bool) -> float:
+        latency_ms = (time.perf_counter() - started) * 1000
+        histogram = self._histograms.get((service_name, operation))
+        if histogram is None:
+            histogram = self._histograms[(service_name, operation)] = LatencyHistogram()
+        histogram.observe(latency_ms, error)
+        return latency_ms
+
+    # Monitoramento -------------------------------------------------------
+
+    def get_message_log(self, limit: int = 50, offset: int = 0) -> list:
+        """Retorna log de mensagens (monitoramento), só a janela pedida"""
+        return self.message_log.window(limit, offset)
+
+    def query_messages(self, filters: Optional[Dict[str, Any]] = None,
+                       cursor: Optional[int] = None, limit: int = 50,
+                       since: Optional[str] = None, until: Optional[str] = None):
+        """Consulta indexada do log (ver MessageLog.query): (entradas, próximo cursor)"""
+        return self.message_log.query(filters, cursor, limit, since, until)
+
+    def get_correlation(self, correlation_id: str) -> list:
+        """Todas as mensagens de um fluxo, em ordem cronológica"""
+        return self.message_log.by_correlation(correlation_id)
+
+    def get_service_status(self) -> Dict[str, Any]:
+        """Status dos serviços, fila de entrada e latências"""
+        latency: Dict[str, Dict[str, Any]] = {}
+        for (service_name, operation), histogram in self._histograms.items():
+            latency.setdefault(service_name, {})[operation] = histogram.to_dict()
+
+        return {
+            'services': dict(self.services),
+            'total_messages': self.message_log.total_logged,
+            'message_log': self.message_log.get_stats(),
+            'queue': {
+                'backpressure': self.backpressure,
+                'queued': self._queue.qsize() if self._queue else 0,
+                'capacity': self.queue_size,
+                'in_flight': self._active,
+                'max_in_flight': self.max_in_flight,
+                'rejected': self._rejected
+            },
+            'dispatch': {'instances': self.registry.get_status(), 'latency': latency},
+            'codecs': self.codecs.get_stats(),
+            'breakers': self.breakers.get_status() if self.breakers else None,
+            'transformers': self.transformers.keys()
+        }
+
+    def health_check(self) -> Dict[str, Any]:
+        """Verifica saúde do ESB"""
+        return {
+            'status': 'healthy',
+            'services_count': len(self.services),
+            'messages_processed': self.message_log.total_logged,
+            'uptime': 'active'
+        }
+
+
+def create_async_bus_from_env() -> AsyncMessageBus:
+    """ESB assíncrono configurado por variáveis de ambiente"""
+    return AsyncMessageBus(
+        max_in_flight=int(os.environ.get('ESB_MAX_IN_FLIGHT', 1000)),
+        per_service_limit=int(os.environ.get('ESB_PER_SERVICE_LIMIT', 100)),
+        queue_size=int(os.environ.get('ESB_QUEUE_SIZE', 1000)),
+        backpressure=os.environ.get('ESB_BACKPRESSURE', 'reject'),
+        queue_timeout=float(os.environ['ESB_QUEUE_TIMEOUT']) if os.environ.get('ESB_QUEUE_TIMEOUT') else None,
+        pool_size=int(os.environ.get('ESB_POOL_SIZE', 100)),
+        default_timeout=float(os.environ.get('ESB_DEFAULT_TIMEOUT', 5.0)),
+        load_balancing=os.environ.get('ESB_LOAD_BALANCING', POWER_OF_TWO),
+        codecs=os.environ.get('ESB_CODECS', ','.join(DEFAULT_PREFERENCE)).split(','),
+        log_max_messages=int(os.environ.get('ESB_LOG_MAX_MESSAGES', 10000)),
+        log_max_bytes=int(os.environ.get('ESB_LOG_MAX_BYTES', 16 * 1024 * 1024)),
+        log_spill_dir=os.environ.get('ESB_LOG_SPILL_DIR'),
+        breakers=create_breakers_from_env() if os.environ.get('ESB_CIRCUIT_BREAKERS', '1') == '1' else None
+    )
@@ -0,0 +1,254 @@
+"""
+Orquestrador de Serviços - Variante asyncio
+===========================================
+Mesmos fluxos do ServiceOrchestrator, sobre o AsyncMessageBus:
+cada passo aguarda o serviço sem prender uma thread
+"""
+
+import asyncio
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from .orchestrator import ServiceOrchestrator
+except ImportError:  # executado como script
+    from orchestrator import ServiceOrchestrator
+
+
+class AsyncServiceOrchestrator:
+    """Orquestrador que coordena chamadas via ESB assíncrono"""
+
+    _message = staticmethod(ServiceOrchestrator._message)
+    _succeeded = staticmethod(ServiceOrchestrator._succeeded)
+    _in_stock = staticmethod(ServiceOrchestrator._in_stock)
+    _stock_refusal = staticmethod(ServiceOrchestrator._stock_refusal)
+    _invalid_items = staticmethod(ServiceOrchestrator._invalid_items)
+
+    def __init__(self, esb_instance, deadline: float = 10.0):
+        self.esb = esb_instance
+        self.deadline = deadline  # prazo global de cada fan-out (segundos)
+
+    async def scatter_gather(self,
+                             calls: List[Tuple[Dict[str, Any], Callable[[Dict[str, Any]], bool]]],
+                             deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Envia mensagens independentes concorrentemente e agrega as respostas
+        (mesmo contrato de ServiceOrchestrator.scatter_gather); no primeiro
+        erro ou no prazo as tasks pendentes são canceladas
+        """
+        tasks = {asyncio.create_task(self.esb.send_message(**kwargs)): index
+                 for index, (kwargs, _) in enumerate(calls)}
+        results: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+        outcome = {'ok': True, 'results': results, 'failed_index': None, 'timed_out': False}
+        expires = time.monotonic() + (deadline or self.deadline)
+        pending = set(tasks)
+
+        try:
+            while pending:
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    outcome.update(ok=False, timed_out=True)
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = tasks[task]
+                    try:
+                        results[index] = task.result()
+                    except Exception as exc:
+                        results[index] = {'error': str(exc)}
+                    if not calls[index][1](results[index]) and outcome['ok']:
+                        outcome.update(ok=False, failed_index=index)
+                if not outcome['ok']:
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return outcome
+
+    @staticmethod
+    def _error(message: str, step: str, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Erro do passo; preserva a rejeição por backpressure do ESB"""
+        error = {'error': message, 'step': step}
+        if response.get('status') == 'rejected':
+            error['status'] = 'rejected'
+        return error
+
+    async def orchestrate_order_creation(self, user_id: int, items: list) -> Dict[str, Any]:
+        """
+        Orquestra o processo completo de criação de pedido:
+        1. Validar usuário (auth-service)
+        2. Validar produtos e estoque (product-service), concorrente com o passo 1
+        3. Criar pedido (order-service)
+        4. Processar pagamento (payment-service)
+        5. Atualizar estoque (product-service)
+        """
+        invalid = self._invalid_items(items)
+        if invalid:
+            return {'error': invalid, 'step': 'validation'}
+
+        # Todas as mensagens desta orquestração ficam sob o mesmo correlation_id
+        correlation_id = f"order-{uuid.uuid4().hex[:12]}"
+
+        # Passos 1 e 2: Validar usuário, produtos e estoque (concorrentemente)
+        validation = await self.scatter_gather(
+            [(self._message('auth-service', 'validate_user', {'user_id': user_id},
+                            correlation_id), self._succeeded)] +
+            [(self._message('product-service', 'check_stock', {'items': items},
+                            correlation_id), self._in_stock)]
+        )
+
+        if validation['timed_out']:
+            return {'error': 'Tempo esgotado na validação', 'step': 'validation'}
+        if not validation['ok']:
+            index = validation['failed_index']
+            response = validation['results'][index]
+            if index == 0:
+                return self._error('Usuário inválido', 'auth', response)
+            message, unavailable = self._stock_refusal(response, items)
+            error = self._error(message, 'products', response)
+            error['products'] = unavailable
+            return error
+
+        # Passo 3: Criar pedido
+        order_response = await self.esb.send_message(
+            from_service='orchestrator',
+            to_service='order-service',
+            operation='create_order',
+            payload={
+                'user_id': user_id,
+                'items': items,
+                'reserve_on_confirm': False  # estoque é baixado no passo 5
+            },
+            correlation_id=correlation_id
+        )
+
+        if 'error' in order_response:
+            return self._error('Erro ao criar pedido', 'order', order_response)
+
+        order_id = order_response['payload'].get('id')
+
+        # Passo 4: Processar pagamento
+        payment_response = await self.esb.send_message(
+            from_service='orchestrator',
+            to_service='payment-service',
+            operation='process_payment',
+            payload={
+                'order_id': order_id,
+                'payment_method': 'credit_card'
+            },
+            transform=True,
+            correlation_id=correlation_id
+        )
+
+        if 'error' in payment_response:
+            # Compensação: cancelar pedido
+            await self.esb.send_message(
+                from_service='orchestrator',
+                to_service='order-service',
+                operation='cancel_order',
+                payload={'order_id': order_id},
+                correlation_id=correlation_id
+            )
+            return self._error('Pagamento recusado', 'payment', payment_response)
+
+        total = payment_response['payload'].get('amount')
+
+        # Passo 5: Atualizar estoque (reserva do carrinho inteiro, tudo ou nada)
+        stock_response = await self.esb.send_message(
+            from_service='orchestrator',
+            to_service='product-service',
+            operation='decrease_stock',
+            payload={'items': items},
+            correlation_id=correlation_id
+        )
+
+        if 'error' in stock_response:
+            # Compensação: estornar pagamento e cancelar pedido
+            await self.esb.send_message(
+                from_service='orchestrator',
+                to_service='payment-service',
+                operation='refund',
+                payload={'order_id': order_id},
+                correlation_id=correlation_id
+            )
+            await self.esb.send_message(
+                from_service='orchestrator',
+                to_service='order-service',
+                operation='cancel_order',
+                payload={'order_id': order_id},
+                correlation_id=correlation_id
+            )
+            message, unavailable = self._stock_refusal(stock_response, items)
+            error = self._error(message, 'stock', stock_response)
+            error['products'] = unavailable
+            return error
+
+        return {
+            'success': True,
+            'order_id': order_id,
+            'total': total,
+            'status': 'completed',
+            'correlation_id': correlation_id
+        }
+
+    async def orchestrate_order_cancellation(self, order_id: int) -> Dict[str, Any]:
+        """
+        Orquestra o cancelamento de pedido:
+        1. Buscar pedido (order-service)
+        2. Processar estorno (payment-service)
+        3. Devolver estoque (product-service)
+        4. Cancelar pedido (order-service)
+        """
+        correlation_id = f"cancel-{uuid.uuid4().hex[:12]}"
+
+        # Passo 1: Buscar pedido
+        order_response = await self.esb.send_message(
+            from_service='orchestrator',
+            to_service='order-service',
+            operation='get_order',
+            payload={'order_id': order_id},
+            correlation_id=correlation_id
+        )
+
+        if 'error' in order_response:
+            return self._error('Pedido não encontrado', 'order', order_response)
+
+        order = order_response['payload']
+
+        # Passo 2: Processar estorno
+        await self.esb.send_message(
+            from_service='orchestrator',
+            to_service='payment-service',
+            operation='refund',
+            payload={'order_id': order_id},
+            correlation_id=correlation_id
+        )
+
+        # Passo 3: Devolver estoque (carrinho inteiro em uma mensagem)
+        if order.get('items'):
+            await self.esb.send_message(
+                from_service='orchestrator',
+                to_service='product-service',
+                operation='increase_stock',
+                payload={'items': order['items']},
+                correlation_id=correlation_id
+            )
+
+        # Passo 4: Cancelar pedido
+        await self.esb.send_message(
+            from_service='orchestrator',
+            to_service='order-service',
+            operation='cancel_order',
+            payload={'order_id': order_id},
+            correlation_id=correlation_id
+        )
+
+        return {
+            'success': True,
+            'order_id': order_id,
+            'status': 'cancelled',
+            'correlation_id': correlation_id
+        }
@@ -0,0 +1,113 @@
+"""
+Benchmark dos codecs de envelope
+================================
+Pedidos (create_order) com 10, 100 e 1000 itens em cada codec:
+1. Bytes no corpo e tempo de codificação/decodificação (só o codec)
+2. Roteamento completo pelo Dispatcher até um serviço HTTP local que
+   decodifica o corpo e responde o pedido de volta (no codec que o ESB aceita)
+
+Uso:
+    python bench_codecs.py [segundos por rodada]
+"""
+import sys
+import threading
+import time
+import timeit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from codec import (CODECS, MSGPACK_TYPE, OPERATION_SCHEMAS, SCHEMA_HEADER,
+                   codec_for_content_type, schema_for)
+from dispatch import Dispatcher
+
+PORT = 5950
+SIZES = (10, 100, 1000)
+SCHEMA = OPERATION_SCHEMAS[('order-service', 'create_order')]
+
+
+def order(items):
+    return {
+        'user_id': 42,
+        'items': [{'product_id': 1000 + i, 'quantity': 1 + i % 3} for i in range(items)],
+        'reserve_on_confirm': False,
+        'reservation_id': 'saga-5f3a9c1e2b7d:stock',
+        'idempotency_key': 'saga-5f3a9c1e2b7d:order'
+    }
+
+
+def start_service():
+    """Decodifica o corpo pelo Content-Type e devolve o pedido (msgpack se aceito)"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        wbufsize = 1 << 16  # cabeçalhos e corpo num só envio (sem esperar ACK atrasado)
+
+        def do_POST(self):
+            data = self.rfile.read(int(self.headers['Content-Length']))
+            codec = codec_for_content_type(self.headers['Content-Type'])
+            payload = codec.decode(data, schema_for(self.headers.get(SCHEMA_HEADER)))
+            reply = CODECS['msgpack'] if MSGPACK_TYPE in self.headers.get('Accept', '') \
+                else CODECS['json']
+            body = reply.encode({'id': 1, 'status': 'pending', **payload})
+            self.send_response(201)
+            self.send_header('Content-Type', reply.content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', PORT), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def codec_table():
+    print("📦 Só o codec (melhor de 5)")
+    print(f"   {'itens':>5} {'codec':>8} {'bytes':>8} {'encode':>10} {'decode':>10}")
+    for size in SIZES:
+        payload = order(size)
+        for name, codec in CODECS.items():
+            data = codec.encode(payload, SCHEMA)
+            assert codec.decode(data, SCHEMA) == payload
+            number = max(10, 20000 // size)
+            encode = min(timeit.repeat(lambda: codec.encode(payload, SCHEMA), number=number, repeat=5))
+            decode = min(timeit.repeat(lambda: codec.decode(data, SCHEMA), number=number, repeat=5))
+            print(f"   {size:>5} {name:>8} {len(data):>8} {encode / number * 1e6:>8.1f}µs "
+                  f"{decode / number * 1e6:>8.1f}µs")
+    print()
+
+
+def route_table(seconds):
+    print(f"🚌 Roteamento pelo Dispatcher até o serviço local ({seconds:.0f}s por rodada, 1 cliente)")
+    print(f"   {'itens':>5} {'codec':>8} {'req/s':>8} {'bytes ida':>10} {'bytes volta':>12}")
+    server = start_service()
+    for size in SIZES:
+        payload = order(size)
+        for name in CODECS:
+            dispatcher = Dispatcher(pool_size=1, codecs=(name,))
+            dispatcher.register_client('order-service', f'http://127.0.0.1:{PORT}', codecs=(name,))
+            done = 0
+            stop = time.perf_counter() + seconds
+            started = time.perf_counter()
+            while time.perf_counter() < stop:
+                status_code, body, _, wire = dispatcher.dispatch('order-service', 'create_order',
+                                                                 payload)
+                done += 1
+            elapsed = time.perf_counter() - started
+            assert status_code == 201 and body['items'] == payload['items']
+            dispatcher.remove_client('order-service')
+            print(f"   {size:>5} {name:>8} {done / elapsed:>8.0f} {wire['bytes_out']:>10} "
+                  f"{wire['bytes_in']:>12}")
+    server.shutdown()
+    server.server_close()
+
+
+def main(seconds=2.0):
+    codec_table()
+    route_table(seconds)
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0)
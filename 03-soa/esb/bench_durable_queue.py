@@ -0,0 +1,45 @@
+"""
+Benchmark das filas duráveis
+============================
+Enfileira N mensagens em lotes e depois consome com ack, num único
+processo; mede mensagens/s e quantos commits o SQLite precisou.
+
+Uso:
+    python bench_durable_queue.py [mensagens] [lote]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from durable_queue import DurableQueueBroker
+
+
+def main(messages=50000, batch=500):
+    path = os.path.join(tempfile.mkdtemp(prefix='esb-queue-bench-'), 'queues.db')
+    broker = DurableQueueBroker(path)
+
+    started = time.perf_counter()
+    for start in range(0, messages, batch):
+        broker.enqueue_many('bench', [{'n': n} for n in range(start, min(start + batch, messages))],
+                            sync=False)
+    broker.enqueue('bench', {'n': 'fim'}, sync=True)  # espera o último commit
+    enqueue_rate = (messages + 1) / (time.perf_counter() - started)
+    commits = broker.commits
+
+    started = time.perf_counter()
+    consumed = 0
+    while consumed <= messages:
+        for message in broker.receive('bench', max_messages=batch):
+            broker.ack('bench', message['id'], message['receipt'])
+            consumed += 1
+    consume_rate = consumed / (time.perf_counter() - started)
+
+    broker.close()
+    print(f"📥 enqueue:      {enqueue_rate:>10.0f} msg/s ({commits} commits)")
+    print(f"📤 receive+ack:  {consume_rate:>10.0f} msg/s ({broker.commits - commits} commits)")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:3]
+    main(int(args[0]) if args else 50000, int(args[1]) if len(args) > 1 else 500)
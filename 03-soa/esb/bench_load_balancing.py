@@ -0,0 +1,103 @@
+"""
+Benchmark do balanceamento entre réplicas
+=========================================
+Sobe N réplicas HTTP de um serviço fictício (cada uma atende no máximo
+`capacidade` requisições ao mesmo tempo, `servico_ms` por requisição) e
+dispara chamadas concorrentes pelo Dispatcher do ESB, para 1, 2, 4 e 8
+réplicas e cada estratégia. No cenário "heterogêneo" a primeira réplica é
+5x mais lenta: round-robin continua mandando 1/N do tráfego para ela,
+least_outstanding e power_of_two desviam.
+
+Uso:
+    python bench_load_balancing.py [segundos por rodada] [clientes]
+"""
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dispatch import Dispatcher
+from registry import STRATEGIES
+
+BASE_PORT = 5900
+SERVICE_MS = 20
+CAPACITY = 2
+
+
+def start_replica(port, service_ms):
+    slots = threading.Semaphore(CAPACITY)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            with slots:
+                time.sleep(service_ms / 1000)
+            body = b'{"ok": true}'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(replicas, strategy, seconds, clients, slow_first=False):
+    dispatcher = Dispatcher(pool_size=clients, strategy=strategy)
+    dispatcher.register_route('bench-service', 'ping', 'GET', '/')
+    servers = []
+    for i in range(replicas):
+        service_ms = SERVICE_MS * 5 if slow_first and i == 0 else SERVICE_MS
+        servers.append(start_replica(BASE_PORT + i, service_ms))
+        dispatcher.register_client('bench-service', f'http://127.0.0.1:{BASE_PORT + i}')
+
+    done = [0] * clients
+    stop = time.perf_counter() + seconds
+
+    def client(n):
+        while time.perf_counter() < stop:
+            dispatcher.dispatch('bench-service', 'ping', {})
+            done[n] += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    histogram = dispatcher.histograms[('bench-service', 'ping')]
+    dispatcher.remove_client('bench-service')
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    return sum(done) / elapsed, histogram.percentile(99)
+
+
+def main(seconds=2.0, clients=32):
+    ideal = 1000 / SERVICE_MS * CAPACITY
+    print(f"Réplica: {CAPACITY} requisições simultâneas x {SERVICE_MS}ms "
+          f"(máximo ~{ideal:.0f} req/s por réplica), {clients} clientes\n")
+    for scenario, slow_first in (('homogêneo', False), ('heterogêneo (1ª réplica 5x mais lenta)', True)):
+        print(f"📊 Cenário {scenario}")
+        print(f"   {'réplicas':>8} " + ''.join(f"{s:>26}" for s in STRATEGIES))
+        for replicas in (1, 2, 4, 8):
+            cells = []
+            for strategy in STRATEGIES:
+                rate, p99 = run(replicas, strategy, seconds, clients, slow_first)
+                cells.append(f"{rate:>9.0f} req/s p99 {p99:>5.0f}ms")
+            print(f"   {replicas:>8} " + ''.join(f"{c:>26}" for c in cells))
+        print()
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:3]
+    main(float(args[0]) if args else 2.0, int(args[1]) if len(args) > 1 else 32)
@@ -0,0 +1,140 @@
+"""
+Benchmark dos transformadores de mensagem
+=========================================
+Compara, por mensagem:
+- a função escrita à mão (montando o dict, como os transformadores antigos)
+- a spec declarativa compilada (transformer.compile_mapping)
+- a mesma spec interpretada a cada chamada (o que a compilação evita)
+e o custo de achar o transformador: chave f-string vs registro por tupla.
+
+Uso:
+    python bench_transformers.py [iterações]
+"""
+import sys
+import timeit
+
+from transformer import COERCERS, TransformerRegistry, compile_mapping
+
+
+# Transformadores escritos à mão (formato anterior do ESB) ----------------
+
+def transform_order_to_payment(payload):
+    return {
+        'transaction_id': payload.get('order_id'),
+        'amount': payload.get('total'),
+        'currency': 'BRL'
+    }
+
+
+def transform_order_to_invoice(payload):
+    customer = payload.get('customer')
+    address = customer.get('address') if isinstance(customer, dict) else None
+    total = payload.get('total')
+    items = payload.get('items_count')
+    return {
+        'invoice': {
+            'order': payload.get('order_id'),
+            'amount': float(total) if total is not None else None,
+            'items': int(items) if items is not None else 0
+        },
+        'customer_name': customer.get('name') if isinstance(customer, dict) else None,
+        'city': address.get('city') if isinstance(address, dict) else None,
+        'currency': 'BRL',
+        'source': 'order-service'
+    }
+
+
+# As mesmas transformações como spec ---------------------------------------
+
+ORDER_TO_PAYMENT = {
+    'transaction_id': 'order_id',
+    'amount': 'total',
+    'currency': {'const': 'BRL'}
+}
+
+ORDER_TO_INVOICE = {
+    'invoice.order': 'order_id',
+    'invoice.amount': {'from': 'total', 'type': 'float'},
+    'invoice.items': {'from': 'items_count', 'type': 'int', 'default': 0},
+    'customer_name': 'customer.name',
+    'city': 'customer.address.city',
+    'currency': {'const': 'BRL'},
+    'source': {'const': 'order-service'}
+}
+
+
+def interpret(spec, payload):
+    """Aplica a spec sem compilar: percorre as regras a cada mensagem"""
+    out = {}
+    for target, rule in spec.items():
+        if isinstance(rule, str):
+            rule = {'from': rule}
+        if 'const' in rule:
+            value = rule['const']
+        else:
+            value = payload
+            for key in rule['from'].split('.'):
+                value = value.get(key) if isinstance(value, dict) else None
+            if value is None:
+                value = rule.get('default')
+            elif 'type' in rule:
+                value = COERCERS[rule['type']](value, target)
+        node = out
+        *parents, leaf = target.split('.')
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = value
+    return out
+
+
+PAYLOAD = {
+    'order_id': 'ORD-1001',
+    'total': '259.90',
+    'items_count': '3',
+    'customer': {'name': 'Maria', 'address': {'city': 'Recife', 'zip': '50000-000'}},
+    'notes': 'entregar pela manhã'
+}
+
+
+def measure(label, function, iterations):
+    seconds = min(timeit.repeat(function, number=iterations, repeat=5))
+    per_call = seconds / iterations * 1e9
+    print(f"   {label:<34} {per_call:>8.0f} ns/mensagem")
+    return per_call
+
+
+def main(iterations=200_000):
+    print(f"📊 Transformadores ({iterations} mensagens por medida, melhor de 5)\n")
+    for name, hand_written, spec in (
+            ('order -> payment (3 campos)', transform_order_to_payment, ORDER_TO_PAYMENT),
+            ('order -> invoice (aninhado + tipos)', transform_order_to_invoice, ORDER_TO_INVOICE)):
+        compiled = compile_mapping(spec, name=name)
+        assert compiled(PAYLOAD) == interpret(spec, PAYLOAD)
+        print(f"🔄 {name}")
+        manual = measure('função escrita à mão', lambda: hand_written(PAYLOAD), iterations)
+        fast = measure('spec compilada', lambda: compiled(PAYLOAD), iterations)
+        slow = measure('spec interpretada', lambda: interpret(spec, PAYLOAD), iterations)
+        print(f"   compilada/à mão: {fast / manual:.2f}x   "
+              f"interpretada/compilada: {slow / fast:.1f}x\n")
+
+    print("🔎 Busca do transformador por mensagem")
+    by_string = {'order-service->payment-service': transform_order_to_payment}
+    registry = TransformerRegistry()
+    registry.register('order-service', 'payment-service', ORDER_TO_PAYMENT)
+    from_service, to_service = 'order-service', 'payment-service'
+
+    def string_key():
+        if f"{from_service}->{to_service}" in by_string:
+            return by_string[f"{from_service}->{to_service}"]
+
+    measure('chave f-string (anterior)', string_key, iterations)
+    measure('registro por tupla', lambda: registry.lookup(from_service, to_service, 'process_payment'),
+            iterations)
+    to_service = 'product-service'  # rota sem transformador (caso comum)
+    measure('f-string, rota sem transformador', string_key, iterations)
+    measure('tupla, rota sem transformador',
+            lambda: registry.lookup(from_service, to_service, 'get_product'), iterations)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,234 @@
+"""
+Circuit Breakers e Timeouts Adaptativos do ESB
+==============================================
+Um serviço lento ou fora do ar não deve prender os chamadores:
+- Breaker por serviço destino (closed -> open -> half-open -> closed),
+  acionado pela taxa de erro e pela taxa de chamadas lentas numa janela
+  deslizante de `window_seconds`
+- Aberto, o ESB falha na hora (CircuitOpenError) sem tocar a rede; depois
+  de `open_seconds` deixa passar algumas chamadas de teste (half-open)
+- Timeout por serviço/operação acompanha o p99 observado
+  (p99 x `p99_factor`), limitado pelo timeout configurado da rota
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from .dispatch import DispatchError
+except ImportError:  # executado como script
+    from dispatch import DispatchError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(DispatchError):
+    """Breaker aberto: a chamada foi recusada sem ir à rede"""
+
+
+class CircuitBreaker:
+    """Breaker de um serviço, com janela deslizante em buckets de 1 segundo"""
+
+    def __init__(self, name: str,
+                 window_seconds: int = 10,
+                 min_calls: int = 20,
+                 error_rate: float = 0.5,
+                 slow_call_ms: float = 2000.0,
+                 slow_rate: float = 0.8,
+                 open_seconds: float = 5.0,
+                 half_open_calls: int = 3):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_ms = slow_call_ms
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.times_opened = 0
+        self.rejected = 0
+        # [segundo, chamadas, erros, lentas] por posição da janela
+        self._buckets = [[0, 0, 0, 0] for _ in range(window_seconds)]
+        self._trial_permits = 0
+        self._trial_successes = 0
+
+    def _totals(self, now: float) -> Tuple[int, int, int]:
+        oldest = int(now) - self.window_seconds
+        calls = errors = slow = 0
+        for second, c, e, s in self._buckets:
+            if second > oldest:
+                calls += c
+                errors += e
+                slow += s
+        return calls, errors, slow
+
+    def allow(self, now: float) -> bool:
+        """Decide se a chamada pode seguir (em half-open, consome uma permissão de teste)"""
+        if self.state == OPEN:
+            if now - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._trial_permits = self.half_open_calls
+            self._trial_successes = 0
+        if self.state == HALF_OPEN:
+            if self._trial_permits <= 0:
+                self.rejected += 1
+                return False
+            self._trial_permits -= 1
+        return True
+
+    def record(self, now: float, latency_ms: float, error: bool):
+        slow = latency_ms >= self.slow_call_ms
+        if self.state == HALF_OPEN:
+            if error or slow:
+                self._open(now)
+            else:
+                self._trial_successes += 1
+                if self._trial_successes >= self.half_open_calls:
+                    self.state = CLOSED
+                    self._buckets = [[0, 0, 0, 0] for _ in range(self.window_seconds)]
+            return
+
+        second = int(now)
+        bucket = self._buckets[second % self.window_seconds]
+        if bucket[0] != second:
+            bucket[:] = [second, 0, 0, 0]
+        bucket[1] += 1
+        bucket[2] += error
+        bucket[3] += slow
+
+        if self.state == CLOSED:
+            calls, errors, slow_calls = self._totals(now)
+            if calls >= self.min_calls and (errors / calls >= self.error_rate or
+                                            slow_calls / calls >= self.slow_rate):
+                self._open(now)
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        print(f"⛔ Circuit breaker aberto: {self.name}")
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        calls, errors, slow = self._totals(now)
+        return {
+            'state': self.state,
+            'window': {
+                'calls': calls,
+                'error_rate': round(errors / calls, 4) if calls else 0.0,
+                'slow_rate': round(slow / calls, 4) if calls else 0.0
+            },
+            'opened_at': self.opened_at,
+            'times_opened': self.times_opened,
+            'rejected': self.rejected
+        }
+
+
+class AdaptiveTimeout:
+    """Timeout = p99 das últimas `samples` latências x fator, entre o mínimo e o teto da rota"""
+
+    def __init__(self, samples: int = 200, min_samples: int = 20, p99_factor: float = 2.0,
+                 min_timeout: float = 0.25, recompute_every: int = 10):
+        self.latencies = deque(maxlen=samples)
+        self.min_samples = min_samples
+        self.p99_factor = p99_factor
+        self.min_timeout = min_timeout
+        self.recompute_every = recompute_every
+        self.p99_ms: Optional[float] = None
+        self.last_timeout: Optional[float] = None
+        self._since_recompute = 0
+
+    def observe(self, latency_ms: float):
+        self.latencies.append(latency_ms)
+        self._since_recompute += 1
+        if len(self.latencies) >= self.min_samples and self._since_recompute >= self.recompute_every:
+            ordered = sorted(self.latencies)
+            self.p99_ms = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+            self._since_recompute = 0
+
+    def timeout(self, ceiling: float) -> float:
+        if self.p99_ms is None:
+            self.last_timeout = ceiling
+        else:
+            self.last_timeout = max(self.min_timeout,
+                                    min(ceiling, self.p99_ms * self.p99_factor / 1000))
+        return self.last_timeout
+
+
+class BreakerRegistry:
+    """Breakers por serviço e timeouts adaptativos por serviço/operação"""
+
+    def __init__(self, adaptive_timeouts: bool = True, p99_factor: float = 2.0,
+                 min_timeout: float = 0.25, **breaker_options):
+        self.adaptive_timeouts = adaptive_timeouts
+        self.p99_factor = p99_factor
+        self.min_timeout = min_timeout
+        self.breaker_options = breaker_options
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.timeouts: Dict[Tuple[str, str], AdaptiveTimeout] = {}
+        self.lock = threading.Lock()
+
+    def before_call(self, service_name: str, operation: str, ceiling: float) -> float:
+        """Timeout a usar na chamada; CircuitOpenError se o breaker recusar"""
+        now = time.monotonic()
+        with self.lock:
+            breaker = self.breakers.get(service_name)
+            if breaker is None:
+                breaker = self.breakers[service_name] = CircuitBreaker(service_name,
+                                                                       **self.breaker_options)
+            if not breaker.allow(now):
+                raise CircuitOpenError(f"Circuit breaker aberto para {service_name}")
+            if not self.adaptive_timeouts:
+                return ceiling
+            adaptive = self.timeouts.get((service_name, operation))
+            return adaptive.timeout(ceiling) if adaptive else ceiling
+
+    def after_call(self, service_name: str, operation: str, latency_ms: float, error: bool):
+        """Registra o resultado (timeouts entram com a latência do próprio timeout)"""
+        now = time.monotonic()
+        with self.lock:
+            self.breakers[service_name].record(now, latency_ms, error)
+            adaptive = self.timeouts.get((service_name, operation))
+            if adaptive is None:
+                adaptive = self.timeouts[(service_name, operation)] = AdaptiveTimeout(
+                    p99_factor=self.p99_factor, min_timeout=self.min_timeout)
+            adaptive.observe(latency_ms)
+
+    def get_status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self.lock:
+            status = {name: {**breaker.to_dict(now), 'timeouts': {}}
+                      for name, breaker in self.breakers.items()}
+            for (service_name, operation), adaptive in self.timeouts.items():
+                if service_name in status:
+                    status[service_name]['timeouts'][operation] = {
+                        'p99_ms': round(adaptive.p99_ms, 3) if adaptive.p99_ms is not None else None,
+                        'timeout_s': round(adaptive.last_timeout, 3) if adaptive.last_timeout else None,
+                        'samples': len(adaptive.latencies)
+                    }
+        return status
+
+
+def create_breakers_from_env() -> BreakerRegistry:
+    """Breakers configurados por variáveis de ambiente"""
+    return BreakerRegistry(
+        adaptive_timeouts=os.environ.get('ESB_ADAPTIVE_TIMEOUTS', '1') == '1',
+        p99_factor=float(os.environ.get('ESB_TIMEOUT_P99_FACTOR', 2.0)),
+        min_timeout=float(os.environ.get('ESB_MIN_TIMEOUT', 0.25)),
+        window_seconds=int(os.environ.get('ESB_BREAKER_WINDOW', 10)),
+        min_calls=int(os.environ.get('ESB_BREAKER_MIN_CALLS', 20)),
+        error_rate=float(os.environ.get('ESB_BREAKER_ERROR_RATE', 0.5)),
+        slow_call_ms=float(os.environ.get('ESB_BREAKER_SLOW_MS', 2000)),
+        slow_rate=float(os.environ.get('ESB_BREAKER_SLOW_RATE', 0.8)),
+        open_seconds=float(os.environ.get('ESB_BREAKER_OPEN_SECONDS', 5)),
+        half_open_calls=int(os.environ.get('ESB_BREAKER_HALF_OPEN_CALLS', 3))
+    )
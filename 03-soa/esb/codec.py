@@ -0,0 +1,405 @@
+"""
+Codecs de Envelope do ESB
+=========================
+Formato do corpo HTTP das mensagens entregues aos serviços:
+- json (padrão): o que todo serviço entende
+- msgpack: binário, sem as aspas/escapes do JSON (requer o pacote msgpack)
+- compact: msgpack posicional guiado por schema por (serviço, operação):
+  os nomes dos campos conhecidos não viajam, só os valores
+  ([máscara de presença, valores..., {campos extras}]); listas de itens
+  completos viajam em colunas
+
+Negociação por destino: cada instância anuncia os codecs que entende
+(heartbeat/registro) e o registro guarda o primeiro da preferência do ESB
+que a instância aceita. Sem anúncio, json.
+
+WirePayload guarda os bytes já codificados por codec: um payload que passa
+sem mudança por várias entregas (fan-out de tópico, por exemplo) é
+codificado uma vez só.
+"""
+
+import json
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+try:
+    import msgpack
+except ImportError:  # opcional: sem msgpack, só json
+    msgpack = None
+
+JSON = 'json'
+MSGPACK = 'msgpack'
+COMPACT = 'compact'
+DEFAULT_PREFERENCE = (COMPACT, MSGPACK, JSON)
+
+JSON_TYPE = 'application/json'
+MSGPACK_TYPE = 'application/msgpack'
+COMPACT_TYPE = 'application/vnd.esb.compact+msgpack'
+SCHEMA_HEADER = 'X-ESB-Schema'
+COLUMNS = 'c'  # lista de registros em colunas: {'c': [coluna1, coluna2, ...]}
+
+# Campos dos schemas compactos: nome, ou (nome, campos de cada item da lista)
+ITEM_FIELDS = ('product_id', 'quantity')
+STOCK_FIELDS = (('items', ITEM_FIELDS), 'reservation_id', 'product_id', 'quantity')
+
+# (serviço, operação) -> campos na ordem em que viajam
+OPERATION_FIELDS: Dict[Tuple[str, str], Tuple[Any, ...]] = {
+    ('order-service', 'create_order'): ('user_id', ('items', ITEM_FIELDS), 'reserve_on_confirm',
+                                        'reservation_id', 'idempotency_key',
+                                        'product_id', 'quantity'),
+    ('product-service', 'check_stock'): STOCK_FIELDS,
+    ('product-service', 'decrease_stock'): STOCK_FIELDS,
+    ('product-service', 'increase_stock'): STOCK_FIELDS,
+    ('payment-service', 'process_payment'): ('order_id', 'payment_method', 'idempotency_key',
+                                             'amount'),
+}
+
+
+class CodecError(ValueError):
+    """Corpo que o codec não consegue codificar/decodificar"""
+
+
+def _to_builtin(value):
+    """Tipos que json/msgpack não conhecem (mesma conversão do log de mensagens)"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} não serializável")
+
+
+class JsonCodec:
+    name = JSON
+    content_type = JSON_TYPE
+
+    def encode(self, payload: Any, schema: Optional['Schema'] = None) -> bytes:
+        try:
+            return json.dumps(payload, separators=(',', ':'), ensure_ascii=False,
+                              default=_to_builtin).encode('utf-8')
+        except (TypeError, ValueError) as exc:
+            raise CodecError(str(exc))
+
+    def decode(self, data: bytes, schema: Optional['Schema'] = None) -> Any:
+        try:
+            return json.loads(data)
+        except ValueError as exc:
+            raise CodecError(str(exc))
+
+
+class MsgpackCodec:
+    name = MSGPACK
+    content_type = MSGPACK_TYPE
+
+    def encode(self, payload: Any, schema: Optional['Schema'] = None) -> bytes:
+        try:
+            return msgpack.packb(payload, default=_to_builtin, use_bin_type=True)
+        except (TypeError, ValueError, OverflowError) as exc:
+            raise CodecError(str(exc))
+
+    def decode(self, data: bytes, schema: Optional['Schema'] = None) -> Any:
+        try:
+            return msgpack.unpackb(data, raw=False, strict_map_key=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as exc:
+            raise CodecError(str(exc))
+
+
+class Schema:
+    """Campos de um registro compacto, pré-processados para (de)codificar rápido"""
+
+    def __init__(self, fields: Tuple[Any, ...]):
+        self.fields = tuple((bit, field[0], Schema(field[1])) if isinstance(field, tuple)
+                            else (bit, field, None) for bit, field in enumerate(fields))
+        self.order = tuple(name for _, name, _ in self.fields)
+        self.names = frozenset(self.order)
+        self.full_mask = (1 << len(self.fields)) - 1
+        self.flat = all(items is None for _, _, items in self.fields)
+        self._values = itemgetter(*self.order)
+        if self.flat:
+            # Colunas -> registros com dict literal gerado (mais rápido que dict(zip()))
+            variables = [f'_{i}' for i in range(len(self.order))]
+            items = ', '.join(f"{name!r}: {var}" for name, var in zip(self.order, variables))
+            self._rows = eval(f"lambda columns: [{{{items}}} for {', '.join(variables)}, "
+                              f"in zip(*columns)]")
+
+    def pack(self, record: Dict[str, Any]) -> list:
+        """[máscara de presença, valores na ordem do schema..., {extras}]"""
+        if self.flat and record.keys() == self.names:
+            # Caminho rápido (ex: itens do pedido): todos os campos, nada extra
+            values = self._values(record)
+            return [self.full_mask, *values] if len(self.fields) > 1 else [self.full_mask, values]
+        out = [0]
+        mask = 0
+        for bit, name, items in self.fields:
+            if name not in record:
+                continue
+            mask |= 1 << bit
+            value = record[name]
+            if items is not None:
+                if not isinstance(value, list) or not all(isinstance(item, dict) for item in value):
+                    raise CodecError(f"{name}: esperada uma lista de objetos")
+                value = items.pack_list(value)
+            out.append(value)
+        out[0] = mask
+        if len(out) - 1 < len(record):
+            out.append({key: value for key, value in record.items() if key not in self.names})
+        return out
+
+    def pack_list(self, records: list) -> Any:
+        """Lista de registros; todos completos e planos viajam em colunas"""
+        names = self.names
+        if self.flat and records and all(record.keys() == names for record in records):
+            if len(self.order) == 1:
+                return {COLUMNS: [list(map(self._values, records))]}
+            return {COLUMNS: list(zip(*map(self._values, records)))}
+        return [self.pack(record) for record in records]
+
+    def unpack_list(self, packed: Any) -> list:
+        if isinstance(packed, dict):
+            return self._rows(packed[COLUMNS])
+        return [self.unpack(item) for item in packed]
+
+    def unpack(self, packed: list) -> Dict[str, Any]:
+        if not isinstance(packed, list) or not packed or not isinstance(packed[0], int):
+            raise CodecError("Registro compacto inválido")
+        mask = packed[0]
+        if mask == self.full_mask and self.flat and len(packed) == len(self.fields) + 1:
+            return dict(zip(self.order, packed[1:]))
+        record: Dict[str, Any] = {}
+        position = 1
+        for bit, name, items in self.fields:
+            if not mask >> bit & 1:
+                continue
+            value = packed[position]
+            record[name] = items.unpack_list(value) if items is not None else value
+            position += 1
+        if position < len(packed):
+            record.update(packed[position])
+        return record
+
+
+class CompactCodec(MsgpackCodec):
+    name = COMPACT
+    content_type = COMPACT_TYPE
+
+    def encode(self, payload: Any, schema: Optional['Schema'] = None) -> bytes:
+        if schema is None or not isinstance(payload, dict):
+            raise CodecError("Codec compacto requer schema e payload objeto")
+        return super().encode(schema.pack(payload))
+
+    def decode(self, data: bytes, schema: Optional['Schema'] = None) -> Any:
+        if schema is None:
+            raise CodecError(f"Schema desconhecido (cabeçalho {SCHEMA_HEADER})")
+        try:
+            return schema.unpack(super().decode(data))
+        except (IndexError, TypeError) as exc:
+            raise CodecError(f"Registro compacto inválido: {exc}")
+
+
+OPERATION_SCHEMAS: Dict[Tuple[str, str], Schema] = {
+    key: Schema(fields) for key, fields in OPERATION_FIELDS.items()
+}
+
+CODECS: Dict[str, Any] = {JSON: JsonCodec()}
+if msgpack is not None:
+    CODECS[MSGPACK] = MsgpackCodec()
+    CODECS[COMPACT] = CompactCodec()
+_BY_CONTENT_TYPE = {codec.content_type: codec for codec in CODECS.values()}
+
+
+def available_codecs() -> Tuple[str, ...]:
+    """Codecs que este processo entende, do preferido ao padrão (json)"""
+    return tuple(name for name in DEFAULT_PREFERENCE if name in CODECS)
+
+
+def negotiate(preference: Sequence[str], advertised: Iterable[str]) -> str:
+    """Primeiro codec da preferência do ESB que a instância anunciou (senão json)"""
+    advertised = set(advertised)
+    for name in preference:
+        if name in advertised and name in CODECS:
+            return name
+    return JSON
+
+
+def codec_for_content_type(content_type: Optional[str]):
+    """Codec pelo Content-Type (parâmetros como charset ignorados); None se desconhecido"""
+    if not content_type:
+        return None
+    return _BY_CONTENT_TYPE.get(content_type.split(';', 1)[0].strip().lower())
+
+
+def schema_name(service_name: str, operation: str) -> str:
+    return f"{service_name}/{operation}"
+
+
+def schema_for(name: Optional[str]) -> Optional[Schema]:
+    """Schema pelo valor do cabeçalho X-ESB-Schema ('serviço/operação')"""
+    if not name or '/' not in name:
+        return None
+    return OPERATION_SCHEMAS.get(tuple(name.split('/', 1)))
+
+
+def accept_header(codec_name: str) -> str:
+    """Respostas voltam em msgpack quando o destino fala msgpack (sem schema)"""
+    if codec_name in (MSGPACK, COMPACT):
+        return f"{MSGPACK_TYPE}, {JSON_TYPE};q=0.9"
+    return JSON_TYPE
+
+
+class WirePayload(dict):
+    """
+    Payload que guarda os próprios bytes já codificados (por codec e schema)
+    Mudanças no primeiro nível descartam o cache; o conteúdo aninhado deve
+    ser tratado como imutável enquanto a mensagem estiver em trânsito.
+    """
+
+    __slots__ = ('encoded',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.encoded: Dict[Tuple[str, Optional[str]], bytes] = {}
+
+    @classmethod
+    def from_wire(cls, data: bytes, content_type: str,
+                  schema: Optional[str] = None) -> 'WirePayload':
+        """Decodifica um corpo recebido e guarda os bytes originais para repasse"""
+        codec = codec_for_content_type(content_type)
+        if codec is None:
+            raise CodecError(f"Content-Type não suportado: {content_type}")
+        payload = cls(codec.decode(data, schema_for(schema)))
+        payload.encoded[(codec.name, schema if codec.name == COMPACT else None)] = data
+        return payload
+
+    def _changed(self):
+        self.encoded.clear()
+
+    def __setitem__(self, key, value):
+        self._changed()
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._changed()
+        super().__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        self._changed()
+        super().update(*args, **kwargs)
+
+    def pop(self, *args):
+        self._changed()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._changed()
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._changed()
+        return super().setdefault(key, default)
+
+    def clear(self):
+        self._changed()
+        super().clear()
+
+
+def json_bytes(payload: Dict[str, Any]) -> bytes:
+    """Payload em JSON, reaproveitando (e guardando) os bytes de um WirePayload"""
+    cache = payload.encoded if isinstance(payload, WirePayload) else None
+    data = cache.get((JSON, None)) if cache is not None else None
+    if data is None:
+        data = CODECS[JSON].encode(payload)
+        if cache is not None:
+            cache[(JSON, None)] = data
+    return data
+
+
+class EnvelopeCodecs:
+    """Codifica/decodifica os corpos do despacho e mede bytes e tempo por codec"""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def encode(self, codec_name: str, service_name: str, operation: str,
+               payload: Dict[str, Any]) -> Tuple[bytes, Dict[str, str], Dict[str, Any]]:
+        """
+        Corpo e cabeçalhos da requisição, e as métricas de codificação
+        O codec compacto cai para msgpack se a operação não tem schema (ou o
+        payload não cabe nele); payload reaproveitado não é recodificado.
+        """
+        codec = CODECS.get(codec_name) or CODECS[JSON]
+        schema = None
+        if codec.name == COMPACT:
+            schema = OPERATION_SCHEMAS.get((service_name, operation))
+            if schema is None:
+                codec = CODECS[MSGPACK]
+        name = schema_name(service_name, operation) if schema else None
+
+        cache = payload.encoded if isinstance(payload, WirePayload) else None
+        data = cache.get((codec.name, name)) if cache is not None else None
+        reused = data is not None
+        started = time.perf_counter()
+        if data is None:
+            while data is None:
+                try:
+                    data = codec.encode(payload, schema)
+                except CodecError:
+                    # Não coube no schema (compacto -> msgpack) ou tipo exótico (-> json)
+                    if codec.name == JSON:
+                        raise
+                    codec = CODECS[MSGPACK if codec.name == COMPACT else JSON]
+                    schema = name = None
+            if cache is not None:
+                cache[(codec.name, name)] = data
+        encode_us = (time.perf_counter() - started) * 1e6
+
+        headers = {'Content-Type': codec.content_type, 'Accept': accept_header(codec_name)}
+        if name:
+            headers[SCHEMA_HEADER] = name
+        wire = {'codec': codec.name, 'bytes_out': len(data),
+                'encode_us': round(encode_us, 1), 'reused': reused}
+        self._record(codec.name, messages=1, bytes_out=len(data),
+                     encode_us=encode_us, reused=int(reused))
+        return data, headers, wire
+
+    def decode(self, data: bytes, content_type: Optional[str],
+               wire: Dict[str, Any]) -> Any:
+        """Corpo da resposta pelo Content-Type; texto não decodificável vira {'raw'}"""
+        codec = codec_for_content_type(content_type) or CODECS[JSON]
+        started = time.perf_counter()
+        try:
+            body = codec.decode(data) if data else None
+        except CodecError:
+            body = {'raw': data.decode('utf-8', 'replace')}
+        decode_us = (time.perf_counter() - started) * 1e6
+        if wire.get('codec') is None:  # GET: sem corpo de ida, vale o codec da resposta
+            wire['codec'] = codec.name
+        wire.update(bytes_in=len(data), decode_us=round(decode_us, 1))
+        self._record(wire['codec'], bytes_in=len(data), decode_us=decode_us)
+        return body
+
+    def _record(self, codec_name: str, **values):
+        with self._lock:
+            stats = self._stats.get(codec_name)
+            if stats is None:
+                stats = self._stats[codec_name] = dict.fromkeys(
+                    ('messages', 'bytes_out', 'bytes_in', 'encode_us', 'decode_us', 'reused'), 0)
+            for key, value in values.items():
+                stats[key] += value
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Por codec: mensagens, bytes e tempo médio de codificação/decodificação"""
+        with self._lock:
+            snapshot = {name: dict(stats) for name, stats in self._stats.items()}
+        for stats in snapshot.values():
+            messages = stats['messages'] or 1
+            stats['avg_bytes_out'] = round(stats['bytes_out'] / messages, 1)
+            stats['avg_encode_us'] = round(stats.pop('encode_us') / messages, 1)
+            stats['avg_decode_us'] = round(stats.pop('decode_us') / messages, 1)
+        return {'available': list(available_codecs()), 'codecs': snapshot}
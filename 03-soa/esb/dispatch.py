@@ -0,0 +1,259 @@
+"""
+Despacho HTTP do ESB
+====================
+Entrega real das mensagens aos serviços registrados:
+- Cada operação é mapeada para um método + rota do serviço destino
+- Cada instância de serviço tem um pool persistente de conexões keep-alive;
+  com várias réplicas, o registro (registry.ServiceRegistry) escolhe a
+  instância de cada chamada
+- Timeouts por operação
+- Histogramas de latência por serviço/operação
+- Circuit breaker por serviço e timeout adaptativo (opcionais, ver
+  circuit_breaker.BreakerRegistry)
+- Corpo no codec negociado com a instância (json, msgpack ou compacto, ver
+  codec.EnvelopeCodecs), com bytes e tempo de codificação por mensagem
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from .codec import DEFAULT_PREFERENCE, CodecError, EnvelopeCodecs, accept_header
+    from .registry import POWER_OF_TWO, ServiceInstance, ServiceRegistry
+except ImportError:  # executado como script
+    from codec import DEFAULT_PREFERENCE, CodecError, EnvelopeCodecs, accept_header
+    from registry import POWER_OF_TWO, ServiceInstance, ServiceRegistry
+
+# (serviço, operação) -> (método HTTP, rota, timeout em segundos ou None)
+# A rota é formatada com os campos do payload, ex: /products/{product_id}
+OPERATION_ROUTES: Dict[Tuple[str, str], Tuple[str, str, Optional[float]]] = {
+    ('auth-service', 'validate_user'): ('POST', '/validate', 2.0),
+    ('auth-service', 'get_user'): ('GET', '/users/{user_id}', 2.0),
+    ('product-service', 'list_products'): ('GET', '/products', None),
+    ('product-service', 'get_product'): ('GET', '/products/{product_id}', 2.0),
+    ('product-service', 'check_stock'): ('POST', '/products/{product_id}/check-stock', 2.0),
+    ('product-service', 'decrease_stock'): ('POST', '/products/{product_id}/reserve', 3.0),
+    ('product-service', 'increase_stock'): ('POST', '/products/{product_id}/release', 3.0),
+    ('order-service', 'create_order'): ('POST', '/orders', 10.0),
+    ('order-service', 'get_order'): ('GET', '/orders/{order_id}', 2.0),
+    ('order-service', 'cancel_order'): ('POST', '/orders/{order_id}/cancel', 3.0),
+    ('payment-service', 'process_payment'): ('POST', '/payments/process', 15.0),
+    ('payment-service', 'refund'): ('POST', '/payments/order/{order_id}/refund', 10.0),
+}
+
+# Variantes em lote: usadas quando o payload traz 'items' (vários produtos)
+BATCH_ROUTES: Dict[Tuple[str, str], Tuple[str, str, Optional[float]]] = {
+    ('product-service', 'check_stock'): ('POST', '/products/check-stock:batch', 2.0),
+    ('product-service', 'decrease_stock'): ('POST', '/products/reserve:batch', 3.0),
+    ('product-service', 'increase_stock'): ('POST', '/products/release:batch', 3.0),
+}
+
+
+class DispatchError(Exception):
+    """Falha de entrega (rota ausente, conexão, timeout)"""
+
+
+class DispatchTimeout(DispatchError):
+    """O serviço não respondeu dentro do timeout"""
+
+
+def resolve_route(routes, batch_routes, service_name: str, operation: str,
+                  payload: Dict[str, Any]) -> Tuple[str, str, Optional[float]]:
+    """Método, rota formatada e timeout da operação (lote se houver 'items')"""
+    route = None
+    if 'items' in payload:
+        route = batch_routes.get((service_name, operation))
+    if route is None:
+        route = routes.get((service_name, operation))
+    if route is None:
+        raise DispatchError(f"Operação {operation} não mapeada para {service_name}")
+
+    method, path_template, timeout = route
+    try:
+        return method, path_template.format(**payload), timeout
+    except KeyError as exc:
+        raise DispatchError(f"Campo {exc.args[0]} ausente no payload de {operation}")
+
+
+class LatencyHistogram:
+    """Histograma de latência com buckets fixos (ms)"""
+
+    BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, latency_ms: float, error: bool = False):
+        index = len(self.BUCKETS)
+        for i, bound in enumerate(self.BUCKETS):
+            if latency_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        if error:
+            self.errors += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Limite superior do bucket que contém o percentil p"""
+        if not self.count:
+            return None
+        target = self.count * p / 100
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return float(self.BUCKETS[i]) if i < len(self.BUCKETS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {f"le_{bound}ms": c for bound, c in zip(self.BUCKETS, self.counts)}
+        buckets['inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max_ms, 3),
+            'buckets': buckets
+        }
+
+
+class ServiceClient:
+    """Pool de conexões keep-alive para um serviço"""
+
+    def __init__(self, endpoint: str, pool_size: int = 10, default_timeout: float = 5.0):
+        self.endpoint = endpoint.rstrip('/')
+        self.pool_size = pool_size
+        self.default_timeout = default_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=0, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def call(self, method: str, path: str, body: Optional[bytes], headers: Dict[str, str],
+             timeout: Optional[float] = None) -> Tuple[int, bytes, Optional[str]]:
+        """Executa a requisição e retorna (status HTTP, corpo em bytes, Content-Type)"""
+        url = self.endpoint + path
+        try:
+            response = self.session.request(method, url, data=body, headers=headers,
+                                            timeout=timeout or self.default_timeout)
+        except requests.Timeout:
+            raise DispatchTimeout(f"Timeout após {timeout or self.default_timeout}s em {url}")
+        except requests.RequestException as exc:
+            raise DispatchError(f"Falha de conexão com {url}: {exc.__class__.__name__}")
+        return response.status_code, response.content, response.headers.get('Content-Type')
+
+    def close(self):
+        self.session.close()
+
+
+class Dispatcher:
+    """Resolve rotas, escolhe a instância, mantém os pools e mede latências"""
+
+    def __init__(self, pool_size: int = 10, default_timeout: float = 5.0, breakers=None,
+                 strategy: str = POWER_OF_TWO, codecs: Sequence[str] = DEFAULT_PREFERENCE):
+        self.pool_size = pool_size
+        self.default_timeout = default_timeout
+        self.breakers = breakers  # BreakerRegistry ou None
+        self.routes = dict(OPERATION_ROUTES)
+        self.batch_routes = dict(BATCH_ROUTES)
+        # Pool de conexões de cada instância fecha quando ela sai do registro;
+        # o registro negocia o codec de cada instância com esta preferência
+        self.registry = ServiceRegistry(strategy, on_remove=self._close_client,
+                                        codec_preference=codecs)
+        self.codecs = EnvelopeCodecs()
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.lock = threading.Lock()
+
+    def register_client(self, service_name: str, endpoint: str, pool_size: Optional[int] = None,
+                        instance_id: Optional[str] = None, ttl: Optional[float] = None,
+                        codecs: Optional[Sequence[str]] = None) -> ServiceInstance:
+        """Registra uma instância do serviço (o mesmo id substitui a anterior)"""
+        client = ServiceClient(endpoint, pool_size or self.pool_size, self.default_timeout)
+        return self.registry.add(service_name, endpoint, client, instance_id, ttl, codecs)
+
+    def remove_client(self, service_name: str, instance_id: Optional[str] = None) -> int:
+        return len(self.registry.remove(service_name, instance_id))
+
+    @staticmethod
+    def _close_client(instance: ServiceInstance):
+        instance.client.close()
+
+    def register_route(self, service_name: str, operation: str, method: str,
+                       path: str, timeout: Optional[float] = None):
+        with self.lock:
+            self.routes[(service_name, operation)] = (method.upper(), path, timeout)
+
+    def dispatch(self, service_name: str, operation: str,
+                 payload: Dict[str, Any]) -> Tuple[int, Any, float, Dict[str, Any]]:
+        """
+        Entrega a mensagem; retorna (status HTTP, corpo, latência em ms, métricas
+        do corpo: codec, bytes_out/bytes_in, encode_us/decode_us, reused)
+        """
+        method, path, timeout = resolve_route(self.routes, self.batch_routes,
+                                              service_name, operation, payload)
+        timeout = timeout or self.default_timeout
+        if self.breakers:
+            # Breaker aberto: CircuitOpenError aqui, sem tocar a rede
+            timeout = self.breakers.before_call(service_name, operation, timeout)
+
+        instance = self.registry.acquire(service_name)
+        if instance is None:
+            if self.breakers:
+                self.breakers.after_call(service_name, operation, 0.0, error=True)
+            raise DispatchError(f"Serviço {service_name} sem instância disponível")
+
+        started = time.perf_counter()
+        error = True
+        try:
+            if method == 'GET':
+                data, headers = None, {'Accept': accept_header(instance.codec)}
+                wire = {'codec': None, 'bytes_out': 0, 'encode_us': 0.0, 'reused': False}
+            else:
+                try:
+                    data, headers, wire = self.codecs.encode(instance.codec, service_name,
+                                                             operation, payload)
+                except CodecError as exc:
+                    raise DispatchError(f"Payload de {operation} não serializável: {exc}")
+            status_code, content, content_type = instance.client.call(method, path, data,
+                                                                      headers, timeout)
+            body = self.codecs.decode(content, content_type, wire)
+            error = status_code >= 500
+        finally:
+            latency_ms = self._observe(service_name, operation, started, error)
+            self.registry.release(instance, error)
+            if self.breakers:
+                self.breakers.after_call(service_name, operation, latency_ms, error)
+        return status_code, body, latency_ms, wire
+
+    def _observe(self, service_name: str, operation: str, started: float, error: bool) -> float:
+        latency_ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            histogram = self.histograms.get((service_name, operation))
+            if histogram is None:
+                histogram = self.histograms[(service_name, operation)] = LatencyHistogram()
+            histogram.observe(latency_ms, error)
+        return latency_ms
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Latências por serviço/operação e instâncias registradas"""
+        with self.lock:
+            latency: Dict[str, Dict[str, Any]] = {}
+            for (service_name, operation), histogram in self.histograms.items():
+                latency.setdefault(service_name, {})[operation] = histogram.to_dict()
+        return {'instances': self.registry.get_status(), 'latency': latency}
@@ -0,0 +1,421 @@
+"""
+Filas Duráveis do ESB (at-least-once)
+=====================================
+Filas nomeadas persistidas em SQLite embarcado:
+- Índice em memória (fila pronta, em voo, agendadas); o SQLite é o log
+  durável, gravado em lotes (group commit) por uma thread escritora
+- Consumidor recebe, processa e confirma (ack); sem ack dentro do
+  visibility timeout a mensagem volta para a fila
+- Falhas são reentregues com backoff exponencial, agendado em um timer wheel
+- Depois de `max_attempts` tentativas a mensagem vai para a dead-letter
+  queue (`<fila>.dlq`)
+- Recuperação: mensagens em voo numa queda voltam a ficar prontas
+  (por isso a entrega é pelo menos uma vez)
+"""
+
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+DLQ_SUFFIX = '.dlq'
+
+
+class TimerWheel:
+    """
+    Timer wheel de um nível: `slots` posições de `tick` segundos
+    Agendar e avançar custam O(1) por timer; atrasos maiores que uma volta
+    ficam no slot até a volta certa (o tick alvo é guardado com o item).
+    """
+
+    def __init__(self, tick: float = 0.01, slots: int = 1024):
+        self.tick = tick
+        self.slots = slots
+        self.wheel: List[list] = [[] for _ in range(slots)]
+        self.current = int(time.monotonic() / tick)
+        self.pending = 0
+
+    def schedule(self, delay: float, item: Any):
+        target = max(int((time.monotonic() + delay) / self.tick), self.current + 1)
+        self.wheel[target % self.slots].append((target, item))
+        self.pending += 1
+
+    def advance(self, now: Optional[float] = None) -> list:
+        """Avança até `now` e retorna os itens vencidos"""
+        now_tick = int((now or time.monotonic()) / self.tick)
+        due = []
+        while self.current < now_tick:
+            self.current += 1
+            index = self.current % self.slots
+            slot = self.wheel[index]
+            if not slot:
+                continue
+            keep = []
+            for target, item in slot:
+                (due if target <= self.current else keep).append((target, item))
+            self.wheel[index] = keep
+        self.pending -= len(due)
+        return [item for _, item in due]
+
+
+class _Queue:
+    """Estado em memória de uma fila"""
+
+    def __init__(self, name: str, visibility_timeout: float, max_attempts: int,
+                 backoff_base: float, backoff_max: float):
+        self.name = name
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.ready = deque()
+        self.inflight: Dict[int, Dict[str, Any]] = {}
+        self.delayed = 0
+        self.stats = {'enqueued': 0, 'delivered': 0, 'acked': 0, 'retried': 0,
+                      'expired': 0, 'dead_lettered': 0}
+
+    def backoff(self, attempts: int) -> float:
+        return min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+
+
+class DurableQueueBroker:
+    """Broker de filas duráveis sobre um arquivo SQLite"""
+
+    def __init__(self, path: str,
+                 visibility_timeout: float = 30.0,
+                 max_attempts: int = 5,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 60.0,
+                 commit_interval: float = 0.005,
+                 synchronous: str = 'NORMAL'):
+        self.path = path
+        self.defaults = {'visibility_timeout': visibility_timeout, 'max_attempts': max_attempts,
+                         'backoff_base': backoff_base, 'backoff_max': backoff_max}
+        self.commit_interval = commit_interval
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(f'PRAGMA synchronous={synchronous}')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY, queue TEXT NOT NULL, body TEXT NOT NULL,
+            attempts INTEGER NOT NULL, available_at REAL NOT NULL,
+            created_at REAL NOT NULL, last_error TEXT)''')
+
+        self._queues: Dict[str, _Queue] = {}
+        self._messages: Dict[int, Dict[str, Any]] = {}
+        self._wheel = TimerWheel()
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._durable = threading.Condition(threading.Lock())
+        self._ops: list = []
+        self._op_sequence = 0
+        self._durable_sequence = 0
+        self._receipts = itertools.count(1)
+        self._closed = False
+        self.commits = 0
+
+        self._recover()
+        self._threads = [
+            threading.Thread(target=self._commit_loop, daemon=True, name='queue-writer'),
+            threading.Thread(target=self._timer_loop, daemon=True, name='queue-timers'),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # Filas ----------------------------------------------------------------
+
+    def declare_queue(self, name: str, **options) -> Dict[str, Any]:
+        """
+        Cria (ou reconfigura) uma fila
+        options: visibility_timeout, max_attempts, backoff_base, backoff_max
+        """
+        with self._lock:
+            queue = self._queue(name)
+            for key, value in options.items():
+                if key not in self.defaults:
+                    raise ValueError(f"Opção desconhecida: {key}")
+                setattr(queue, key, value)
+            return self._queue_stats(queue)
+
+    def _queue(self, name: str) -> _Queue:
+        queue = self._queues.get(name)
+        if queue is None:
+            queue = self._queues[name] = _Queue(name, **self.defaults)
+            if name.endswith(DLQ_SUFFIX):
+                queue.max_attempts = 0  # a DLQ só guarda; não reentrega
+        return queue
+
+    # Recuperação e persistência -------------------------------------------
+
+    def _recover(self):
+        now = time.time()
+        rows = self._db.execute(
+            'SELECT id, queue, body, attempts, available_at, created_at, last_error '
+            'FROM messages ORDER BY id').fetchall()
+        last_id = 0
+        with self._lock:
+            for message_id, queue_name, body, attempts, available_at, created_at, last_error in rows:
+                message = {'id': message_id, 'queue': queue_name, 'body': json.loads(body),
+                           'attempts': attempts, 'available_at': available_at,
+                           'created_at': created_at, 'last_error': last_error, 'receipt': None}
+                self._messages[message_id] = message
+                # Em voo na queda: volta quando o visibility timeout venceria
+                self._make_available(self._queue(queue_name), message, max(0.0, available_at - now))
+                last_id = message_id
+        self._ids = itertools.count(last_id + 1)
+
+    def _record(self, op: str, *row) -> int:
+        """Registra uma mutação para o próximo commit (chamado sob o lock)"""
+        self._ops.append((op, row))
+        self._op_sequence += 1
+        return self._op_sequence
+
+    @staticmethod
+    def _update_row(message: Dict[str, Any]) -> tuple:
+        return (message['queue'], message['attempts'], message['available_at'],
+                message['last_error'], message['id'])
+
+    def _commit_loop(self):
+        while True:
+            time.sleep(self.commit_interval)
+            with self._lock:
+                ops, self._ops = self._ops, []
+                sequence = self._op_sequence
+                closed = self._closed
+            if ops:
+                self._commit(ops)
+                with self._durable:
+                    self._durable_sequence = sequence
+                    self.commits += 1
+                    self._durable.notify_all()
+            if closed:
+                return
+
+    def _commit(self, ops: list):
+        """Uma transação por lote; operações iguais e seguidas viram um executemany"""
+        self._db.execute('BEGIN')
+        for op, group in itertools.groupby(ops, key=lambda entry: entry[0]):
+            rows = [row for _, row in group]
+            if op == 'insert':
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO messages (id, queue, body, attempts, available_at, '
+                    'created_at, last_error) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            elif op == 'update':
+                self._db.executemany(
+                    'UPDATE messages SET queue = ?, attempts = ?, available_at = ?, '
+                    'last_error = ? WHERE id = ?', rows)
+            elif op == 'delete':
+                self._db.executemany('DELETE FROM messages WHERE id = ?', rows)
+        self._db.execute('COMMIT')
+
+    def wait(self, sequence: int):
+        """Bloqueia até a mutação `sequence` estar commitada"""
+        with self._durable:
+            while self._durable_sequence < sequence:
+                self._durable.wait()
+
+    # Produção -------------------------------------------------------------
+
+    def enqueue(self, queue_name: str, body: Dict[str, Any], delay: float = 0.0,
+                sync: bool = True) -> int:
+        """Enfileira uma mensagem; com sync=True retorna só depois do commit"""
+        return self.enqueue_many(queue_name, [body], delay, sync)[0]
+
+    def enqueue_many(self, queue_name: str, bodies: List[Dict[str, Any]], delay: float = 0.0,
+                     sync: bool = True) -> List[int]:
+        """Enfileira um lote (um único commit cobre todas)"""
+        encoded = [json.dumps(body, ensure_ascii=False, default=str) for body in bodies]
+        now = time.time()
+        ids = []
+        with self._lock:
+            queue = self._queue(queue_name)
+            for body, raw in zip(bodies, encoded):
+                message_id = next(self._ids)
+                message = {'id': message_id, 'queue': queue_name, 'body': body, 'attempts': 0,
+                           'available_at': now + delay, 'created_at': now,
+                           'last_error': None, 'receipt': None}
+                self._messages[message_id] = message
+                sequence = self._record('insert', message_id, queue_name, raw, 0,
+                                        message['available_at'], now, None)
+                self._make_available(queue, message, delay)
+                ids.append(message_id)
+            queue.stats['enqueued'] += len(ids)
+        if sync and ids:
+            self.wait(sequence)
+        return ids
+
+    def _make_available(self, queue: _Queue, message: Dict[str, Any], delay: float):
+        """Pronta agora ou agendada no timer wheel (chamado sob o lock)"""
+        if delay > 0:
+            queue.delayed += 1
+            self._wheel.schedule(delay, ('retry', message['id'], message['attempts']))
+        else:
+            queue.ready.append(message['id'])
+            self._available.notify_all()
+
+    # Consumo --------------------------------------------------------------
+
+    def receive(self, queue_name: str, max_messages: int = 1,
+                wait: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Retira até max_messages prontas (esperando até `wait` segundos);
+        cada uma fica invisível por visibility_timeout até o ack
+        """
+        deadline = time.monotonic() + wait
+        received = []
+        with self._lock:
+            queue = self._queue(queue_name)
+            while not queue.ready and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return received
+                self._available.wait(remaining)
+
+            while queue.ready and len(received) < max_messages:
+                message = self._messages.get(queue.ready.popleft())
+                if message is None or message['queue'] != queue_name:
+                    continue
+                message['attempts'] += 1
+                message['receipt'] = next(self._receipts)
+                message['available_at'] = time.time() + queue.visibility_timeout
+                queue.inflight[message['id']] = message
+                self._wheel.schedule(queue.visibility_timeout,
+                                     ('visibility', message['id'], message['receipt']))
+                self._record('update', *self._update_row(message))
+                received.append({'id': message['id'], 'queue': queue_name,
+                                 'body': message['body'], 'attempts': message['attempts'],
+                                 'receipt': message['receipt']})
+            queue.stats['delivered'] += len(received)
+        return received
+
+    def ack(self, queue_name: str, message_id: int, receipt: Optional[int] = None) -> bool:
+        """Confirma o processamento; False se a entrega já expirou"""
+        with self._lock:
+            queue = self._queue(queue_name)
+            message = queue.inflight.get(message_id)
+            if message is None or (receipt is not None and message['receipt'] != receipt):
+                return False
+            del queue.inflight[message_id]
+            del self._messages[message_id]
+            self._record('delete', message_id)
+            queue.stats['acked'] += 1
+            return True
+
+    def nack(self, queue_name: str, message_id: int, receipt: Optional[int] = None,
+             error: Optional[str] = None, retry: bool = True) -> bool:
+        """
+        Devolve a mensagem: reentrega com backoff, ou DLQ se esgotou as
+        tentativas (ou retry=False, para mensagens que nunca vão passar)
+        """
+        with self._lock:
+            queue = self._queue(queue_name)
+            message = queue.inflight.get(message_id)
+            if message is None or (receipt is not None and message['receipt'] != receipt):
+                return False
+            del queue.inflight[message_id]
+            self._fail(queue, message, error, retry)
+            return True
+
+    def _fail(self, queue: _Queue, message: Dict[str, Any], error: Optional[str], retry: bool):
+        message['last_error'] = error
+        message['receipt'] = None
+        if not retry or message['attempts'] >= queue.max_attempts:
+            dlq = self._queue(queue.name + DLQ_SUFFIX)
+            message['queue'] = dlq.name
+            message['available_at'] = time.time()
+            dlq.ready.append(message['id'])
+            queue.stats['dead_lettered'] += 1
+            dlq.stats['enqueued'] += 1
+        else:
+            delay = queue.backoff(message['attempts'])
+            message['available_at'] = time.time() + delay
+            self._make_available(queue, message, delay)
+            queue.stats['retried'] += 1
+        self._record('update', *self._update_row(message))
+
+    def _timer_loop(self):
+        while not self._closed:
+            time.sleep(self._wheel.tick)
+            with self._lock:
+                for kind, message_id, token in self._wheel.advance():
+                    message = self._messages.get(message_id)
+                    if message is None:
+                        continue
+                    queue = self._queue(message['queue'])
+                    if kind == 'retry' and message['attempts'] == token and message['receipt'] is None:
+                        queue.delayed -= 1
+                        queue.ready.append(message_id)
+                        self._available.notify_all()
+                    elif kind == 'visibility' and message['receipt'] == token:
+                        # Consumidor não confirmou a tempo: conta como falha
+                        del queue.inflight[message_id]
+                        queue.stats['expired'] += 1
+                        self._fail(queue, message, 'visibility timeout', retry=True)
+
+    # DLQ ------------------------------------------------------------------
+
+    def peek(self, queue_name: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Mensagens prontas de uma fila (ex: DLQ), sem retirá-las"""
+        with self._lock:
+            queue = self._queue(queue_name)
+            messages = [self._messages[message_id] for message_id in list(queue.ready)[:limit]
+                        if message_id in self._messages]
+            return [{key: value for key, value in message.items() if key != 'receipt'}
+                    for message in messages]
+
+    def redrive(self, dlq_name: str, limit: Optional[int] = None) -> int:
+        """Devolve mensagens da DLQ para a fila de origem, com tentativas zeradas"""
+        if not dlq_name.endswith(DLQ_SUFFIX):
+            raise ValueError(f"{dlq_name} não é uma dead-letter queue")
+        moved = 0
+        with self._lock:
+            dlq = self._queue(dlq_name)
+            target = self._queue(dlq_name[:-len(DLQ_SUFFIX)])
+            while dlq.ready and (limit is None or moved < limit):
+                message = self._messages.get(dlq.ready.popleft())
+                if message is None:
+                    continue
+                message.update(queue=target.name, attempts=0, last_error=None,
+                               available_at=time.time())
+                self._record('update', *self._update_row(message))
+                self._make_available(target, message, 0.0)
+                moved += 1
+        return moved
+
+    # Métricas e encerramento ------------------------------------------------
+
+    def _queue_stats(self, queue: _Queue) -> Dict[str, Any]:
+        return {
+            'ready': len(queue.ready),
+            'inflight': len(queue.inflight),
+            'delayed': queue.delayed,
+            'visibility_timeout': queue.visibility_timeout,
+            'max_attempts': queue.max_attempts,
+            **queue.stats
+        }
+
+    def queue_names(self) -> List[str]:
+        with self._lock:
+            return list(self._queues)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queues = {name: self._queue_stats(queue) for name, queue in self._queues.items()}
+            pending_timers = self._wheel.pending
+        return {'path': self.path, 'messages': len(self._messages), 'commits': self.commits,
+                'timers': pending_timers, 'queues': queues}
+
+    def close(self):
+        """Commita o que falta e fecha o arquivo"""
+        with self._lock:
+            self._closed = True
+            self._available.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._db.close()
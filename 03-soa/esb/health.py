@@ -0,0 +1,159 @@
+"""
+Saúde das Instâncias do ESB
+===========================
+Dois sinais tiram uma instância da rotação (sem custo por requisição: o
+registro só recalcula a tupla roteável quando a saúde muda):
+- Heartbeat: instâncias registradas com TTL precisam renovar antes de
+  vencer. O reaper marca as vencidas como não saudáveis e, depois de
+  `evict_after` TTLs sem renovação, remove do registro
+- Sondagem ativa: GET <endpoint>/health a cada `probe_interval` segundos,
+  com jitter (±`jitter`) para as sondas não baterem todas juntas;
+  `failure_threshold` falhas seguidas afastam a instância,
+  `success_threshold` sucessos seguidos devolvem
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Set, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from .registry import ServiceInstance, ServiceRegistry
+except ImportError:  # executado como script
+    from registry import ServiceInstance, ServiceRegistry
+
+HEARTBEAT_EXPIRED = 'heartbeat_expired'
+PROBE_FAILED = 'probe_failed'
+
+
+class HealthMonitor:
+    """Reaper de heartbeats e sondas de /health sobre um ServiceRegistry"""
+
+    def __init__(self, registry: ServiceRegistry,
+                 probe_interval: float = 5.0,
+                 probe_timeout: float = 1.0,
+                 probe_path: str = '/health',
+                 jitter: float = 0.2,
+                 failure_threshold: int = 2,
+                 success_threshold: int = 1,
+                 evict_after: float = 3.0,
+                 probe_workers: int = 8):
+        self.registry = registry
+        self.probe_interval = probe_interval  # 0 desliga a sondagem
+        self.probe_timeout = probe_timeout
+        self.probe_path = probe_path
+        self.jitter = jitter
+        self.failure_threshold = failure_threshold
+        self.success_threshold = success_threshold
+        self.evict_after = evict_after
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=probe_workers, pool_maxsize=probe_workers,
+                              max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = ThreadPoolExecutor(probe_workers, thread_name_prefix='esb-probe')
+
+        # (serviço, instância) -> próxima sonda, falhas/sucessos seguidos
+        self._next_probe: Dict[Tuple[str, str], float] = {}
+        self._streaks: Dict[Tuple[str, str], list] = {}
+        self._probing: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self.stats = {'probes': 0, 'probe_failures': 0, 'expired': 0, 'evicted': 0}
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='esb-health')
+        self._thread.start()
+
+    def _run(self):
+        tick = min(0.5, self.probe_interval / 4) if self.probe_interval else 0.5
+        while not self._stop.wait(tick):
+            now = time.monotonic()
+            instances = self.registry.all_instances()
+            self._reap(instances, now)
+            if self.probe_interval:
+                self._schedule_probes(instances, now)
+
+    # Heartbeat --------------------------------------------------------------
+
+    def _reap(self, instances, now: float):
+        for instance in instances:
+            if not instance.ttl:
+                continue
+            age = now - instance.last_heartbeat
+            if age > instance.ttl * self.evict_after:
+                if self.registry.remove_instance(instance):
+                    self.stats['evicted'] += 1
+                    print(f"🪦 {instance.service_name} ({instance.id}) removido: "
+                          f"sem heartbeat há {age:.0f}s")
+            elif age > instance.ttl and instance.healthy:
+                if self.registry.set_health(instance, False, HEARTBEAT_EXPIRED):
+                    self.stats['expired'] += 1
+
+    # Sondagem ativa ---------------------------------------------------------
+
+    def _schedule_probes(self, instances, now: float):
+        live = set()
+        for instance in instances:
+            key = (instance.service_name, instance.id)
+            live.add(key)
+            due = self._next_probe.get(key)
+            if due is None:
+                # Primeira sonda espalhada no intervalo, não todas de uma vez
+                self._next_probe[key] = now + random.uniform(0, self.probe_interval)
+                continue
+            with self._lock:
+                if due > now or key in self._probing:
+                    continue
+                self._probing.add(key)
+            self._next_probe[key] = now + self.probe_interval * random.uniform(
+                1 - self.jitter, 1 + self.jitter)
+            self._executor.submit(self._probe, instance)
+
+        for key in [key for key in self._next_probe if key not in live]:
+            del self._next_probe[key]
+            self._streaks.pop(key, None)
+
+    def _probe(self, instance: ServiceInstance):
+        key = (instance.service_name, instance.id)
+        try:
+            response = self.session.get(instance.endpoint + self.probe_path,
+                                        timeout=self.probe_timeout)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+
+        with self._lock:
+            self._probing.discard(key)
+            self.stats['probes'] += 1
+            streak = self._streaks.setdefault(key, [0, 0])  # [falhas, sucessos]
+            if ok:
+                streak[:] = [0, streak[1] + 1]
+            else:
+                self.stats['probe_failures'] += 1
+                streak[:] = [streak[0] + 1, 0]
+            failures, successes = streak
+
+        if not ok and failures >= self.failure_threshold and instance.healthy:
+            self.registry.set_health(instance, False, PROBE_FAILED)
+        elif ok and successes >= self.success_threshold and not instance.healthy \
+                and instance.health_reason == PROBE_FAILED:
+            # Heartbeat vencido só volta com heartbeat novo
+            self.registry.set_health(instance, True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                'probe_interval': self.probe_interval,
+                'probing': len(self._probing)
+            }
+
+    def close(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+        self.session.close()
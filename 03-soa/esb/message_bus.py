@@ -8,11 +8,38 @@ Componente central da arquitetura SOA que:
 - Monitora e registra comunicações
 """
 
+import itertools
 import json
+import os
+import time
 from datetime import datetime
-from typing import Dict, Any, Callable, Optional
+from typing import Dict, Any, Callable, Optional, Sequence
 import threading
 
+try:
+    from .dispatch import Dispatcher, DispatchError
+    from .circuit_breaker import BreakerRegistry, CircuitOpenError, create_breakers_from_env
+    from .registry import POWER_OF_TWO, default_instance_id
+    from .health import HealthMonitor
+    from .message_log import MessageLog, SegmentSpill
+    from .pubsub import Subscription, TopicRouter
+    from .durable_queue import DLQ_SUFFIX, DurableQueueBroker
+    from .transformer import ANY_OPERATION, TransformError, TransformerRegistry, compile_mapping
+    from .codec import DEFAULT_PREFERENCE, WirePayload
+except ImportError:  # executado como script (python message_bus.py)
+    from dispatch import Dispatcher, DispatchError
+    from circuit_breaker import BreakerRegistry, CircuitOpenError, create_breakers_from_env
+    from registry import POWER_OF_TWO, default_instance_id
+    from health import HealthMonitor
+    from message_log import MessageLog, SegmentSpill
+    from pubsub import Subscription, TopicRouter
+    from durable_queue import DLQ_SUFFIX, DurableQueueBroker
+    from transformer import ANY_OPERATION, TransformError, TransformerRegistry, compile_mapping
+    from codec import DEFAULT_PREFERENCE, WirePayload
+
+# Prefixo das filas de entrega confiável (uma por serviço destino)
+DELIVERY_QUEUE_PREFIX = 'deliver.'
+
 
 class MessageBus:
     """
@@ -20,35 +47,131 @@ class MessageBus:
     Todos os serviços se comunicam através deste barramento
     """
     
-    def __init__(self):
+    def __init__(self,
+                 log_max_messages: int = 10000,
+                 log_max_bytes: int = 16 * 1024 * 1024,
+                 log_spill_dir: Optional[str] = None,
+                 pool_size: int = 10,
+                 default_timeout: float = 5.0,
+                 breakers: Optional[BreakerRegistry] = None,
+                 load_balancing: str = POWER_OF_TWO,
+                 codecs: Sequence[str] = DEFAULT_PREFERENCE):
         self.services = {}  # Registro de serviços
-        self.message_log = []  # Log de mensagens
-        self.transformers = {}  # Transformadores de mensagens
+        # Entrega HTTP real: pool keep-alive por instância, rota por operação,
+        # balanceamento entre réplicas, circuit breaker por serviço,
+        # timeout adaptativo por operação e codec negociado por instância
+        self.dispatcher = Dispatcher(pool_size, default_timeout, breakers, load_balancing, codecs)
+        self.dispatcher.registry.add_listener(lambda instance: self._refresh_service(instance.service_name))
+        # Log de mensagens: ring buffer limitado (opcionalmente despejado em disco)
+        spill = SegmentSpill(log_spill_dir) if log_spill_dir else None
+        self.message_log = MessageLog(log_max_messages, log_max_bytes, spill)
+        # Transformadores compilados por (origem, destino, operação)
+        self.transformers = TransformerRegistry()
+        # Publish/subscribe: tópicos com fan-out para os assinantes
+        self.topics = TopicRouter(self._deliver_to_subscriber)
+        # Filas duráveis: só existem no processo que chamar enable_durable_queues
+        self.queues: Optional[DurableQueueBroker] = None
+        self._queue_workers: Dict[str, threading.Thread] = {}
+        # Heartbeats e sondas de /health: só no processo que chamar enable_health_checks
+        self.health: Optional[HealthMonitor] = None
         self.lock = threading.Lock()
+        self._message_ids = itertools.count(1)
     
-    def register_service(self, service_name: str, endpoint: str):
-        """Registra um serviço no ESB"""
+    def register_service(self, service_name: str, endpoint: str, pool_size: Optional[int] = None,
+                         instance_id: Optional[str] = None, ttl: Optional[float] = None,
+                         codecs: Optional[Sequence[str]] = None) -> str:
+        """
+        Registra uma instância do serviço no ESB (e cria seu pool de conexões)
+        Outro endpoint do mesmo serviço vira outra réplica; o mesmo
+        instance_id (padrão: host:porta do endpoint) substitui a anterior.
+        Com ttl, a instância precisa renovar o heartbeat (ver heartbeat).
+        codecs: formatos de corpo que a instância entende (padrão: só json).
+        Retorna o id da instância.
+        """
         with self.lock:
-            self.services[service_name] = {
-                'endpoint': endpoint,
-                'status': 'active',
-                'registered_at': datetime.utcnow().isoformat()
-            }
-            print(f"✅ Serviço registrado: {service_name} -> {endpoint}")
+            instance = self.dispatcher.register_client(service_name, endpoint, pool_size,
+                                                       instance_id, ttl, codecs)
+            self._refresh_service(service_name)
+            print(f"✅ Serviço registrado: {service_name} -> {endpoint} ({instance.id}, {instance.codec})")
+            return instance.id
     
-    def unregister_service(self, service_name: str):
-        """Remove um serviço do ESB"""
+    def unregister_service(self, service_name: str, instance_id: Optional[str] = None):
+        """Remove uma instância do serviço (ou o serviço inteiro, sem instance_id)"""
         with self.lock:
-            if service_name in self.services:
-                del self.services[service_name]
-                print(f"❌ Serviço removido: {service_name}")
+            if self.dispatcher.remove_client(service_name, instance_id):
+                print(f"❌ Serviço removido: {service_name}" + (f" ({instance_id})" if instance_id else ""))
+    
+    def heartbeat(self, service_name: str, endpoint: str, ttl: float,
+                  instance_id: Optional[str] = None,
+                  codecs: Optional[Sequence[str]] = None) -> str:
+        """Renova o TTL (e os codecs anunciados); a primeira batida registra a instância"""
+        instance_id = instance_id or default_instance_id(endpoint)
+        if self.dispatcher.registry.heartbeat(service_name, instance_id, ttl, codecs) is None:
+            self.register_service(service_name, endpoint, instance_id=instance_id, ttl=ttl,
+                                  codecs=codecs)
+        return instance_id
+    
+    def enable_health_checks(self, **options) -> HealthMonitor:
+        """
+        Liga o reaper de heartbeats e a sondagem de /health das instâncias
+        options: probe_interval, probe_timeout, probe_path, jitter,
+        failure_threshold, success_threshold, evict_after, probe_workers
+        """
+        if self.health is None:
+            self.health = HealthMonitor(self.dispatcher.registry, **options)
+        return self.health
+    
+    def drain_instance(self, service_name: str, instance_id: str, remove: bool = False) -> bool:
+        """
+        Tira a instância da rotação sem derrubar as requisições em voo
+        Com remove=True ela sai do registro quando a última terminar
+        """
+        instance = self.dispatcher.registry.drain(service_name, instance_id, remove)
+        if instance is None:
+            return False
+        print(f"🚰 Drenando {service_name} ({instance_id}), {instance.in_flight} em voo")
+        return True
+    
+    def activate_instance(self, service_name: str, instance_id: str) -> bool:
+        """Devolve uma instância drenada à rotação"""
+        return self.dispatcher.registry.activate(service_name, instance_id) is not None
+    
+    def set_load_balancing(self, service_name: str, strategy: str):
+        """Estratégia do serviço: round_robin, least_outstanding ou power_of_two"""
+        self.dispatcher.registry.set_strategy(service_name, strategy)
+    
+    def _refresh_service(self, service_name: str):
+        """Atualiza a entrada em self.services a partir do registro de instâncias (sem lock)"""
+        endpoints = self.dispatcher.registry.endpoints(service_name)
+        if not endpoints:
+            self.services.pop(service_name, None)
+            return
+        entry = self.services.get(service_name) or {
+            'status': 'active',
+            'registered_at': datetime.utcnow().isoformat()
+        }
+        entry['endpoints'] = endpoints
+        self.services[service_name] = entry
+    
+    def register_route(self,
+                       service_name: str,
+                       operation: str,
+                       method: str,
+                       path: str,
+                       timeout: Optional[float] = None):
+        """
+        Mapeia uma operação para uma rota HTTP do serviço
+        A rota pode usar campos do payload: '/orders/{order_id}'
+        """
+        self.dispatcher.register_route(service_name, operation, method, path, timeout)
     
     def send_message(self, 
                     from_service: str,
                     to_service: str,
                     operation: str,
                     payload: Dict[Any, Any],
-                    transform: bool = True) -> Dict[Any, Any]:
+                    transform: bool = True,
+                    correlation_id: Optional[str] = None) -> Dict[Any, Any]:
         """
         Envia mensagem de um serviço para outro através do ESB
         
@@ -58,15 +181,21 @@ class MessageBus:
             operation: Operação a ser executada
             payload: Dados da mensagem
             transform: Se deve aplicar transformações
+            correlation_id: Agrupa as mensagens de um mesmo fluxo no log
+                (ex: id da saga); padrão: o id da própria mensagem
         
         Returns:
             Resposta do serviço destino
         """
-        message_id = f"msg-{len(self.message_log) + 1}"
+        if not isinstance(payload, WirePayload):
+            # O JSON do payload feito para o log serve de corpo a destinos json
+            payload = WirePayload(payload)
+        message_id = f"msg-{next(self._message_ids)}"
         
         # Criar envelope da mensagem
         message = {
             'id': message_id,
+            'correlation_id': correlation_id or message_id,
             'from': from_service,
             'to': to_service,
             'operation': operation,
@@ -91,50 +220,279 @@ class MessageBus:
             return {'error': error_msg}
         
         # Aplicar transformações se necessário
-        if transform and f"{from_service}->{to_service}" in self.transformers:
+        transformer = self.transformers.lookup(from_service, to_service, operation) if transform else None
+        if transformer:
             print(f"   🔄 Aplicando transformação de mensagem")
-            transformer = self.transformers[f"{from_service}->{to_service}"]
-            payload = transformer(payload)
+            try:
+                payload = transformer(payload)
+            except TransformError as exc:
+                message['status'] = 'error'
+                message['error'] = f"Transformação recusou a mensagem: {exc}"
+                self._log_message(message)
+                return {'message_id': message_id, 'error': message['error'], 'status': 'invalid'}
+        
+        # Entregar ao serviço via HTTP (pool keep-alive do destino)
+        try:
+            status_code, body, latency_ms, wire = self.dispatcher.dispatch(to_service, operation, payload)
+        except CircuitOpenError as exc:
+            # Falha rápida: o destino está doente, nem tenta a rede
+            message['status'] = 'circuit_open'
+            message['error'] = str(exc)
+            self._log_message(message)
+            return {'message_id': message_id, 'error': str(exc), 'status': 'circuit_open'}
+        except DispatchError as exc:
+            message['status'] = 'error'
+            message['error'] = str(exc)
+            self._log_message(message)
+            return {'message_id': message_id, 'error': str(exc)}
+        
+        message['status_code'] = status_code
+        message['latency_ms'] = round(latency_ms, 3)
+        message['wire'] = wire  # codec, bytes e tempo de (de)codificação
+        
+        if status_code >= 400:
+            error_msg = body.get('error') if isinstance(body, dict) else None
+            message['status'] = 'error'
+            message['error'] = error_msg or f"HTTP {status_code}"
+            self._log_message(message)
+            return {
+                'message_id': message_id,
+                'error': message['error'],
+                'status_code': status_code,
+                'payload': body
+            }
         
-        # Simular envio para o serviço (em produção seria HTTP/SOAP/etc)
         message['status'] = 'delivered'
         self._log_message(message)
         
         return {
             'message_id': message_id,
             'status': 'delivered',
-            'payload': payload
+            'status_code': status_code,
+            'payload': body
         }
     
+    def subscribe(self,
+                  topic: str,
+                  subscriber: str,
+                  handler: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                  **options) -> Subscription:
+        """
+        Assina um tópico
+        
+        Args:
+            topic: Nome do tópico (ex: 'orders')
+            subscriber: Serviço assinante (recebe via ESB se não houver handler)
+            handler: Callable local opcional que recebe o envelope
+            options: operation (filtro de operação), filters (campo -> valor
+                do payload), target_operation (operação entregue ao serviço,
+                padrão = a publicada), queue_size, policy ('drop'|'block'),
+                block_timeout
+        """
+        subscription = self.topics.subscribe(topic, subscriber, handler, **options)
+        print(f"📬 Assinatura {subscription.id}: {subscriber} <- {topic} "
+              f"({subscription.operation}, filtros={subscription.filters})")
+        return subscription
+    
+    def unsubscribe(self, subscription_id: str) -> bool:
+        """Cancela uma assinatura (a fila pendente ainda é entregue)"""
+        return self.topics.unsubscribe(subscription_id)
+    
+    def publish(self,
+                from_service: str,
+                topic: str,
+                operation: str,
+                payload: Dict[Any, Any],
+                correlation_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Publica um evento no tópico; cada assinante que casa recebe uma cópia
+        pela sua fila. Não espera as entregas (fan-out assíncrono).
+        As entregas herdam o correlation_id da publicação.
+        O payload é codificado uma vez por codec e reaproveitado pelos assinantes.
+        """
+        if not isinstance(payload, WirePayload):
+            payload = WirePayload(payload)
+        message_id = f"msg-{next(self._message_ids)}"
+        message = {
+            'id': message_id,
+            'correlation_id': correlation_id or message_id,
+            'from': from_service,
+            'to': f"topic:{topic}",
+            'operation': operation,
+            'payload': payload,
+            'timestamp': datetime.utcnow().isoformat(),
+            'status': 'routing'
+        }
+        self._log_message(message)
+        
+        result = self.topics.publish(topic, message)
+        message['status'] = 'published'
+        message.update(result)
+        self._log_message(message)
+        
+        print(f"\n📣 ESB: {message_id} publicado em {topic} ({operation}) -> "
+              f"{result['enqueued']}/{result['matched']} assinantes")
+        return {'message_id': message_id, 'status': 'published', **result}
+    
+    def _deliver_to_subscriber(self, subscription: Subscription, message: Dict[str, Any]) -> bool:
+        """Entrega uma publicação ao serviço assinante como mensagem ponto a ponto"""
+        response = self.send_message(
+            from_service=message['from'],
+            to_service=subscription.subscriber,
+            operation=subscription.target_operation or message['operation'],
+            payload=message['payload'],
+            correlation_id=message['correlation_id']
+        )
+        return 'error' not in response
+    
+    def enable_durable_queues(self, path: str, **options) -> DurableQueueBroker:
+        """
+        Ativa as filas duráveis (SQLite em `path`) para send_reliable
+        Mensagens pendentes de uma execução anterior voltam a ser entregues.
+        options: visibility_timeout, max_attempts, backoff_base, backoff_max, commit_interval
+        """
+        with self.lock:
+            if self.queues is None:
+                self.queues = DurableQueueBroker(path, **options)
+        for queue_name in self.queues.queue_names():
+            if queue_name.startswith(DELIVERY_QUEUE_PREFIX) and not queue_name.endswith(DLQ_SUFFIX):
+                self._ensure_queue_worker(queue_name[len(DELIVERY_QUEUE_PREFIX):])
+        return self.queues
+    
+    def send_reliable(self,
+                      from_service: str,
+                      to_service: str,
+                      operation: str,
+                      payload: Dict[Any, Any],
+                      correlation_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Entrega pelo menos uma vez: a mensagem é gravada na fila durável do
+        destino e um worker a entrega, com retry e backoff enquanto o
+        serviço estiver fora; respostas 4xx (exceto 408/429) vão para a DLQ.
+        Sem filas duráveis ativas, cai no send_message direto.
+        """
+        if self.queues is None:
+            return self.send_message(from_service, to_service, operation, payload,
+                                     correlation_id=correlation_id)
+        
+        queue_name = DELIVERY_QUEUE_PREFIX + to_service
+        queued_id = self.queues.enqueue(queue_name, {
+            'from': from_service,
+            'operation': operation,
+            'payload': payload,
+            'correlation_id': correlation_id
+        })
+        self._ensure_queue_worker(to_service)
+        print(f"\n📥 ESB: {operation} para {to_service} gravada na fila durável (#{queued_id})")
+        return {'queued_id': queued_id, 'queue': queue_name, 'status': 'queued'}
+    
+    def _ensure_queue_worker(self, to_service: str):
+        with self.lock:
+            worker = self._queue_workers.get(to_service)
+            if worker is None or not worker.is_alive():
+                worker = threading.Thread(target=self._queue_worker, args=(to_service,),
+                                          daemon=True, name=f'deliver-{to_service}')
+                self._queue_workers[to_service] = worker
+                worker.start()
+    
+    def _queue_worker(self, to_service: str):
+        """
+        Consome a fila de entrega do serviço: ack no sucesso, nack na falha
+        Erro inesperado (do envio ou do broker) não derruba o worker: a
+        mensagem volta com retry e o loop continua
+        """
+        queue_name = DELIVERY_QUEUE_PREFIX + to_service
+        while True:
+            try:
+                batch = self.queues.receive(queue_name, max_messages=10, wait=1.0)
+            except Exception as exc:
+                print(f"⚠️  Fila {queue_name}: falha ao receber ({exc.__class__.__name__}: {exc})")
+                time.sleep(1.0)
+                continue
+            for queued in batch:
+                try:
+                    self._deliver_queued(queue_name, to_service, queued)
+                except Exception as exc:
+                    error = f"Erro interno na entrega: {exc.__class__.__name__}: {exc}"
+                    print(f"⚠️  Fila {queue_name}: #{queued['id']} {error}")
+                    try:
+                        self.queues.nack(queue_name, queued['id'], queued['receipt'],
+                                         error=error, retry=True)
+                    except Exception:
+                        pass  # sem nack, a visibilidade expira e a mensagem volta
+    
+    def _deliver_queued(self, queue_name: str, to_service: str, queued: Dict[str, Any]):
+        message = queued['body']
+        response = self.send_message(message['from'], to_service,
+                                     message['operation'], message['payload'],
+                                     correlation_id=message.get('correlation_id'))
+        if 'error' not in response:
+            self.queues.ack(queue_name, queued['id'], queued['receipt'])
+            return
+        status_code = response.get('status_code')
+        permanent = response.get('status') == 'invalid' or (
+            status_code is not None and 400 <= status_code < 500
+            and status_code not in (408, 429))
+        self.queues.nack(queue_name, queued['id'], queued['receipt'],
+                         error=response['error'], retry=not permanent)
+    
     def register_transformer(self, 
                            from_service: str,
                            to_service: str,
-                           transformer: Callable):
+                           *transformers,
+                           operation: str = ANY_OPERATION) -> Callable:
         """
         Registra um transformador de mensagens entre dois serviços
         Característica importante do ESB
+        Aceita funções ou specs declarativas (compiladas aqui, uma vez);
+        vários transformadores formam uma cadeia aplicada em ordem
         """
-        key = f"{from_service}->{to_service}"
-        self.transformers[key] = transformer
-        print(f"🔄 Transformador registrado: {key}")
+        transformer = self.transformers.register(from_service, to_service, *transformers,
+                                                 operation=operation)
+        suffix = '' if operation == ANY_OPERATION else f" ({operation})"
+        print(f"🔄 Transformador registrado: {from_service}->{to_service}{suffix}")
+        return transformer
     
     def _log_message(self, message: Dict[Any, Any]):
-        """Registra mensagem no log (auditoria)"""
-        with self.lock:
-            self.message_log.append(message.copy())
+        """
+        Registra mensagem no log (auditoria)
+        O payload só entra no primeiro registro; mudanças de status
+        seguintes registram apenas o envelope
+        """
+        if message['status'] == 'routing':
+            entry = message
+        else:
+            entry = {key: value for key, value in message.items() if key != 'payload'}
+        self.message_log.append(entry)
     
-    def get_message_log(self, limit: int = 50) -> list:
-        """Retorna log de mensagens (monitoramento)"""
-        with self.lock:
-            return self.message_log[-limit:]
+    def get_message_log(self, limit: int = 50, offset: int = 0) -> list:
+        """Retorna log de mensagens (monitoramento), só a janela pedida"""
+        return self.message_log.window(limit, offset)
+    
+    def query_messages(self, filters: Optional[Dict[str, Any]] = None,
+                       cursor: Optional[int] = None, limit: int = 50,
+                       since: Optional[str] = None, until: Optional[str] = None):
+        """Consulta indexada do log (ver MessageLog.query): (entradas, próximo cursor)"""
+        return self.message_log.query(filters, cursor, limit, since, until)
+    
+    def get_correlation(self, correlation_id: str) -> list:
+        """Todas as mensagens de um fluxo (ex: saga), em ordem cronológica"""
+        return self.message_log.by_correlation(correlation_id)
     
     def get_service_status(self) -> Dict[str, Any]:
         """Retorna status de todos os serviços"""
         with self.lock:
             return {
                 'services': self.services.copy(),
-                'total_messages': len(self.message_log),
-                'transformers': list(self.transformers.keys())
+                'total_messages': self.message_log.total_logged,
+                'message_log': self.message_log.get_stats(),
+                'dispatch': self.dispatcher.get_metrics(),
+                'codecs': self.dispatcher.codecs.get_stats(),
+                'breakers': self.dispatcher.breakers.get_status() if self.dispatcher.breakers else None,
+                'pubsub': self.topics.get_stats(),
+                'queues': self.queues.get_stats() if self.queues else None,
+                'health': self.health.get_stats() if self.health else None,
+                'transformers': self.transformers.keys()
             }
     
     def health_check(self) -> Dict[str, Any]:
@@ -142,32 +500,38 @@ class MessageBus:
         return {
             'status': 'healthy',
             'services_count': len(self.services),
-            'messages_processed': len(self.message_log),
+            'messages_processed': self.message_log.total_logged,
             'uptime': 'active'
         }
 
 
 # Instância global do ESB (singleton)
-esb = MessageBus()
-
+esb = MessageBus(
+    log_max_messages=int(os.environ.get('ESB_LOG_MAX_MESSAGES', 10000)),
+    log_max_bytes=int(os.environ.get('ESB_LOG_MAX_BYTES', 16 * 1024 * 1024)),
+    log_spill_dir=os.environ.get('ESB_LOG_SPILL_DIR'),  # ex: /var/log/esb
+    pool_size=int(os.environ.get('ESB_POOL_SIZE', 10)),
+    default_timeout=float(os.environ.get('ESB_DEFAULT_TIMEOUT', 5.0)),
+    load_balancing=os.environ.get('ESB_LOAD_BALANCING', POWER_OF_TWO),
+    codecs=os.environ.get('ESB_CODECS', ','.join(DEFAULT_PREFERENCE)).split(','),
+    breakers=create_breakers_from_env() if os.environ.get('ESB_CIRCUIT_BREAKERS', '1') == '1' else None
+)
 
-# Exemplo de transformadores
-def transform_user_to_customer(payload: Dict) -> Dict:
-    """Transforma formato de usuário para cliente"""
-    return {
-        'customer_id': payload.get('user_id'),
-        'customer_name': payload.get('username'),
-        'customer_email': payload.get('email')
-    }
 
+# Exemplo de transformadores (specs declarativas compiladas uma vez)
+# Transforma formato de usuário para cliente
+transform_user_to_customer = compile_mapping({
+    'customer_id': 'user_id',
+    'customer_name': 'username',
+    'customer_email': 'email'
+}, name='transform_user_to_customer')
 
-def transform_order_to_payment(payload: Dict) -> Dict:
-    """Transforma formato de pedido para pagamento"""
-    return {
-        'transaction_id': payload.get('order_id'),
-        'amount': payload.get('total'),
-        'currency': 'BRL'
-    }
+# Transforma formato de pedido para pagamento
+transform_order_to_payment = compile_mapping({
+    'transaction_id': 'order_id',
+    'amount': {'from': 'total', 'type': 'float'},
+    'currency': {'const': 'BRL'}
+}, name='transform_order_to_payment')
 
 
 if __name__ == '__main__':
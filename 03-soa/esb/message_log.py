@@ -0,0 +1,310 @@
+"""
+Log de Mensagens do ESB - Ring Buffer
+=====================================
+Buffer circular de capacidade fixa para o log de auditoria do ESB:
+- Retenção por quantidade de mensagens e por bytes
+- Cada entrada é guardada já serializada (imutável, sem cópias); o payload
+  em JSON é o mesmo corpo enviado a destinos json (codec.WirePayload)
+- Entradas descartadas podem ser despejadas em segmentos append-only no disco
+- Consultas decodificam apenas a janela pedida
+- Índices invertidos (id, origem, destino, operação, status, correlação e
+  minuto) sobre as entradas em memória: filtros e cursores sem varrer o log
+"""
+
+import bisect
+import heapq
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from .codec import CodecError, WirePayload, json_bytes
+except ImportError:  # executado como script
+    from codec import CodecError, WirePayload, json_bytes
+
+# Campos indexados; o minuto vem de 'timestamp' (AAAA-MM-DDTHH:MM)
+INDEXED_FIELDS = ('id', 'from', 'to', 'operation', 'status', 'correlation_id')
+MINUTE = 'minute'
+
+
+class SegmentSpill:
+    """
+    Arquivos de segmento append-only (JSON lines) para entradas que saíram
+    da memória. Ao atingir segment_bytes o segmento é fechado e outro é
+    aberto; apenas os max_segments mais recentes são mantidos.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 8 * 1024 * 1024,
+                 max_segments: int = 16):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+
+        existing = self.segments()
+        self._sequence = int(existing[-1][9:15]) if existing else 0
+        self._file = None
+        self._written = 0
+
+    def segments(self) -> List[str]:
+        """Nomes dos segmentos em ordem (mais antigo primeiro)"""
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith('messages-') and name.endswith('.log'))
+
+    def _rotate(self):
+        if self._file:
+            self._file.close()
+        self._sequence += 1
+        path = os.path.join(self.directory, f"messages-{self._sequence:06d}.log")
+        self._file = open(path, 'ab')
+        self._written = 0
+
+        for name in self.segments()[:-self.max_segments]:
+            os.remove(os.path.join(self.directory, name))
+
+    def write(self, encoded: bytes):
+        if self._file is None or self._written >= self.segment_bytes:
+            self._rotate()
+        self._file.write(encoded + b'\n')
+        self._written += len(encoded) + 1
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class _Postings:
+    """
+    Sequências (crescentes) das entradas com um valor de campo. As
+    remoções são sempre da mais antiga (o ring buffer descarta em ordem),
+    então basta avançar `start` e compactar de vez em quando.
+    """
+
+    __slots__ = ('items', 'start')
+
+    def __init__(self):
+        self.items: List[int] = []
+        self.start = 0
+
+    def __len__(self) -> int:
+        return len(self.items) - self.start
+
+    def append(self, sequence: int):
+        self.items.append(sequence)
+
+    def pop_oldest(self):
+        self.start += 1
+        if self.start > 64 and self.start * 2 > len(self.items):
+            del self.items[:self.start]
+            self.start = 0
+
+    def descending(self, before: Optional[int]) -> Iterator[int]:
+        """Sequências < before, da mais recente para a mais antiga"""
+        end = len(self.items) if before is None else \
+            bisect.bisect_left(self.items, before, self.start)
+        for i in range(end - 1, self.start - 1, -1):
+            yield self.items[i]
+
+
+class MessageLog:
+    """
+    Ring buffer com retenção por quantidade (max_messages) e por bytes
+    (max_bytes). A entrada mais antiga é descartada (ou despejada no
+    disco, se houver spill) para abrir espaço para a nova.
+    """
+
+    def __init__(self, max_messages: int = 10000, max_bytes: int = 16 * 1024 * 1024,
+                 spill: Optional[SegmentSpill] = None):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.spill = spill
+
+        self._slots: List[Optional[bytes]] = [None] * max_messages
+        # Chaves de índice de cada slot, para tirar a entrada dos índices ao descartá-la
+        self._slot_keys: List[Tuple[Tuple[str, Any], ...]] = [()] * max_messages
+        self._index: Dict[Tuple[str, Any], _Postings] = {}
+        self._minutes: List[str] = []  # minutos presentes no índice, ordenados (since/until)
+        self._head = 0  # índice da entrada mais antiga
+        self._size = 0
+        self._bytes = 0
+        self.total_logged = 0
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _index_keys(entry: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+        keys = [(field, entry[field]) for field in INDEXED_FIELDS if entry.get(field) is not None]
+        if isinstance(entry.get('timestamp'), str):
+            keys.append((MINUTE, entry['timestamp'][:16]))
+        return tuple(keys)
+
+    @staticmethod
+    def _encode(entry: Dict[str, Any]) -> bytes:
+        payload = entry.get('payload')
+        if isinstance(payload, WirePayload):
+            # Só o envelope é serializado aqui; o payload reaproveita os bytes JSON
+            try:
+                payload_json = json_bytes(payload)
+            except CodecError:
+                pass
+            else:
+                envelope = json.dumps({key: value for key, value in entry.items() if key != 'payload'},
+                                      ensure_ascii=False, default=str)
+                return envelope[:-1].encode('utf-8') + b', "payload": ' + payload_json + b'}'
+        return json.dumps(entry, ensure_ascii=False, default=str).encode('utf-8')
+
+    def append(self, entry: Dict[str, Any]) -> int:
+        """Serializa a entrada uma única vez, insere no buffer e indexa; retorna a sequência"""
+        encoded = self._encode(entry)
+        keys = self._index_keys(entry)
+
+        with self.lock:
+            while self._size and (self._size == self.max_messages or
+                                  self._bytes + len(encoded) > self.max_bytes):
+                self._evict_oldest()
+
+            slot = (self._head + self._size) % self.max_messages
+            self._slots[slot] = encoded
+            self._slot_keys[slot] = keys
+            sequence = self.total_logged
+            for key in keys:
+                postings = self._index.get(key)
+                if postings is None:
+                    postings = self._index[key] = _Postings()
+                    if key[0] == MINUTE:
+                        bisect.insort(self._minutes, key[1])
+                postings.append(sequence)
+            self._size += 1
+            self._bytes += len(encoded)
+            self.total_logged += 1
+        return sequence
+
+    def _evict_oldest(self):
+        encoded = self._slots[self._head]
+        self._slots[self._head] = None
+        for key in self._slot_keys[self._head]:
+            postings = self._index[key]
+            postings.pop_oldest()
+            if not postings:
+                del self._index[key]
+                if key[0] == MINUTE:
+                    del self._minutes[bisect.bisect_left(self._minutes, key[1])]
+        self._slot_keys[self._head] = ()
+        self._head = (self._head + 1) % self.max_messages
+        self._size -= 1
+        self._bytes -= len(encoded)
+        self.evicted += 1
+
+        if self.spill:
+            self.spill.write(encoded)
+
+    def window(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Entradas em ordem cronológica, terminando `offset` entradas antes
+        da mais recente. Só a janela é copiada e decodificada.
+        """
+        with self.lock:
+            end = max(self._size - max(offset, 0), 0)
+            start = max(end - max(limit, 0), 0)
+            selected = [self._slots[(self._head + i) % self.max_messages]
+                        for i in range(start, end)]
+
+        return [json.loads(encoded) for encoded in selected]
+
+    def query(self, filters: Optional[Dict[str, Any]] = None, cursor: Optional[int] = None,
+              limit: int = 50, since: Optional[str] = None,
+              until: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Entradas que casam com todos os filtros (campo -> valor, campos de
+        INDEXED_FIELDS ou 'minute'), da mais recente para a mais antiga.
+        since/until limitam pelo minuto (AAAA-MM-DDTHH:MM, inclusive): os
+        postings dos minutos do intervalo são intercalados, como um filtro.
+        Percorre o menor conjunto de postings (um filtro ou o intervalo) e
+        confere o resto pelas chaves do slot, sem decodificar. Retorna
+        (entradas, cursor da próxima página ou None); cada entrada ganha 'seq'.
+        """
+        wanted = {(field, value) for field, value in (filters or {}).items() if value is not None}
+        since, until = since and since[:16], until and until[:16]
+        selected: List[Tuple[int, bytes]] = []
+        next_cursor = None
+
+        with self.lock:
+            first = self.total_logged - self._size
+            postings = [self._index.get(key) for key in wanted]
+            if not all(postings):
+                return [], None
+            smallest = min(postings, key=len) if postings else None
+
+            in_range = None
+            if since or until:
+                lo = bisect.bisect_left(self._minutes, since) if since else 0
+                hi = bisect.bisect_right(self._minutes, until) if until else len(self._minutes)
+                in_range = [self._index[(MINUTE, minute)] for minute in self._minutes[lo:hi]]
+                if not in_range:
+                    return [], None
+
+            # Fonte dos candidatos: o que tiver menos sequências
+            check_wanted, check_range = len(wanted) > 1, in_range is not None
+            if in_range is not None and (smallest is None or
+                                         sum(map(len, in_range)) < len(smallest)):
+                candidates = heapq.merge(*(minute.descending(cursor) for minute in in_range),
+                                         reverse=True)
+                check_wanted, check_range = bool(wanted), False
+            elif smallest is not None:
+                candidates = smallest.descending(cursor)
+            else:
+                end = self.total_logged if cursor is None else min(cursor, self.total_logged)
+                candidates = iter(range(end - 1, first - 1, -1))
+
+            for sequence in candidates:
+                slot = (self._head + sequence - first) % self.max_messages
+                keys = self._slot_keys[slot]
+                if check_wanted and not wanted.issubset(keys):
+                    continue
+                if check_range:
+                    minute = next((value for field, value in keys if field == MINUTE), None)
+                    if minute is None or (until and minute > until) or (since and minute < since):
+                        continue
+                if len(selected) == limit:
+                    next_cursor = selected[-1][0]
+                    break
+                selected.append((sequence, self._slots[slot]))
+
+        return [dict(json.loads(encoded), seq=sequence) for sequence, encoded in selected], next_cursor
+
+    def by_correlation(self, correlation_id: str, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Todas as entradas de uma correlação (ex: uma saga), em ordem cronológica"""
+        entries, _ = self.query({'correlation_id': correlation_id}, limit=limit)
+        entries.reverse()
+        return entries
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Ocupação do buffer e contadores"""
+        with self.lock:
+            stats = {
+                'buffered_messages': self._size,
+                'buffered_bytes': self._bytes,
+                'max_messages': self.max_messages,
+                'max_bytes': self.max_bytes,
+                'total_logged': self.total_logged,
+                'evicted': self.evicted,
+                'index_keys': len(self._index)
+            }
+            if self.spill:
+                self.spill.flush()
+                stats['spill_segments'] = self.spill.segments()
+        return stats
+
+    def close(self):
+        if self.spill:
+            with self.lock:
+                self.spill.close()
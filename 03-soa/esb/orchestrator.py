@@ -5,8 +5,18 @@ Coordena fluxos complexos que envolvem múltiplos serviços
 Característica importante de SOA
 """
 
-from message_bus import esb
-from typing import Dict, Any
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from .message_bus import esb
+    from .saga import (COMPENSATED, COMPLETED, FAILED, SagaDefinition, SagaEngine, SagaStep,
+                       StepFailed, StepRetry)
+except ImportError:  # executado como script (python orchestrator.py)
+    from message_bus import esb
+    from saga import (COMPENSATED, COMPLETED, FAILED, SagaDefinition, SagaEngine, SagaStep,
+                      StepFailed, StepRetry)
 
 
 class ServiceOrchestrator:
@@ -15,183 +25,419 @@ class ServiceOrchestrator:
     Em SOA, orquestrações complexas são gerenciadas centralmente
     """
     
-    def __init__(self, esb_instance):
+    def __init__(self, esb_instance, deadline: float = 10.0, max_workers: int = 32,
+                 saga_workers: int = 16, saga_timeout: float = 30.0):
         self.esb = esb_instance
+        self.deadline = deadline  # prazo global de cada fan-out (segundos)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix='orchestrator')
+        # Sagas: estado em memória até enable_saga_persistence (gateway)
+        self.saga_timeout = saga_timeout  # espera da resposta HTTP; a saga continua depois
+        self.sagas = SagaEngine(workers=saga_workers)
+        self.sagas.register(SagaDefinition('order_creation', [
+            SagaStep('validate', self._validate),
+            SagaStep('create_order', self._create_order, self._cancel_created_order),
+            SagaStep('process_payment', self._process_payment, self._refund_payment),
+            SagaStep('reserve_stock', self._reserve_stock, self._release_reservation),
+            SagaStep('publish', self._publish_confirmed),
+        ]))
+        self.sagas.register(SagaDefinition('order_cancellation', [
+            SagaStep('load_order', self._load_order),
+            SagaStep('refund', self._refund_order),
+            SagaStep('return_stock', self._return_stock),
+            SagaStep('cancel_order', self._cancel_order),
+            SagaStep('publish', self._publish_cancelled),
+        ]))
+    
+    def enable_saga_persistence(self, store) -> int:
+        """
+        Persiste as sagas no store (ex: shared.open_store('sagas')) e retoma
+        as que ficaram em andamento; retorna quantas foram retomadas
+        """
+        resumed = self.sagas.attach_store(store)
+        if resumed:
+            print(f"🎭 {resumed} saga(s) retomada(s)")
+        return resumed
+    
+    @staticmethod
+    def _message(to_service: str, operation: str, payload: Dict[str, Any],
+                 correlation_id: Optional[str] = None) -> Dict[str, Any]:
+        """Argumentos de send_message para uma chamada do orquestrador"""
+        return {
+            'from_service': 'orchestrator',
+            'to_service': to_service,
+            'operation': operation,
+            'payload': payload,
+            'correlation_id': correlation_id
+        }
+    
+    @staticmethod
+    def _succeeded(response: Dict[str, Any]) -> bool:
+        return 'error' not in response
+    
+    @staticmethod
+    def _transient(response: Dict[str, Any]) -> bool:
+        """Falha que pode passar sozinha: serviço fora, timeout, 5xx, breaker aberto, ESB saturado"""
+        if response.get('status') == 'invalid':
+            return False
+        status_code = response.get('status_code')
+        return status_code is None or status_code >= 500 or status_code in (408, 429)
+    
+    def _forward(self, response: Dict[str, Any], error: str, step: str, accept: tuple = ()):
+        """
+        Resultado de um passo que só avança: falha transitória repete o passo
+        (StepRetry, com backoff), as demais encerram a saga (StepFailed)
+        """
+        if 'error' not in response or response.get('status_code') in accept:
+            return
+        if self._transient(response):
+            raise StepRetry(f"{error}: {response['error']}", step=step)
+        raise StepFailed(f"{error}: {response['error']}", step=step)
+    
+    @staticmethod
+    def _in_stock(response: Dict[str, Any]) -> bool:
+        return 'error' not in response and bool(response['payload'].get('available'))
+    
+    @staticmethod
+    def _unavailable_products(response: Dict[str, Any], items: list) -> list:
+        """Produtos recusados pela verificação/reserva em lote"""
+        payload = response.get('payload') or {}
+        return (payload.get('missing') or []) + (payload.get('unavailable') or []) or \
+            [item['product_id'] for item in items]
+    
+    @staticmethod
+    def _stock_refusal(response: Dict[str, Any], items: list) -> Tuple[str, list]:
+        """
+        (mensagem, produtos) da recusa de estoque. Erro sem lista de produtos
+        (ex: quantidade inválida, serviço fora) mantém a mensagem original.
+        """
+        payload = response.get('payload') or {}
+        if 'error' in response and not (payload.get('missing') or payload.get('unavailable')):
+            return response['error'], []
+        products = ServiceOrchestrator._unavailable_products(response, items)
+        return (f"Produto {products[0]} indisponível" if products else 'Produtos indisponíveis'), products
+    
+    @staticmethod
+    def _invalid_items(items: Any) -> Optional[str]:
+        """Motivo para recusar o carrinho antes de abrir a saga (None se válido)"""
+        if not isinstance(items, list) or not items:
+            return 'items é obrigatório (lista não vazia de {product_id, quantity})'
+        if not all(isinstance(item, dict) and item.get('product_id') is not None for item in items):
+            return 'Cada item precisa de product_id'
+        return None
+    
+    def scatter_gather(self,
+                       calls: List[Tuple[Dict[str, Any], Callable[[Dict[str, Any]], bool]]],
+                       deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Envia mensagens independentes em paralelo e agrega as respostas
+        
+        Args:
+            calls: lista de (argumentos de send_message, checagem de sucesso)
+            deadline: prazo global em segundos (padrão: self.deadline)
+        
+        Returns:
+            {'ok', 'results' (na ordem de calls; None se não concluída),
+             'failed_index', 'timed_out'}. Para no primeiro erro ou no prazo,
+            cancelando as chamadas que ainda não começaram.
+        """
+        futures = {self.executor.submit(self.esb.send_message, **kwargs): index
+                   for index, (kwargs, _) in enumerate(calls)}
+        results: List[Optional[Dict[str, Any]]] = [None] * len(calls)
+        outcome = {'ok': True, 'results': results, 'failed_index': None, 'timed_out': False}
+        
+        try:
+            for future in as_completed(futures, timeout=deadline or self.deadline):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as exc:
+                    results[index] = {'error': str(exc)}
+                
+                if not calls[index][1](results[index]):
+                    outcome.update(ok=False, failed_index=index)
+                    break
+        except FuturesTimeout:
+            outcome.update(ok=False, timed_out=True)
+        finally:
+            for future in futures:
+                future.cancel()
+        
+        return outcome
     
     def orchestrate_order_creation(self, user_id: int, items: list) -> Dict[str, Any]:
         """
-        Orquestra o processo completo de criação de pedido:
+        Orquestra o processo completo de criação de pedido (saga persistente):
         1. Validar usuário (auth-service)
-        2. Validar produtos e estoque (product-service)
-        3. Criar pedido (order-service)
-        4. Processar pagamento (payment-service)
-        5. Atualizar estoque (product-service)
+        2. Validar produtos e estoque (product-service), em paralelo com o passo 1
+        3. Criar pedido (order-service)            ↩ cancelar pedido
+        4. Processar pagamento (payment-service)   ↩ estornar
+        5. Atualizar estoque (product-service)     ↩ devolver a reserva
+        6. Publicar order_confirmed
         """
+        invalid = self._invalid_items(items)
+        if invalid:
+            return {'error': invalid, 'step': 'validation'}
+        
         print("\n🎭 ORQUESTRAÇÃO: Criação de Pedido")
         print("="*50)
         
-        # Passo 1: Validar usuário
-        print("1️⃣  Validando usuário...")
-        user_response = self.esb.send_message(
-            from_service='orchestrator',
-            to_service='auth-service',
-            operation='validate_user',
-            payload={'user_id': user_id}
-        )
+        state = self.sagas.run('order_creation', {'user_id': user_id, 'items': items},
+                               timeout=self.saga_timeout)
         
-        if 'error' in user_response:
-            return {'error': 'Usuário inválido', 'step': 'auth'}
+        if state['status'] == COMPLETED:
+            print("✅ Orquestração concluída com sucesso!")
+            print("="*50 + "\n")
+            return {
+                'success': True,
+                'order_id': state['data']['order_id'],
+                'total': state['data']['total'],
+                'status': 'completed',
+                'saga_id': state['id']
+            }
+        return self._saga_error(state)
+    
+    def orchestrate_order_cancellation(self, order_id: int) -> Dict[str, Any]:
+        """
+        Orquestra o cancelamento de pedido (saga persistente, só avança;
+        cada passo é repetido com backoff enquanto o serviço estiver fora):
+        1. Buscar pedido (order-service)
+        2. Processar estorno (payment-service)
+        3. Devolver estoque (product-service)
+        4. Cancelar pedido (order-service)
+        5. Publicar order_cancelled
+        """
+        print("\n🎭 ORQUESTRAÇÃO: Cancelamento de Pedido")
+        print("="*50)
         
-        # Passo 2: Validar produtos
-        print("2️⃣  Validando produtos e estoque...")
-        for item in items:
-            product_response = self.esb.send_message(
-                from_service='orchestrator',
-                to_service='product-service',
-                operation='check_stock',
-                payload={
-                    'product_id': item['product_id'],
-                    'quantity': item['quantity']
-                }
-            )
-            
-            if 'error' in product_response:
-                return {'error': f"Produto {item['product_id']} indisponível", 'step': 'products'}
+        state = self.sagas.run('order_cancellation', {'order_id': order_id},
+                               timeout=self.saga_timeout)
         
-        # Passo 3: Criar pedido
+        if state['status'] == COMPLETED:
+            print("✅ Cancelamento concluído!")
+            print("="*50 + "\n")
+            return {
+                'success': True,
+                'order_id': order_id,
+                'status': 'cancelled',
+                'saga_id': state['id']
+            }
+        return self._saga_error(state)
+    
+    @staticmethod
+    def _saga_error(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Erro da saga; se ainda não terminou (timeout), ela segue em segundo plano"""
+        if state['status'] in (COMPENSATED, FAILED):
+            return {**state['error'], 'saga_id': state['id'], 'saga_status': state['status']}
+        return {'error': 'Saga ainda em andamento', 'saga_id': state['id'],
+                'saga_status': state['status']}
+    
+    # Passos da criação de pedido --------------------------------------------
+    # Ações idempotentes: chaves derivadas do id da saga tornam a repetição
+    # de um passo interrompido (recuperação) inofensiva.
+    
+    def _validate(self, data: Dict[str, Any]) -> None:
+        print("1️⃣ 2️⃣  Validando usuário, produtos e estoque em paralelo...")
+        items = data['items']
+        validation = self.scatter_gather(
+            [(self._message('auth-service', 'validate_user', {'user_id': data['user_id']},
+                            data['saga_id']), self._succeeded)] +
+            [(self._message('product-service', 'check_stock', {'items': items},
+                            data['saga_id']), self._in_stock)]
+        )
+        
+        if validation['timed_out']:
+            raise StepFailed('Tempo esgotado na validação', step='validation')
+        if validation['failed_index'] == 0:
+            raise StepFailed('Usuário inválido', step='auth')
+        if not validation['ok']:
+            error, unavailable = self._stock_refusal(validation['results'][1], items)
+            raise StepFailed(error, products=unavailable, step='products')
+    
+    def _create_order(self, data: Dict[str, Any]) -> Dict[str, Any]:
         print("3️⃣  Criando pedido...")
         order_response = self.esb.send_message(
             from_service='orchestrator',
             to_service='order-service',
             operation='create_order',
             payload={
-                'user_id': user_id,
-                'items': items
-            }
+                'user_id': data['user_id'],
+                'items': data['items'],
+                'reserve_on_confirm': False,  # estoque é baixado no passo 5
+                'reservation_id': f"{data['saga_id']}:stock",
+                'idempotency_key': f"{data['saga_id']}:order"
+            },
+            correlation_id=data['saga_id']
         )
         
         if 'error' in order_response:
-            return {'error': 'Erro ao criar pedido', 'step': 'order'}
-        
-        order_id = order_response['payload'].get('order_id')
-        total = order_response['payload'].get('total')
+            raise StepFailed('Erro ao criar pedido', step='order')
         
-        # Passo 4: Processar pagamento
+        return {'order_id': order_response['payload'].get('id')}
+    
+    def _cancel_created_order(self, data: Dict[str, Any]) -> None:
+        # Compensação: cancelar pedido (fila durável: reentregue até o serviço aceitar)
+        if data.get('order_id'):
+            print("↩️  Cancelando pedido...")
+            self.esb.send_reliable(
+                from_service='orchestrator',
+                to_service='order-service',
+                operation='cancel_order',
+                payload={'order_id': data['order_id']},
+                correlation_id=data['saga_id']
+            )
+    
+    def _process_payment(self, data: Dict[str, Any]) -> Dict[str, Any]:
         print("4️⃣  Processando pagamento...")
         payment_response = self.esb.send_message(
             from_service='orchestrator',
             to_service='payment-service',
             operation='process_payment',
             payload={
-                'order_id': order_id,
-                'amount': total,
-                'payment_method': 'credit_card'
+                'order_id': data['order_id'],
+                'payment_method': 'credit_card',
+                'idempotency_key': f"{data['saga_id']}:payment"
             },
-            transform=True  # Aplica transformação de mensagem
+            transform=True,  # Aplica transformação de mensagem
+            correlation_id=data['saga_id']
         )
         
         if 'error' in payment_response:
-            # Compensação: cancelar pedido
-            print("❌ Pagamento falhou, cancelando pedido...")
-            self.esb.send_message(
-                from_service='orchestrator',
-                to_service='order-service',
-                operation='cancel_order',
-                payload={'order_id': order_id}
-            )
-            return {'error': 'Pagamento recusado', 'step': 'payment'}
+            print("❌ Pagamento falhou, desfazendo pedido...")
+            if self._transient(payment_response):
+                # Sem resposta o pagamento pode ter sido aprovado: a compensação
+                # (que recebe este mesmo data) estorna por garantia
+                data['payment_uncertain'] = True
+            raise StepFailed('Pagamento recusado', step='payment')
         
-        # Passo 5: Atualizar estoque
-        print("5️⃣  Atualizando estoque...")
-        for item in items:
-            self.esb.send_message(
+        return {'total': payment_response['payload'].get('amount'), 'payment_approved': True}
+    
+    def _refund_payment(self, data: Dict[str, Any]) -> None:
+        # Compensação: estornar só o que pode ter sido cobrado; um pagamento
+        # recusado não tem estorno (o serviço responderia 404 e iria para a DLQ)
+        if data.get('payment_approved') or data.get('payment_uncertain'):
+            print("↩️  Estornando pagamento...")
+            self.esb.send_reliable(
                 from_service='orchestrator',
-                to_service='product-service',
-                operation='decrease_stock',
-                payload={
-                    'product_id': item['product_id'],
-                    'quantity': item['quantity']
-                }
+                to_service='payment-service',
+                operation='refund',
+                payload={'order_id': data['order_id']},
+                correlation_id=data['saga_id']
             )
-        
-        print("✅ Orquestração concluída com sucesso!")
-        print("="*50 + "\n")
-        
-        return {
-            'success': True,
-            'order_id': order_id,
-            'total': total,
-            'status': 'completed'
-        }
     
-    def orchestrate_order_cancellation(self, order_id: int) -> Dict[str, Any]:
-        """
-        Orquestra o cancelamento de pedido:
-        1. Buscar pedido (order-service)
-        2. Processar estorno (payment-service)
-        3. Devolver estoque (product-service)
-        4. Cancelar pedido (order-service)
-        """
-        print("\n🎭 ORQUESTRAÇÃO: Cancelamento de Pedido")
-        print("="*50)
+    def _reserve_stock(self, data: Dict[str, Any]) -> None:
+        # Reserva do carrinho inteiro, tudo ou nada
+        print("5️⃣  Atualizando estoque...")
+        stock_response = self.esb.send_message(
+            from_service='orchestrator',
+            to_service='product-service',
+            operation='decrease_stock',
+            payload={'items': data['items'], 'reservation_id': f"{data['saga_id']}:stock"},
+            correlation_id=data['saga_id']
+        )
         
-        # Passo 1: Buscar pedido
+        if 'error' in stock_response:
+            print("❌ Estoque mudou desde a validação, desfazendo pedido...")
+            error, unavailable = self._stock_refusal(stock_response, data['items'])
+            raise StepFailed(error, products=unavailable, step='stock')
+    
+    def _release_reservation(self, data: Dict[str, Any]) -> None:
+        # Compensação: devolver exatamente o que a reserva baixou (uma vez)
+        self.esb.send_reliable(
+            from_service='orchestrator',
+            to_service='product-service',
+            operation='increase_stock',
+            payload={'items': data['items'], 'reservation_id': f"{data['saga_id']}:stock"},
+            correlation_id=data['saga_id']
+        )
+    
+    def _publish_confirmed(self, data: Dict[str, Any]) -> None:
+        # Evento para quem assina o tópico de pedidos (fan-out pelo ESB)
+        self.esb.publish(
+            from_service='orchestrator',
+            topic='orders',
+            operation='order_confirmed',
+            payload={'order_id': data['order_id'], 'user_id': data['user_id'],
+                     'total': data['total'], 'items': data['items']},
+            correlation_id=data['saga_id']
+        )
+    
+    # Passos do cancelamento -------------------------------------------------
+    
+    def _load_order(self, data: Dict[str, Any]) -> Dict[str, Any]:
         print("1️⃣  Buscando pedido...")
         order_response = self.esb.send_message(
             from_service='orchestrator',
             to_service='order-service',
             operation='get_order',
-            payload={'order_id': order_id}
+            payload={'order_id': data['order_id']},
+            correlation_id=data['saga_id']
         )
         
-        if 'error' in order_response:
-            return {'error': 'Pedido não encontrado'}
-        
-        order = order_response['payload']
+        if order_response.get('status_code') == 404:
+            raise StepFailed('Pedido não encontrado', step='order')
+        self._forward(order_response, 'Erro ao buscar pedido', 'order')
         
-        # Passo 2: Processar estorno
+        return {'order': order_response['payload']}
+    
+    def _refund_order(self, data: Dict[str, Any]) -> None:
         print("2️⃣  Processando estorno...")
         refund_response = self.esb.send_message(
             from_service='orchestrator',
             to_service='payment-service',
             operation='refund',
-            payload={'order_id': order_id}
+            payload={'order_id': data['order_id']},
+            correlation_id=data['saga_id']
         )
-        
-        # Passo 3: Devolver estoque
+        # 404: nenhum pagamento aprovado (pedido não pago, ou estorno já feito)
+        self._forward(refund_response, 'Estorno falhou', 'refund', accept=(404,))
+    
+    def _return_stock(self, data: Dict[str, Any]) -> None:
+        # Carrinho inteiro em uma mensagem; pela reserva quando o pedido tem uma
         print("3️⃣  Devolvendo estoque...")
-        for item in order.get('items', []):
-            self.esb.send_message(
+        order = data['order']
+        if order.get('items'):
+            payload = {'items': order['items']}
+            if order.get('reservation_id'):
+                payload['reservation_id'] = order['reservation_id']
+            stock_response = self.esb.send_message(
                 from_service='orchestrator',
                 to_service='product-service',
                 operation='increase_stock',
-                payload={
-                    'product_id': item['product_id'],
-                    'quantity': item['quantity']
-                }
+                payload=payload,
+                correlation_id=data['saga_id']
             )
-        
-        # Passo 4: Cancelar pedido
+            self._forward(stock_response, 'Devolução de estoque falhou', 'stock')
+    
+    def _cancel_order(self, data: Dict[str, Any]) -> None:
         print("4️⃣  Cancelando pedido...")
         cancel_response = self.esb.send_message(
             from_service='orchestrator',
             to_service='order-service',
             operation='cancel_order',
-            payload={'order_id': order_id}
+            payload={'order_id': data['order_id']},
+            correlation_id=data['saga_id']
+        )
+        self._forward(cancel_response, 'Erro ao cancelar pedido', 'order')
+    
+    def _publish_cancelled(self, data: Dict[str, Any]) -> None:
+        self.esb.publish(
+            from_service='orchestrator',
+            topic='orders',
+            operation='order_cancelled',
+            payload={'order_id': data['order_id'], 'user_id': data['order'].get('user_id'),
+                     'items': data['order'].get('items')},
+            correlation_id=data['saga_id']
         )
-        
-        print("✅ Cancelamento concluído!")
-        print("="*50 + "\n")
-        
-        return {
-            'success': True,
-            'order_id': order_id,
-            'status': 'cancelled'
-        }
 
 
 # Instância global do orquestrador
-orchestrator = ServiceOrchestrator(esb)
+orchestrator = ServiceOrchestrator(
+    esb,
+    deadline=float(os.environ.get('ORCHESTRATION_DEADLINE', 10.0)),
+    saga_workers=int(os.environ.get('SAGA_WORKERS', 16)),
+    saga_timeout=float(os.environ.get('SAGA_TIMEOUT', 30.0))
+)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,197 @@
+"""
+Publish/Subscribe do ESB
+========================
+Tópicos com fan-out para vários assinantes:
+- Assinatura por tópico, com filtro opcional de operação e de campos do payload
+- Casamento por dicionário: as assinaturas são agrupadas pelo conjunto de
+  campos filtrados ("forma"), e cada publicação faz uma busca por forma,
+  independente do número de assinaturas
+- Cada assinante tem fila limitada e worker próprio (fan-out concorrente;
+  um assinante lento não atrasa os outros)
+- Fila cheia: 'drop' descarta a publicação para aquele assinante,
+  'block' espera até `block_timeout` e então descarta
+"""
+
+import itertools
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ANY_OPERATION = '*'
+
+
+class Subscription:
+    """Assinatura de um tópico, com fila limitada e worker de entrega"""
+
+    def __init__(self, subscription_id: str, topic: str, subscriber: str,
+                 deliver: Callable[['Subscription', Dict[str, Any]], bool],
+                 operation: Optional[str] = None,
+                 filters: Optional[Dict[str, Any]] = None,
+                 target_operation: Optional[str] = None,
+                 queue_size: int = 1000,
+                 policy: str = 'drop',
+                 block_timeout: float = 1.0):
+        if policy not in ('drop', 'block'):
+            raise ValueError("policy deve ser 'drop' ou 'block'")
+        self.id = subscription_id
+        self.topic = topic
+        self.subscriber = subscriber
+        self.operation = operation or ANY_OPERATION
+        self.filters = dict(filters or {})
+        self.target_operation = target_operation
+        self.policy = policy
+        self.block_timeout = block_timeout
+        for field, value in self.filters.items():
+            try:
+                hash(value)
+            except TypeError:
+                raise ValueError(f"Filtro {field}: use um valor simples (recebido {type(value).__name__})")
+        # Chave montada antes do worker: assinatura inválida não deixa thread para trás
+        self.shape: Tuple[str, ...] = tuple(sorted(self.filters))
+        self.key = (self.operation,) + tuple(self.filters[field] for field in self.shape)
+
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.stats = {'enqueued': 0, 'dropped': 0, 'delivered': 0, 'failed': 0}
+        self._deliver = deliver
+        self._worker = threading.Thread(target=self._run, daemon=True,
+                                        name=f'subscriber-{subscription_id}')
+        self._worker.start()
+
+    def offer(self, message: Dict[str, Any]) -> bool:
+        """Enfileira conforme a política; False se a mensagem foi descartada"""
+        try:
+            if self.policy == 'block':
+                self.queue.put(message, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(message)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    def _run(self):
+        while True:
+            message = self.queue.get()
+            if message is None:
+                return
+            try:
+                delivered = self._deliver(self, message)
+            except Exception as exc:  # um handler com erro não derruba o worker
+                print(f"⚠️  Assinante {self.subscriber} falhou: {exc}")
+                delivered = False
+            self.stats['delivered' if delivered else 'failed'] += 1
+
+    def close(self):
+        """Encerra o worker depois de esvaziar a fila"""
+        self.queue.put(None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'topic': self.topic,
+            'subscriber': self.subscriber,
+            'operation': self.operation,
+            'filters': self.filters,
+            'target_operation': self.target_operation,
+            'policy': self.policy,
+            'queue': {'size': self.queue.qsize(), 'max': self.queue.maxsize},
+            **self.stats
+        }
+
+
+class TopicRouter:
+    """
+    Índice de assinaturas: tópico -> forma do filtro -> chave -> assinaturas
+    A chave é (operação, valores dos campos filtrados); cada publicação
+    testa a operação publicada e ANY_OPERATION em cada forma do tópico.
+    """
+
+    def __init__(self, deliver: Callable[[Subscription, Dict[str, Any]], bool]):
+        self._deliver = deliver
+        self._topics: Dict[str, Dict[Tuple[str, ...], Dict[Tuple, List[Subscription]]]] = {}
+        self._subscriptions: Dict[str, Subscription] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, topic: str, subscriber: str,
+                  handler: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                  **options) -> Subscription:
+        """
+        Assina o tópico. Sem handler, a entrega é feita pelo ESB ao serviço
+        `subscriber`; com handler (callable local), ele recebe a mensagem.
+        options: operation, filters, target_operation, queue_size, policy, block_timeout
+        """
+        deliver = self._deliver
+        if handler is not None:
+            def deliver(subscription, message):
+                handler(message)
+                return True
+
+        subscription = Subscription(f"sub-{next(self._ids)}", topic, subscriber, deliver, **options)
+        with self._lock:
+            shapes = self._topics.setdefault(topic, {})
+            shapes.setdefault(subscription.shape, {}).setdefault(subscription.key, []).append(subscription)
+            self._subscriptions[subscription.id] = subscription
+        return subscription
+
+    def unsubscribe(self, subscription_id: str) -> bool:
+        with self._lock:
+            subscription = self._subscriptions.pop(subscription_id, None)
+            if subscription is None:
+                return False
+            shapes = self._topics[subscription.topic]
+            keys = shapes[subscription.shape]
+            keys[subscription.key].remove(subscription)
+            if not keys[subscription.key]:
+                del keys[subscription.key]
+            if not keys:
+                del shapes[subscription.shape]
+            if not shapes:
+                del self._topics[subscription.topic]
+        subscription.close()
+        return True
+
+    def match(self, topic: str, operation: str, payload: Dict[str, Any]) -> List[Subscription]:
+        """Assinaturas que casam com a publicação (uma busca por forma)"""
+        matched: List[Subscription] = []
+        with self._lock:
+            shapes = self._topics.get(topic)
+            if not shapes:
+                return matched
+            for shape, keys in shapes.items():
+                try:
+                    values = tuple(payload[field] for field in shape)
+                    for op in (operation, ANY_OPERATION):
+                        matched.extend(keys.get((op,) + values, ()))
+                except (KeyError, TypeError):  # campo ausente ou valor não hashable
+                    continue
+        return matched
+
+    def publish(self, topic: str, message: Dict[str, Any]) -> Dict[str, int]:
+        """Enfileira a mensagem para cada assinante que casa; não espera a entrega"""
+        subscriptions = self.match(topic, message['operation'], message['payload'])
+        enqueued = sum(1 for subscription in subscriptions if subscription.offer(message))
+        self.published += 1
+        return {'matched': len(subscriptions), 'enqueued': enqueued,
+                'dropped': len(subscriptions) - enqueued}
+
+    def list_subscriptions(self, topic: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            subscriptions = list(self._subscriptions.values())
+        return [s.to_dict() for s in subscriptions if topic is None or s.topic == topic]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            topics = {topic: sum(len(subs) for keys in shapes.values() for subs in keys.values())
+                      for topic, shapes in self._topics.items()}
+        return {'published': self.published, 'topics': topics}
+
+    def close(self):
+        with self._lock:
+            subscriptions = list(self._subscriptions.values())
+            self._subscriptions.clear()
+            self._topics.clear()
+        for subscription in subscriptions:
+            subscription.close()
@@ -0,0 +1,313 @@
+"""
+Registro de Instâncias e Balanceamento de Carga do ESB
+======================================================
+Um serviço pode ter várias réplicas registradas:
+- Cada instância tem endpoint, contador de requisições em voo e estado
+  ('active' ou 'draining')
+- Estratégia por serviço: 'round_robin', 'least_outstanding' (menos
+  requisições em voo) ou 'power_of_two' (sorteia duas, fica com a menos ocupada)
+- Drenar uma instância tira ela da rotação sem cortar as requisições em voo;
+  com remove=True ela sai do registro quando a última terminar
+- Saúde (ver health.HealthMonitor): instâncias com TTL precisam renovar o
+  heartbeat; sem renovação, ou reprovadas no /health, saem da rotação
+- A tupla de instâncias roteáveis (ativas e saudáveis) é recalculada só
+  quando o registro ou a saúde mudam, não a cada requisição
+- Codecs: cada instância anuncia os formatos de corpo que entende e o
+  registro guarda o negociado com a preferência do ESB (ver codec.negotiate)
+"""
+
+import itertools
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+try:
+    from .codec import DEFAULT_PREFERENCE, JSON, negotiate
+except ImportError:  # executado como script
+    from codec import DEFAULT_PREFERENCE, JSON, negotiate
+
+ROUND_ROBIN = 'round_robin'
+LEAST_OUTSTANDING = 'least_outstanding'
+POWER_OF_TWO = 'power_of_two'
+STRATEGIES = (ROUND_ROBIN, LEAST_OUTSTANDING, POWER_OF_TWO)
+
+ACTIVE = 'active'
+DRAINING = 'draining'
+
+
+def default_instance_id(endpoint: str) -> str:
+    """Id da instância derivado do endpoint: 'host:porta'"""
+    return urlparse(endpoint).netloc or endpoint
+
+
+class ServiceInstance:
+    """Uma réplica de um serviço; `client` é o pool de conexões (opaco para o registro)"""
+
+    def __init__(self, service_name: str, instance_id: str, endpoint: str, client: Any = None,
+                 ttl: Optional[float] = None):
+        self.service_name = service_name
+        self.id = instance_id
+        self.endpoint = endpoint.rstrip('/')
+        self.client = client
+        self.state = ACTIVE
+        self.remove_when_drained = False
+        self.healthy = True
+        self.health_reason: Optional[str] = None
+        self.ttl = ttl  # None: não depende de heartbeat
+        self.last_heartbeat = time.monotonic()
+        self.codecs: Tuple[str, ...] = (JSON,)  # anunciados pela instância
+        self.codec = JSON  # negociado pelo registro
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.registered_at = datetime.utcnow().isoformat()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'endpoint': self.endpoint,
+            'state': self.state,
+            'healthy': self.healthy,
+            'health_reason': self.health_reason,
+            'ttl': self.ttl,
+            'heartbeat_age_s': round(time.monotonic() - self.last_heartbeat, 3) if self.ttl else None,
+            'codecs': list(self.codecs),
+            'codec': self.codec,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'errors': self.errors,
+            'registered_at': self.registered_at
+        }
+
+
+class InstancePool:
+    """Instâncias de um serviço e a escolha da próxima"""
+
+    def __init__(self, service_name: str, strategy: str):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estratégia deve ser uma de {STRATEGIES}")
+        self.service_name = service_name
+        self.strategy = strategy
+        self.instances: Dict[str, ServiceInstance] = {}
+        self.routable: Tuple[ServiceInstance, ...] = ()
+        self._turn = itertools.count()
+
+    def refresh(self):
+        self.routable = tuple(i for i in self.instances.values()
+                              if i.state == ACTIVE and i.healthy)
+
+    def choose(self) -> Optional[ServiceInstance]:
+        routable = self.routable
+        if len(routable) <= 1:
+            return routable[0] if routable else None
+        if self.strategy == POWER_OF_TWO:
+            first, second = random.sample(routable, 2)
+            return first if first.in_flight <= second.in_flight else second
+        start = next(self._turn) % len(routable)
+        if self.strategy == ROUND_ROBIN:
+            return routable[start]
+        # least_outstanding: empates rodam, em vez de cair sempre na primeira
+        best = routable[start]
+        for instance in routable[start + 1:] + routable[:start]:
+            if instance.in_flight < best.in_flight:
+                best = instance
+        return best
+
+
+class ServiceRegistry:
+    """Serviço -> instâncias, com contagem de requisições em voo por instância"""
+
+    def __init__(self, strategy: str = POWER_OF_TWO,
+                 on_remove: Optional[Callable[[ServiceInstance], None]] = None,
+                 codec_preference: Sequence[str] = DEFAULT_PREFERENCE):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estratégia deve ser uma de {STRATEGIES}")
+        self.strategy = strategy
+        self.codec_preference = tuple(codec_preference)
+        self.pools: Dict[str, InstancePool] = {}
+        self._listeners: List[Callable[[ServiceInstance], None]] = [on_remove] if on_remove else []
+        self.lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[ServiceInstance], None]):
+        """Chamado (fora do lock) para cada instância que sai do registro"""
+        self._listeners.append(listener)
+
+    def __contains__(self, service_name: str) -> bool:
+        return service_name in self.pools
+
+    def add(self, service_name: str, endpoint: str, client: Any = None,
+            instance_id: Optional[str] = None, ttl: Optional[float] = None,
+            codecs: Optional[Sequence[str]] = None) -> ServiceInstance:
+        """Registra uma instância; o mesmo id substitui a instância anterior"""
+        instance = ServiceInstance(service_name, instance_id or default_instance_id(endpoint),
+                                   endpoint, client, ttl)
+        if codecs:
+            self._set_codecs(instance, codecs)
+        with self.lock:
+            pool = self.pools.get(service_name)
+            if pool is None:
+                pool = self.pools[service_name] = InstancePool(service_name, self.strategy)
+            previous = pool.instances.get(instance.id)
+            pool.instances[instance.id] = instance
+            pool.refresh()
+        if previous:
+            self._removed(previous)
+        return instance
+
+    def remove(self, service_name: str, instance_id: Optional[str] = None) -> List[ServiceInstance]:
+        """Remove uma instância (ou todas do serviço, sem instance_id)"""
+        with self.lock:
+            pool = self.pools.get(service_name)
+            if pool is None:
+                return []
+            ids = [instance_id] if instance_id else list(pool.instances)
+            removed = [pool.instances[i] for i in ids if i in pool.instances]
+            for instance in removed:
+                self._pop(instance)
+        for instance in removed:
+            self._removed(instance)
+        return removed
+
+    def remove_instance(self, instance: ServiceInstance) -> bool:
+        """Remove exatamente esta instância (não uma que a substituiu)"""
+        with self.lock:
+            removed = self._pop(instance)
+        if removed:
+            self._removed(instance)
+        return removed
+
+    def drain(self, service_name: str, instance_id: str,
+              remove: bool = False) -> Optional[ServiceInstance]:
+        """Tira a instância da rotação; as requisições em voo terminam normalmente"""
+        with self.lock:
+            pool = self.pools.get(service_name)
+            instance = pool.instances.get(instance_id) if pool else None
+            if instance is None:
+                return None
+            instance.state = DRAINING
+            instance.remove_when_drained = remove
+            pool.refresh()
+            removed = remove and instance.in_flight == 0 and self._pop(instance)
+        if removed:
+            self._removed(instance)
+        return instance
+
+    def activate(self, service_name: str, instance_id: str) -> Optional[ServiceInstance]:
+        """Devolve uma instância drenada à rotação"""
+        with self.lock:
+            pool = self.pools.get(service_name)
+            instance = pool.instances.get(instance_id) if pool else None
+            if instance is None:
+                return None
+            instance.state = ACTIVE
+            instance.remove_when_drained = False
+            pool.refresh()
+        return instance
+
+    def heartbeat(self, service_name: str, instance_id: str, ttl: Optional[float] = None,
+                  codecs: Optional[Sequence[str]] = None) -> Optional[ServiceInstance]:
+        """
+        Renova o TTL; uma instância afastada por heartbeat vencido volta à rotação
+        Codecs anunciados na batida atualizam o codec negociado.
+        """
+        with self.lock:
+            pool = self.pools.get(service_name)
+            instance = pool.instances.get(instance_id) if pool else None
+            if instance is None:
+                return None
+            instance.last_heartbeat = time.monotonic()
+            if ttl:
+                instance.ttl = ttl
+            if codecs:
+                self._set_codecs(instance, codecs)
+            if not instance.healthy and instance.health_reason == 'heartbeat_expired':
+                instance.healthy = True
+                instance.health_reason = None
+                pool.refresh()
+        return instance
+
+    def _set_codecs(self, instance: ServiceInstance, codecs: Sequence[str]):
+        instance.codecs = tuple(codecs)
+        instance.codec = negotiate(self.codec_preference, instance.codecs)
+
+    def set_health(self, instance: ServiceInstance, healthy: bool,
+                   reason: Optional[str] = None) -> bool:
+        """Marca a saúde da instância; True se mudou (a rotação é recalculada)"""
+        with self.lock:
+            if instance.healthy == healthy:
+                return False
+            instance.healthy = healthy
+            instance.health_reason = None if healthy else reason
+            pool = self.pools.get(instance.service_name)
+            if pool is not None and pool.instances.get(instance.id) is instance:
+                pool.refresh()
+        print(f"{'💚' if healthy else '💔'} {instance.service_name} ({instance.id}): "
+              f"{'saudável' if healthy else reason}")
+        return True
+
+    def all_instances(self) -> List[ServiceInstance]:
+        with self.lock:
+            return [i for pool in self.pools.values() for i in pool.instances.values()]
+
+    def set_strategy(self, service_name: str, strategy: str):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estratégia deve ser uma de {STRATEGIES}")
+        with self.lock:
+            pool = self.pools.get(service_name)
+            if pool is None:
+                raise KeyError(service_name)
+            pool.strategy = strategy
+
+    def acquire(self, service_name: str) -> Optional[ServiceInstance]:
+        """Escolhe uma instância e conta a requisição em voo (None se não houver)"""
+        with self.lock:
+            pool = self.pools.get(service_name)
+            instance = pool.choose() if pool else None
+            if instance is not None:
+                instance.in_flight += 1
+                instance.requests += 1
+        return instance
+
+    def release(self, instance: ServiceInstance, error: bool = False):
+        """Fim da requisição; conclui a drenagem com remoção, se pedida"""
+        with self.lock:
+            instance.in_flight -= 1
+            if error:
+                instance.errors += 1
+            removed = instance.remove_when_drained and instance.in_flight == 0 and self._pop(instance)
+        if removed:
+            self._removed(instance)
+
+    def _pop(self, instance: ServiceInstance) -> bool:
+        """Tira a instância do pool (com o lock); False se ela já foi substituída"""
+        pool = self.pools.get(instance.service_name)
+        if pool is None or pool.instances.get(instance.id) is not instance:
+            return False
+        del pool.instances[instance.id]
+        pool.refresh()
+        if not pool.instances:
+            del self.pools[instance.service_name]
+        return True
+
+    def _removed(self, instance: ServiceInstance):
+        for listener in self._listeners:
+            listener(instance)
+
+    def endpoints(self, service_name: str) -> List[str]:
+        with self.lock:
+            pool = self.pools.get(service_name)
+            return [i.endpoint for i in pool.instances.values()] if pool else []
+
+    def get_status(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                name: {
+                    'strategy': pool.strategy,
+                    'routable': len(pool.routable),
+                    'instances': [i.to_dict() for i in pool.instances.values()]
+                }
+                for name, pool in self.pools.items()
+            }
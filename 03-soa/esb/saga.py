@@ -0,0 +1,336 @@
+"""
+Motor de Sagas
+==============
+Orquestrações longas como sagas persistentes:
+- Uma saga é uma lista de passos; cada passo tem ação e, opcionalmente,
+  compensação. Se um passo falha, as compensações dele e dos passos já
+  concluídos rodam em ordem inversa
+- O estado (passo atual, dados acumulados, erro) é gravado no store
+  depois de cada passo, antes do próximo começar
+- Na subida, sagas em andamento são retomadas: o passo interrompido é
+  executado de novo (as ações precisam ser idempotentes, ex: com chave de
+  idempotência derivada do id da saga) ou a compensação continua
+- Falhas transitórias (StepRetry) e compensações que falham são repetidas
+  com backoff exponencial; sagas que terminam FAILED (compensação
+  esgotada) ficam no store para revisão, não só em memória
+- Escalonamento por passo: um pool fixo de workers pega lotes de sagas
+  prontas, executa um passo de cada, grava o lote com um único commit e
+  devolve as sagas à fila. Milhares de sagas não precisam de uma thread cada.
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RUNNING = 'running'
+COMPENSATING = 'compensating'
+COMPLETED = 'completed'
+COMPENSATED = 'compensated'
+FAILED = 'failed'
+TERMINAL = (COMPLETED, COMPENSATED, FAILED)
+
+
+class StepFailed(Exception):
+    """
+    Falha de negócio de um passo (inicia a compensação)
+    `details` vai para o erro final da saga, ex: {'step': 'payment'}
+    """
+
+    def __init__(self, error: str, **details):
+        super().__init__(error)
+        self.error = {'error': error, **details}
+
+
+class StepRetry(StepFailed):
+    """
+    Falha transitória de um passo (serviço fora, timeout, 5xx): o passo é
+    repetido com backoff; esgotadas as tentativas do passo, vira StepFailed
+    """
+
+
+class SagaStep:
+    """
+    Passo de uma saga
+    action(data) -> dict com dados novos (mesclados em data) ou None
+    compensation(data) desfaz o efeito da ação; roda também quando o
+    próprio passo falha, então deve tolerar ação que não aconteceu
+    max_attempts limita as repetições por StepRetry (None = repete até
+    passar, para passos que só avançam)
+    """
+
+    def __init__(self, name: str,
+                 action: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+                 compensation: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 max_attempts: Optional[int] = None):
+        self.name = name
+        self.action = action
+        self.compensation = compensation
+        self.max_attempts = max_attempts
+
+
+class SagaDefinition:
+    def __init__(self, name: str, steps: List[SagaStep]):
+        self.name = name
+        self.steps = steps
+
+
+class _MemoryStore:
+    """Store sem persistência (quando o motor roda sem DurableStore)"""
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self._sequence = itertools.count(1)
+
+    def put(self, key, value, meta=None, sync=True):
+        self.data[key] = value
+        return next(self._sequence)
+
+    def delete(self, key, sync=True):
+        self.data.pop(key, None)
+        return next(self._sequence)
+
+    def wait(self, sequence):
+        pass
+
+
+class SagaEngine:
+    """Executa, persiste e retoma sagas"""
+
+    def __init__(self, store=None, workers: int = 16, batch_size: int = 8,
+                 max_compensation_attempts: int = 5, keep_finished: int = 1000,
+                 retry_base: float = 0.5, retry_max: float = 30.0):
+        self.store = store or _MemoryStore()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_compensation_attempts = max_compensation_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.definitions: Dict[str, SagaDefinition] = {}
+
+        self._ready: queue.Queue = queue.Queue()
+        # Repetições com backoff: heap (quando, desempate, saga) e um timer
+        self._delayed: List[Tuple[float, int, str]] = []
+        self._delayed_cond = threading.Condition()
+        self._delay_ids = itertools.count()
+        self._done: Dict[str, threading.Event] = {}
+        self._finished: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._keep_finished = keep_finished
+        self._lock = threading.Lock()
+        self.stats = {'started': 0, 'resumed': 0, 'steps': 0, 'batches': 0, 'retries': 0,
+                      COMPLETED: 0, COMPENSATED: 0, FAILED: 0}
+        self._threads = [threading.Thread(target=self._worker, daemon=True, name=f'saga-{i}')
+                         for i in range(workers)]
+        self._threads.append(threading.Thread(target=self._timer, daemon=True, name='saga-timer'))
+        for thread in self._threads:
+            thread.start()
+
+    def register(self, definition: SagaDefinition):
+        self.definitions[definition.name] = definition
+
+    # Início e espera --------------------------------------------------------
+
+    def start(self, name: str, data: Dict[str, Any]) -> str:
+        """Cria e agenda a saga; o estado inicial já está no store ao retornar"""
+        if name not in self.definitions:
+            raise ValueError(f"Saga {name} não registrada")
+        saga_id = f"saga-{uuid.uuid4().hex[:12]}"
+        now = time.time()
+        state = {
+            'id': saga_id,
+            'saga': name,
+            'status': RUNNING,
+            'step': 0,
+            'data': dict(data, saga_id=saga_id),
+            'history': [],
+            'error': None,
+            'step_attempts': 0,
+            'compensation_attempts': 0,
+            'retry_at': None,
+            'created_at': now,
+            'updated_at': now
+        }
+        with self._lock:
+            self._done[saga_id] = threading.Event()
+            self.stats['started'] += 1
+        self.store.put(saga_id, state)
+        self._ready.put(saga_id)
+        return saga_id
+
+    def run(self, name: str, data: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Inicia e espera a saga terminar (ou o timeout: estado atual)"""
+        saga_id = self.start(name, data)
+        self.wait(saga_id, timeout)
+        return self.get(saga_id)
+
+    def wait(self, saga_id: str, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            done = self._done.get(saga_id)
+        return True if done is None else done.wait(timeout)
+
+    def get(self, saga_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            finished = self._finished.get(saga_id)
+        return finished or self.store.data.get(saga_id)
+
+    def failed(self) -> List[Dict[str, Any]]:
+        """Sagas FAILED guardadas no store (inconsistências a revisar)"""
+        return [state for state in list(self.store.data.values()) if state['status'] == FAILED]
+
+    # Recuperação ----------------------------------------------------------
+
+    def attach_store(self, store) -> int:
+        """Passa a persistir no store (ex: DurableStore) e retoma o que ficou pendente"""
+        self.store = store
+        return self.recover()
+
+    def recover(self) -> int:
+        """Reagenda as sagas em andamento encontradas no store"""
+        pending = [state for state in list(self.store.data.values())
+                   if state['status'] not in TERMINAL]
+        with self._lock:
+            for state in pending:
+                self._done.setdefault(state['id'], threading.Event())
+            self.stats['resumed'] += len(pending)
+        for state in pending:
+            self._schedule(state)
+        return len(pending)
+
+    def _schedule(self, state: Dict[str, Any]):
+        """Devolve a saga à fila; com retry_at no futuro, só quando ele chegar"""
+        delay = (state.get('retry_at') or 0) - time.time()
+        if delay <= 0:
+            self._ready.put(state['id'])
+            return
+        with self._delayed_cond:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._delay_ids), state['id']))
+            self._delayed_cond.notify()
+
+    def _timer(self):
+        with self._delayed_cond:
+            while True:
+                while self._delayed and self._delayed[0][0] <= time.monotonic():
+                    self._ready.put(heapq.heappop(self._delayed)[2])
+                timeout = self._delayed[0][0] - time.monotonic() if self._delayed else None
+                self._delayed_cond.wait(timeout)
+
+    # Execução ---------------------------------------------------------------
+
+    def _worker(self):
+        while True:
+            batch = [self._ready.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._ready.get_nowait())
+                except queue.Empty:
+                    break
+
+            sequence = 0
+            continuing, finished = [], []
+            for saga_id in batch:
+                state = self.store.data.get(saga_id)
+                if state is None:
+                    continue
+                state = self._advance(state)
+                if state['status'] == FAILED:
+                    # Compensação esgotada: o estado fica no store para revisão
+                    sequence = self.store.put(saga_id, state, sync=False)
+                    finished.append(state)
+                elif state['status'] in TERMINAL:
+                    sequence = self.store.delete(saga_id, sync=False)
+                    finished.append(state)
+                else:
+                    sequence = self.store.put(saga_id, state, sync=False)
+                    continuing.append(state)
+            # Um commit para o lote inteiro, antes de qualquer passo seguinte
+            if sequence:
+                self.store.wait(sequence)
+
+            with self._lock:
+                self.stats['batches'] += 1
+                self.stats['steps'] += len(batch)
+                self.stats['retries'] += sum(1 for state in continuing if state['retry_at'])
+                for state in finished:
+                    self.stats[state['status']] += 1
+                    self._finished[state['id']] = state
+                    while len(self._finished) > self._keep_finished:
+                        self._finished.popitem(last=False)
+                    done = self._done.pop(state['id'], None)
+                    if done:
+                        done.set()
+            for state in continuing:
+                self._schedule(state)
+
+    def _advance(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Executa um passo (ou uma compensação); retorna o novo estado"""
+        definition = self.definitions[state['saga']]
+        state = {**state, 'data': dict(state['data']), 'history': list(state['history']),
+                 'updated_at': time.time(), 'retry_at': None}
+
+        if state['status'] == RUNNING:
+            step = definition.steps[state['step']]
+            try:
+                updates = step.action(state['data'])
+            except StepFailed as failure:
+                if isinstance(failure, StepRetry) and self._retry(state, 'step_attempts',
+                                                                  step.max_attempts):
+                    state['error'] = failure.error  # última falha, enquanto repete
+                    return state
+                # O próprio passo também é compensado: a falha pode ter
+                # acontecido depois do efeito (ex: timeout na resposta)
+                state['history'].append({'step': step.name, 'result': 'failed'})
+                state.update(status=COMPENSATING, error=failure.error, step_attempts=0)
+            except Exception as exc:
+                state['history'].append({'step': step.name, 'result': 'error'})
+                state.update(status=COMPENSATING, error={'error': str(exc), 'step': step.name},
+                             step_attempts=0)
+            else:
+                state['data'].update(updates or {})
+                state['history'].append({'step': step.name, 'result': 'ok'})
+                state.update(step=state['step'] + 1, step_attempts=0, error=None)
+                if state['step'] == len(definition.steps):
+                    state['status'] = COMPLETED
+            return state
+
+        # Compensando: desfaz o passo concluído mais recente
+        step = definition.steps[state['step']]
+        try:
+            if step.compensation:
+                step.compensation(state['data'])
+                state['history'].append({'step': step.name, 'result': 'compensated'})
+        except Exception as exc:
+            state['error'] = {**(state['error'] or {}), 'compensation_error': str(exc)}
+            if not self._retry(state, 'compensation_attempts', self.max_compensation_attempts):
+                state['status'] = FAILED
+            return state
+        state['step'] -= 1
+        state['compensation_attempts'] = 0
+        if state['step'] < 0:
+            state['status'] = COMPENSATED
+        return state
+
+    def _retry(self, state: Dict[str, Any], counter: str, limit: Optional[int]) -> bool:
+        """Conta a tentativa e agenda a próxima com backoff; False se esgotou"""
+        attempts = state.get(counter, 0) + 1
+        state[counter] = attempts
+        if limit is not None and attempts >= limit:
+            return False
+        delay = min(self.retry_max, self.retry_base * 2 ** (attempts - 1))
+        state['retry_at'] = time.time() + delay
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._delayed_cond:
+            delayed = len(self._delayed)
+        with self._lock:
+            return {
+                **self.stats,
+                'in_progress': len(self._done),
+                'queued': self._ready.qsize(),
+                'delayed': delayed,
+                'workers': self.workers
+            }
@@ -0,0 +1,260 @@
+"""
+Transformadores Declarativos do ESB
+===================================
+Mapeamentos de payload descritos como dados e compilados uma vez em
+funções Python especializadas (código gerado; a spec não é interpretada a
+cada mensagem):
+
+    {
+        'customer_id': 'user_id',                              # renomear
+        'customer.name': {'from': 'profile.name'},             # caminhos aninhados
+        'amount': {'from': 'total', 'type': 'float', 'default': 0.0},
+        'currency': {'const': 'BRL'},                          # constante
+        'order_id': {'from': 'id', 'type': 'int', 'required': True}
+    }
+
+- Tipos: int, float, str, bool. Campo ausente (ou None) fica None, a menos
+  que haja `default`; com `required` a mensagem é recusada (TransformError)
+- keep=True parte de uma cópia do payload (campos não mapeados seguem)
+- Transformadores encadeiam (chain) e a cadeia é checada na montagem: um
+  passo que lê um campo que o anterior não produz é erro de spec
+- Registro por tupla (origem, destino, operação), com '*' valendo para
+  qualquer operação
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+ANY_OPERATION = '*'
+RULE_KEYS = {'from', 'const', 'type', 'default', 'required'}
+
+
+class TransformSpecError(ValueError):
+    """Spec de mapeamento inválida ou cadeia incompatível (detectado ao compilar)"""
+
+
+class TransformError(ValueError):
+    """Payload recusado pelo transformador (campo obrigatório ausente, tipo inválido)"""
+
+
+def _coercer(target_type: type, type_name: str) -> Callable[[Any, str], Any]:
+    def coerce(value, field):
+        try:
+            return target_type(value)
+        except (TypeError, ValueError):
+            raise TransformError(f"{field}: {value!r} não é {type_name}")
+    return coerce
+
+
+def _to_bool(value, field):
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ('true', '1', 'yes', 'sim'):
+            return True
+        if lowered in ('false', '0', 'no', 'nao', 'não', ''):
+            return False
+        raise TransformError(f"{field}: {value!r} não é bool")
+    return bool(value)
+
+
+COERCERS = {
+    'int': _coercer(int, 'int'),
+    'float': _coercer(float, 'float'),
+    'str': _coercer(str, 'str'),
+    'bool': _to_bool,
+}
+
+
+def _normalize(target: str, rule: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    if isinstance(rule, str):
+        rule = {'from': rule}
+    if not isinstance(rule, dict):
+        raise TransformSpecError(f"{target}: regra deve ser str ou dict")
+    unknown = set(rule) - RULE_KEYS
+    if unknown:
+        raise TransformSpecError(f"{target}: chaves desconhecidas {sorted(unknown)}")
+    if ('from' in rule) == ('const' in rule):
+        raise TransformSpecError(f"{target}: use exatamente um de 'from' ou 'const'")
+    if 'type' in rule and rule['type'] not in COERCERS:
+        raise TransformSpecError(f"{target}: tipo {rule['type']!r} (use {sorted(COERCERS)})")
+    if 'const' in rule and set(rule) - {'const'}:
+        raise TransformSpecError(f"{target}: 'const' não combina com outras chaves")
+    return rule
+
+
+def compile_mapping(spec: Dict[str, Union[str, Dict[str, Any]]], name: str = 'mapping',
+                    keep: bool = False) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Compila a spec (campo destino -> regra) em uma função payload -> payload
+    A função ganha os atributos inputs (campos de topo lidos sem default),
+    outputs (campos de topo produzidos; None com keep) e source (código gerado).
+    """
+    if not spec:
+        raise TransformSpecError("Spec vazia")
+    namespace: Dict[str, Any] = {'_to_bool': _to_bool, 'TransformError': TransformError}
+    statements: List[str] = []
+    tree: Dict[str, Any] = {}  # destino aninhado -> expressão
+    inputs = set()
+    prefixes: Dict[Tuple[str, ...], str] = {}  # caminho já lido -> variável
+
+    def read(path: Tuple[str, ...]) -> str:
+        """Variável com o valor do caminho (prefixos comuns lidos uma vez só)"""
+        if path in prefixes:
+            return prefixes[path]
+        if len(path) == 1:
+            variable = f'_p{len(prefixes)}'
+            statements.append(f"    {variable} = payload.get({path[0]!r})")
+        else:
+            parent = read(path[:-1])
+            variable = f'_p{len(prefixes)}'
+            statements.append(f"    {variable} = {parent}.get({path[-1]!r}) "
+                              f"if isinstance({parent}, dict) else None")
+        prefixes[path] = variable
+        return variable
+
+    for index, (target, raw_rule) in enumerate(spec.items()):
+        rule = _normalize(target, raw_rule)
+        target_path = target.split('.')
+
+        if 'const' in rule:
+            constant = rule['const']
+            if constant is None or isinstance(constant, (str, int, bool)):
+                expression = repr(constant)  # literal no código gerado
+            else:
+                namespace[f'_c{index}'] = constant
+                expression = f'_c{index}'
+        else:
+            source_path = tuple(rule['from'].split('.'))
+            if 'default' not in rule:
+                inputs.add(source_path[0])
+
+            if set(rule) == {'from'} and len(source_path) == 1:
+                # Renomeação simples: direto no dict literal
+                expression = f"payload.get({source_path[0]!r})"
+            elif set(rule) == {'from'}:
+                expression = read(source_path)
+            else:
+                variable = f'_v{index}'
+                statements.append(f"    {variable} = {read(source_path)}")
+                statements.append(f"    if {variable} is None:")
+                if rule.get('required'):
+                    message = f"campo obrigatório ausente: {rule['from']}"
+                    statements.append(f"        raise TransformError({message!r})")
+                elif 'default' in rule:
+                    namespace[f'_d{index}'] = rule['default']
+                    statements.append(f"        {variable} = _d{index}")
+                else:
+                    statements.append("        pass")
+                type_name = rule.get('type')
+                if type_name == 'bool':
+                    statements.append("    else:")
+                    statements.append(f"        {variable} = _to_bool({variable}, {target!r})")
+                elif type_name:
+                    # Conversão inline: sem chamada extra por campo
+                    message = f"{target}: %r não é {type_name}"
+                    statements += [
+                        "    else:",
+                        "        try:",
+                        f"            {variable} = {type_name}({variable})",
+                        "        except (TypeError, ValueError):",
+                        f"            raise TransformError({message!r} % ({variable},))",
+                    ]
+                expression = variable
+
+        node = tree
+        for key in target_path[:-1]:
+            node = node.setdefault(key, {})
+            if not isinstance(node, dict):
+                raise TransformSpecError(f"{target}: conflita com outro campo destino")
+        if target_path[-1] in node:
+            raise TransformSpecError(f"{target}: destino repetido")
+        node[target_path[-1]] = expression
+
+    def literal(node: Dict[str, Any]) -> str:
+        items = ', '.join(f"{key!r}: {literal(value) if isinstance(value, dict) else value}"
+                          for key, value in node.items())
+        return '{' + items + '}'
+
+    function_name = ''.join(c if c.isalnum() else '_' for c in name)
+    lines = [f"def {function_name}(payload):"] + statements
+    if keep:
+        lines += ["    out = dict(payload)", f"    out.update({literal(tree)})", "    return out"]
+    else:
+        lines.append(f"    return {literal(tree)}")
+    source = '\n'.join(lines)
+
+    exec(compile(source, f'<transform {name}>', 'exec'), namespace)
+    transformer = namespace[function_name]
+    transformer.inputs = frozenset(inputs)
+    transformer.outputs = None if keep else frozenset(tree)
+    transformer.source = source
+    return transformer
+
+
+def as_transformer(transformer) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """Spec (dict) é compilada; função é usada como está (entradas/saídas desconhecidas)"""
+    if isinstance(transformer, dict):
+        return compile_mapping(transformer)
+    if not callable(transformer):
+        raise TransformSpecError(f"Transformador inválido: {transformer!r}")
+    return transformer
+
+
+def chain(*transformers) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Compõe transformadores (specs ou funções) em ordem, checando que cada
+    passo compilado só lê campos que o passo anterior produz
+    """
+    steps = [as_transformer(t) for t in transformers]
+    if not steps:
+        raise TransformSpecError("Cadeia vazia")
+    for previous, current in zip(steps, steps[1:]):
+        produced = getattr(previous, 'outputs', None)
+        needed = getattr(current, 'inputs', None)
+        if produced is not None and needed:
+            missing = needed - produced
+            if missing:
+                raise TransformSpecError(
+                    f"{getattr(current, '__name__', current)} lê {sorted(missing)}, "
+                    f"que {getattr(previous, '__name__', previous)} não produz")
+    if len(steps) == 1:
+        return steps[0]
+
+    def chained(payload):
+        for step in steps:
+            payload = step(payload)
+        return payload
+
+    chained.inputs = getattr(steps[0], 'inputs', None)
+    chained.outputs = getattr(steps[-1], 'outputs', None)
+    chained.steps = steps
+    return chained
+
+
+class TransformerRegistry:
+    """(origem, destino, operação) -> transformador; '*' vale para qualquer operação"""
+
+    def __init__(self):
+        # (origem, destino) -> {operação: transformador}: rota sem
+        # transformador custa uma única consulta ao dict
+        self._routes: Dict[Tuple[str, str], Dict[str, Callable]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(operations) for operations in self._routes.values())
+
+    def register(self, from_service: str, to_service: str, *transformers,
+                 operation: str = ANY_OPERATION) -> Callable:
+        """Registra um transformador ou uma cadeia (aplicada na ordem dada)"""
+        transformer = chain(*transformers)
+        self._routes.setdefault((from_service, to_service), {})[operation] = transformer
+        return transformer
+
+    def lookup(self, from_service: str, to_service: str,
+               operation: str) -> Optional[Callable]:
+        operations = self._routes.get((from_service, to_service))
+        if operations is None:
+            return None
+        return operations.get(operation) or operations.get(ANY_OPERATION)
+
+    def keys(self) -> List[str]:
+        return [f"{f}->{t}" + ('' if op == ANY_OPERATION else f" ({op})")
+                for (f, t), operations in self._routes.items() for op in operations]
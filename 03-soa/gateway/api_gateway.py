@@ -11,9 +11,47 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from esb.message_bus import esb
 from esb.orchestrator import orchestrator
+from esb.message_log import INDEXED_FIELDS, MINUTE
+from shared import open_store
 
 app = Flask(__name__)
 
+# Filtros aceitos em /esb/messages (campos indexados do log)
+MESSAGE_FILTERS = INDEXED_FIELDS + (MINUTE,)
+
+# Endpoints dos serviços (cada processo tem seu próprio registro no ESB)
+# Várias réplicas: URLs separadas por vírgula, ex: PRODUCT_SERVICE_URL=http://p1:5011,http://p2:5011
+SERVICE_ENDPOINTS = {
+    'auth-service': os.environ.get('AUTH_SERVICE_URL', 'http://localhost:5010'),
+    'product-service': os.environ.get('PRODUCT_SERVICE_URL', 'http://localhost:5011'),
+    'order-service': os.environ.get('ORDER_SERVICE_URL', 'http://localhost:5012'),
+    'payment-service': os.environ.get('PAYMENT_SERVICE_URL', 'http://localhost:5013'),
+}
+for service_name, endpoints in SERVICE_ENDPOINTS.items():
+    for endpoint in endpoints.split(','):
+        esb.register_service(service_name, endpoint.strip())
+
+# Filas duráveis do ESB (compensações e send_reliable), neste processo
+esb.enable_durable_queues(
+    os.environ.get('ESB_QUEUE_DB') or os.path.join(os.path.dirname(__file__), '..', 'data', 'esb-queues.db'),
+    visibility_timeout=float(os.environ.get('ESB_QUEUE_VISIBILITY_TIMEOUT', 30)),
+    max_attempts=int(os.environ.get('ESB_QUEUE_MAX_ATTEMPTS', 8)),
+    backoff_base=float(os.environ.get('ESB_QUEUE_BACKOFF_BASE', 0.5)),
+    backoff_max=float(os.environ.get('ESB_QUEUE_BACKOFF_MAX', 60))
+)
+
+# Saúde das réplicas: sondas de /health com jitter e reaper de heartbeats
+esb.enable_health_checks(
+    probe_interval=float(os.environ.get('ESB_HEALTH_PROBE_INTERVAL', 5)),
+    probe_timeout=float(os.environ.get('ESB_HEALTH_PROBE_TIMEOUT', 1)),
+    jitter=float(os.environ.get('ESB_HEALTH_JITTER', 0.2)),
+    failure_threshold=int(os.environ.get('ESB_HEALTH_FAILURES', 2)),
+    evict_after=float(os.environ.get('ESB_HEARTBEAT_EVICT_AFTER', 3))
+)
+
+# Sagas do orquestrador persistidas (retoma as interrompidas numa queda)
+orchestrator.enable_saga_persistence(open_store('sagas'))
+
 
 @app.route('/')
 def home():
@@ -47,10 +85,175 @@ def esb_status():
 
 @app.route('/esb/messages')
 def esb_messages():
-    """Log de mensagens do ESB"""
-    return jsonify({
-        'messages': esb.get_message_log(limit=20)
-    })
+    """
+    Log de mensagens do ESB, mais recentes primeiro, com filtros indexados:
+    ?id=&from=&to=&operation=&status=&correlation_id=&minute=AAAA-MM-DDTHH:MM
+    &since=&until= (por minuto) &limit=20&cursor=<next_cursor da página anterior>
+    """
+    limit = min(request.args.get('limit', 20, type=int), 500)
+    filters = {field: request.args[field] for field in MESSAGE_FILTERS if request.args.get(field)}
+    messages, next_cursor = esb.query_messages(
+        filters, cursor=request.args.get('cursor', type=int), limit=limit,
+        since=request.args.get('since'), until=request.args.get('until')
+    )
+    return jsonify({'messages': messages, 'next_cursor': next_cursor, 'limit': limit})
+
+
+@app.route('/esb/messages/correlation/<correlation_id>')
+def esb_correlation(correlation_id):
+    """Todas as mensagens de um fluxo (ex: saga_id de POST /orders), em ordem cronológica"""
+    return jsonify({'correlation_id': correlation_id,
+                    'messages': esb.get_correlation(correlation_id)})
+
+
+@app.route('/esb/services/<service_name>/instances', methods=['GET'])
+def list_instances(service_name):
+    """Instâncias do serviço, com requisições em voo e estado"""
+    status = esb.dispatcher.registry.get_status().get(service_name)
+    if status is None:
+        return jsonify({'error': 'Serviço não encontrado'}), 404
+    return jsonify(status)
+
+
+@app.route('/esb/services/<service_name>/instances', methods=['POST'])
+def register_instance(service_name):
+    """
+    Registra uma réplica
+    {"endpoint": "http://host:porta", "instance_id": "...", "codecs": ["msgpack", "json"]}
+    """
+    data = request.json or {}
+    if not data.get('endpoint'):
+        return jsonify({'error': 'endpoint é obrigatório'}), 400
+    instance_id = esb.register_service(service_name, data['endpoint'],
+                                       instance_id=data.get('instance_id'),
+                                       codecs=data.get('codecs'))
+    return jsonify({'service': service_name, 'instance_id': instance_id}), 201
+
+
+@app.route('/esb/services/<service_name>/heartbeat', methods=['POST'])
+def heartbeat(service_name):
+    """
+    Renova (ou cria) o registro de uma réplica com TTL
+    {"endpoint": "http://host:porta", "ttl": 15, "instance_id": "...", "codecs": [...]}
+    Os codecs anunciados definem o formato do corpo que o ESB envia à réplica.
+    """
+    data = request.json or {}
+    if not data.get('endpoint'):
+        return jsonify({'error': 'endpoint é obrigatório'}), 400
+    ttl = float(data.get('ttl') or os.environ.get('ESB_HEARTBEAT_TTL', 15))
+    instance_id = esb.heartbeat(service_name, data['endpoint'], ttl, data.get('instance_id'),
+                                data.get('codecs'))
+    return jsonify({'service': service_name, 'instance_id': instance_id, 'ttl': ttl})
+
+
+@app.route('/esb/services/<service_name>/instances/<instance_id>/drain', methods=['POST'])
+def drain_instance(service_name, instance_id):
+    """Tira a réplica da rotação (?remove=true: remove quando as requisições em voo terminarem)"""
+    remove = request.args.get('remove', 'false').lower() in ('1', 'true')
+    if not esb.drain_instance(service_name, instance_id, remove):
+        return jsonify({'error': 'Instância não encontrada'}), 404
+    return jsonify({'status': 'draining', 'remove_when_drained': remove})
+
+
+@app.route('/esb/services/<service_name>/instances/<instance_id>/activate', methods=['POST'])
+def activate_instance(service_name, instance_id):
+    """Devolve uma réplica drenada à rotação"""
+    if not esb.activate_instance(service_name, instance_id):
+        return jsonify({'error': 'Instância não encontrada'}), 404
+    return jsonify({'status': 'active'})
+
+
+@app.route('/esb/services/<service_name>/instances/<instance_id>', methods=['DELETE'])
+def delete_instance(service_name, instance_id):
+    """Remove a réplica imediatamente"""
+    esb.unregister_service(service_name, instance_id)
+    return jsonify({'status': 'removed'})
+
+
+@app.route('/esb/services/<service_name>/load-balancing', methods=['PUT'])
+def set_load_balancing(service_name):
+    """{"strategy": "round_robin" | "least_outstanding" | "power_of_two"}"""
+    try:
+        esb.set_load_balancing(service_name, (request.json or {}).get('strategy'))
+    except KeyError:
+        return jsonify({'error': 'Serviço não encontrado'}), 404
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify({'service': service_name, 'strategy': request.json['strategy']})
+
+
+@app.route('/esb/subscriptions', methods=['GET'])
+def list_subscriptions():
+    """Assinaturas de tópicos (?topic=orders)"""
+    return jsonify({'subscriptions': esb.topics.list_subscriptions(request.args.get('topic'))})
+
+
+@app.route('/esb/subscriptions', methods=['POST'])
+def create_subscription():
+    """
+    Assina um tópico para um serviço registrado
+    {"topic": "orders", "subscriber": "order-service", "operation": "order_confirmed",
+     "filters": {"user_id": 1}, "target_operation": "...", "path": "/events/orders",
+     "queue_size": 1000, "policy": "drop"}
+    Com "path", a operação entregue é mapeada para POST <path> no assinante.
+    """
+    data = request.json or {}
+    topic, subscriber = data.get('topic'), data.get('subscriber')
+    if not topic or subscriber not in esb.services:
+        return jsonify({'error': 'topic e subscriber (serviço registrado) são obrigatórios'}), 400
+    
+    target_operation = data.get('target_operation')
+    if data.get('path'):
+        target_operation = target_operation or f"event:{topic}"
+    
+    try:
+        subscription = esb.subscribe(
+            topic, subscriber,
+            operation=data.get('operation'),
+            filters=data.get('filters'),
+            target_operation=target_operation,
+            queue_size=data.get('queue_size', 1000),
+            policy=data.get('policy', 'drop')
+        )
+    except (TypeError, ValueError) as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    # Rota só depois da assinatura aceita (assinatura inválida não deixa rota)
+    if data.get('path'):
+        esb.register_route(subscriber, target_operation, 'POST', data['path'])
+    
+    return jsonify(subscription.to_dict()), 201
+
+
+@app.route('/esb/subscriptions/<subscription_id>', methods=['DELETE'])
+def delete_subscription(subscription_id):
+    """Cancela uma assinatura"""
+    if not esb.unsubscribe(subscription_id):
+        return jsonify({'error': 'Assinatura não encontrada'}), 404
+    return jsonify({'status': 'unsubscribed'})
+
+
+@app.route('/esb/queues')
+def esb_queues():
+    """Filas duráveis: prontas, em voo, agendadas e dead-lettered"""
+    return jsonify(esb.queues.get_stats())
+
+
+@app.route('/esb/queues/<queue_name>/messages')
+def esb_queue_messages(queue_name):
+    """Mensagens prontas de uma fila, sem consumir (ex: deliver.payment-service.dlq)"""
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    return jsonify({'messages': esb.queues.peek(queue_name, limit)})
+
+
+@app.route('/esb/queues/<queue_name>/redrive', methods=['POST'])
+def esb_queue_redrive(queue_name):
+    """Devolve mensagens da DLQ para a fila de origem"""
+    try:
+        moved = esb.queues.redrive(queue_name, request.args.get('limit', type=int))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify({'redriven': moved})
 
 
 @app.route('/orders', methods=['POST'])
@@ -66,6 +269,8 @@ def create_order():
         items=data.get('items', [])
     )
     
+    if result.get('saga_status') in ('running', 'compensating'):
+        return jsonify(result), 202  # segue em segundo plano: GET /sagas/<saga_id>
     if 'error' in result:
         return jsonify(result), 400
     
@@ -80,12 +285,35 @@ def cancel_order(order_id):
     """
     result = orchestrator.orchestrate_order_cancellation(order_id)
     
+    if result.get('saga_status') in ('running', 'compensating'):
+        return jsonify(result), 202
     if 'error' in result:
         return jsonify(result), 400
     
     return jsonify(result)
 
 
+@app.route('/sagas')
+def saga_stats():
+    """Contadores do motor de sagas"""
+    return jsonify(orchestrator.sagas.get_stats())
+
+
+@app.route('/sagas/failed')
+def failed_sagas():
+    """Sagas que terminaram FAILED (compensação esgotada), guardadas para revisão"""
+    return jsonify({'sagas': orchestrator.sagas.failed()})
+
+
+@app.route('/sagas/<saga_id>')
+def get_saga(saga_id):
+    """Estado de uma saga (em andamento ou concluída recentemente)"""
+    state = orchestrator.sagas.get(saga_id)
+    if state is None:
+        return jsonify({'error': 'Saga não encontrada'}), 404
+    return jsonify(state)
+
+
 @app.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     """Busca usuário via ESB"""
@@ -109,4 +337,7 @@ if __name__ == '__main__':
     print("🚀 Servidor: http://localhost:8000")
     print("="*60 + "\n")
     
-    app.run(port=8000, debug=True)
+    # Sem reloader: o processo vigia do Werkzeug também executaria o módulo e
+    # abriria de novo as filas duráveis e o store de sagas (entregas e
+    # sagas retomadas em dobro)
+    app.run(port=8000, debug=True, use_reloader=False)
@@ -0,0 +1,151 @@
+"""
+API Gateway - Variante ASGI (async)
+===================================
+Mesmas rotas do gateway Flask (api_gateway.py), com handlers async sobre o
+AsyncMessageBus: uma requisição esperando um serviço lento não ocupa uma
+thread, então a vazão do gateway deixa de ser limitada pelo número de threads.
+Quando o ESB satura, a requisição é rejeitada com 503 (backpressure).
+
+Executar:
+    hypercorn gateway.asgi_gateway:app --bind 0.0.0.0:8000
+"""
+
+from quart import Quart, jsonify, request
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from esb.async_message_bus import create_async_bus_from_env
+from esb.async_orchestrator import AsyncServiceOrchestrator
+from esb.message_log import INDEXED_FIELDS, MINUTE
+
+# Mesmos endpoints de serviço do gateway Flask
+SERVICE_ENDPOINTS = {
+    'auth-service': os.environ.get('AUTH_SERVICE_URL', 'http://localhost:5010'),
+    'product-service': os.environ.get('PRODUCT_SERVICE_URL', 'http://localhost:5011'),
+    'order-service': os.environ.get('ORDER_SERVICE_URL', 'http://localhost:5012'),
+    'payment-service': os.environ.get('PAYMENT_SERVICE_URL', 'http://localhost:5013'),
+}
+
+esb = create_async_bus_from_env()
+for service_name, endpoints in SERVICE_ENDPOINTS.items():
+    for endpoint in endpoints.split(','):
+        esb.register_service(service_name, endpoint.strip())
+orchestrator = AsyncServiceOrchestrator(
+    esb, deadline=float(os.environ.get('ORCHESTRATION_DEADLINE', 10.0))
+)
+
+app = Quart(__name__)
+
+# Filtros aceitos em /esb/messages (campos indexados do log)
+MESSAGE_FILTERS = INDEXED_FIELDS + (MINUTE,)
+
+
+@app.before_serving
+async def startup():
+    await esb.start()
+
+
+@app.after_serving
+async def shutdown():
+    await esb.close()
+
+
+def _error_response(result):
+    """503 quando o ESB rejeitou por saturação, 400 nos demais erros"""
+    if result.get('status') == 'rejected':
+        return jsonify(result), 503, {'Retry-After': '1'}
+    return jsonify(result), 400
+
+
+@app.route('/')
+async def home():
+    return jsonify({
+        'message': 'SOA E-commerce - API Gateway (ASGI)',
+        'architecture': 'Service-Oriented Architecture (SOA)',
+        'description': 'Serviços se comunicam através do ESB assíncrono',
+        'endpoints': {
+            'esb_status': '/esb/status',
+            'create_order': 'POST /orders',
+            'cancel_order': 'POST /orders/<id>/cancel'
+        }
+    })
+
+
+@app.route('/esb/status')
+async def esb_status():
+    """Status do ESB (inclui fila de entrada e rejeições)"""
+    return jsonify(esb.get_service_status())
+
+
+@app.route('/esb/messages')
+async def esb_messages():
+    """Log de mensagens do ESB com os mesmos filtros e cursor do gateway Flask"""
+    limit = min(request.args.get('limit', 20, type=int), 500)
+    filters = {field: request.args[field] for field in MESSAGE_FILTERS if request.args.get(field)}
+    messages, next_cursor = esb.query_messages(
+        filters, cursor=request.args.get('cursor', type=int), limit=limit,
+        since=request.args.get('since'), until=request.args.get('until')
+    )
+    return jsonify({'messages': messages, 'next_cursor': next_cursor, 'limit': limit})
+
+
+@app.route('/esb/messages/correlation/<correlation_id>')
+async def esb_correlation(correlation_id):
+    """Todas as mensagens de uma orquestração, em ordem cronológica"""
+    return jsonify({'correlation_id': correlation_id,
+                    'messages': esb.get_correlation(correlation_id)})
+
+
+@app.route('/orders', methods=['POST'])
+async def create_order():
+    """Cria pedido através do orquestrador assíncrono"""
+    data = await request.get_json()
+
+    result = await orchestrator.orchestrate_order_creation(
+        user_id=data.get('user_id'),
+        items=data.get('items', [])
+    )
+
+    if 'error' in result:
+        return _error_response(result)
+
+    return jsonify(result), 201
+
+
+@app.route('/orders/<int:order_id>/cancel', methods=['POST'])
+async def cancel_order(order_id):
+    """Cancela pedido através do orquestrador assíncrono"""
+    result = await orchestrator.orchestrate_order_cancellation(order_id)
+
+    if 'error' in result:
+        return _error_response(result)
+
+    return jsonify(result)
+
+
+@app.route('/users/<int:user_id>', methods=['GET'])
+async def get_user(user_id):
+    """Busca usuário via ESB"""
+    response = await esb.send_message(
+        from_service='api-gateway',
+        to_service='auth-service',
+        operation='get_user',
+        payload={'user_id': user_id}
+    )
+
+    if response.get('status') == 'rejected':
+        return _error_response(response)
+
+    return jsonify(response)
+
+
+if __name__ == '__main__':
+    print("\n" + "="*60)
+    print("⚡ API GATEWAY - Arquitetura SOA (ASGI)")
+    print("="*60)
+    print("🚀 Servidor: http://localhost:8000")
+    print("   (produção: hypercorn gateway.asgi_gateway:app --bind 0.0.0.0:8000)")
+    print("="*60 + "\n")
+
+    app.run(port=8000)
@@ -11,8 +11,10 @@ import os
 # Adicionar path do ESB
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from esb.message_bus import esb
+from shared import install_codecs, start_heartbeat
 
 app = Flask(__name__)
+install_codecs(app)  # corpos msgpack/compactos enviados pelo ESB
 
 # Dados simulados
 users_db = {
@@ -54,6 +56,8 @@ def get_user(user_id):
 if __name__ == '__main__':
     # Registrar serviço no ESB
     esb.register_service('auth-service', 'http://localhost:5010')
+    # Heartbeat para o registro do gateway (com ESB_REGISTRY_URL definido)
+    start_heartbeat('auth-service', 'http://localhost:5010')
     
     print("\n🔐 Auth Service (SOA)")
     print("Porta: 5010")
@@ -7,18 +7,32 @@ Serviço independente que se comunica via ESB
 from flask import Flask, jsonify, request
 import sys
 import os
+import threading
 from datetime import datetime
 import requests
 
 # Adicionar path do ESB
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from esb.message_bus import esb
+from shared import SecondaryIndex, day_bucket, install_codecs, open_store, start_heartbeat
 
 app = Flask(__name__)
+install_codecs(app)  # corpos msgpack/compactos enviados pelo ESB
 
-# Dados simulados
-orders_db = {}
-order_counter = 1
+# Pedidos em memória, persistidos em snapshot + WAL
+orders_store = open_store('orders')
+orders_db = orders_store.data
+# O maior id gravado cobre metadados gravados fora de ordem entre threads
+order_counter = max(orders_store.meta.get('order_counter', 1), max(orders_db, default=0) + 1)
+counter_lock = threading.Lock()
+
+# Índices secundários (filtros de GET /orders), mantidos a cada mutação
+orders_index = SecondaryIndex(orders_store, {
+    'user_id': lambda order: order.get('user_id'),
+    'status': lambda order: order.get('status'),
+    'created_date': lambda order: day_bucket(order.get('created_at')),
+    'idempotency_key': lambda order: order.get('idempotency_key'),
+})
 
 
 @app.route('/health', methods=['GET'])
@@ -28,8 +42,26 @@ def health():
 
 @app.route('/orders', methods=['GET'])
 def get_orders():
-    """Lista todos os pedidos"""
-    return jsonify(list(orders_db.values()))
+    """
+    Lista pedidos com filtros indexados e paginação por cursor
+    ?user_id=1&status=confirmed&created_date=2024-01-31&limit=50&cursor=<next_cursor>
+    """
+    filters = {}
+    if request.args.get('user_id') is not None:
+        filters['user_id'] = request.args.get('user_id', type=int)
+    for field in ('status', 'created_date'):
+        if request.args.get(field):
+            filters[field] = request.args[field]
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    cursor = request.args.get('cursor', type=int)
+    
+    order_ids, next_cursor = orders_index.query(filters, cursor=cursor, limit=limit)
+    
+    return jsonify({
+        'orders': [orders_db[order_id] for order_id in order_ids if order_id in orders_db],
+        'next_cursor': next_cursor,
+        'limit': limit
+    })
 
 
 @app.route('/orders/<int:order_id>', methods=['GET'])
@@ -43,16 +75,27 @@ def get_order(order_id):
 
 @app.route('/orders', methods=['POST'])
 def create_order():
-    """Cria um novo pedido"""
+    """
+    Cria um novo pedido
+    Aceita um produto (product_id + quantity) ou vários (items)
+    """
     global order_counter
     
     data = request.json
     user_id = data.get('user_id')
-    product_id = data.get('product_id')
-    quantity = data.get('quantity', 1)
+    items = data.get('items')
+    if items is None and data.get('product_id'):
+        items = [{'product_id': data.get('product_id'), 'quantity': data.get('quantity', 1)}]
+    
+    if not user_id or not items:
+        return jsonify({'error': 'user_id e product_id (ou items) são obrigatórios'}), 400
     
-    if not user_id or not product_id:
-        return jsonify({'error': 'user_id e product_id são obrigatórios'}), 400
+    # Repetição da mesma criação (retry de saga): devolve o pedido já criado
+    idempotency_key = data.get('idempotency_key')
+    if idempotency_key:
+        existing, _ = orders_index.query({'idempotency_key': idempotency_key}, limit=1)
+        if existing:
+            return jsonify(orders_db[existing[0]]), 200
     
     # Validar usuário via ESB
     try:
@@ -63,28 +106,40 @@ def create_order():
     except:
         return jsonify({'error': 'Erro ao validar usuário'}), 500
     
-    # Verificar estoque via ESB
+    # Verificar estoque via ESB (carrinho inteiro em uma chamada)
     try:
-        stock_response = requests.post(f'http://localhost:5011/products/{product_id}/check-stock',
-                                     json={'quantity': quantity}, timeout=5)
-        if not stock_response.json().get('available'):
-            return jsonify({'error': 'Estoque insuficiente'}), 400
+        stock_response = requests.post('http://localhost:5011/products/check-stock:batch',
+                                       json={'items': items}, timeout=5)
+        stock = stock_response.json()
+        if not stock.get('available'):
+            return jsonify({'error': 'Estoque insuficiente',
+                            'products': stock.get('missing', []) + stock.get('unavailable', [])}), 400
     except:
         return jsonify({'error': 'Erro ao verificar estoque'}), 500
     
     # Criar pedido
+    with counter_lock:
+        order_id = order_counter
+        order_counter += 1
+    
     order = {
-        'id': order_counter,
+        'id': order_id,
         'user_id': user_id,
-        'product_id': product_id,
-        'quantity': quantity,
+        'items': [{'product_id': i['product_id'], 'quantity': i.get('quantity', 1)} for i in items],
         'status': 'created',
         'created_at': datetime.now().isoformat(),
-        'total': 0  # Será calculado pelo payment service
+        'total': 0,  # Será calculado pelo payment service
+        # Falso quando o estoque é baixado por quem criou o pedido (orquestrador)
+        'reserve_on_confirm': data.get('reserve_on_confirm', True),
+        # Reserva de estoque feita pelo orquestrador (devolvida no cancelamento)
+        'reservation_id': data.get('reservation_id'),
+        'idempotency_key': idempotency_key
     }
+    if len(items) == 1:
+        order['product_id'] = order['items'][0]['product_id']
+        order['quantity'] = order['items'][0]['quantity']
     
-    orders_db[order_counter] = order
-    order_counter += 1
+    orders_store.put(order_id, order, meta={'order_counter': order_id + 1})
     
     return jsonify(order), 201
 
@@ -97,21 +152,22 @@ def confirm_order(order_id):
     
     # Reservar estoque
     order = orders_db[order_id]
-    try:
-        reserve_response = requests.post(
-            f'http://localhost:5011/products/{order["product_id"]}/reserve',
-            json={'quantity': order['quantity']}, timeout=5)
-        
-        if reserve_response.status_code != 200:
-            return jsonify({'error': 'Erro ao reservar estoque'}), 500
-    except:
-        return jsonify({'error': 'Erro ao comunicar com product service'}), 500
+    if order.get('reserve_on_confirm', True):
+        try:
+            reserve_response = requests.post(
+                'http://localhost:5011/products/reserve:batch',
+                json={'items': order['items']}, timeout=5)
+            
+            if reserve_response.status_code != 200:
+                return jsonify({'error': 'Erro ao reservar estoque'}), 500
+        except:
+            return jsonify({'error': 'Erro ao comunicar com product service'}), 500
     
-    # Atualizar status
-    orders_db[order_id]['status'] = 'confirmed'
-    orders_db[order_id]['confirmed_at'] = datetime.now().isoformat()
+    # Atualizar status (grava um novo valor; o store não é alterado no lugar)
+    order = {**order, 'status': 'confirmed', 'confirmed_at': datetime.now().isoformat()}
+    orders_store.put(order_id, order)
     
-    return jsonify(orders_db[order_id])
+    return jsonify(order)
 
 
 @app.route('/orders/<int:order_id>/cancel', methods=['POST'])
@@ -120,18 +176,22 @@ def cancel_order(order_id):
     if order_id not in orders_db:
         return jsonify({'error': 'Pedido não encontrado'}), 404
     
-    orders_db[order_id]['status'] = 'cancelled'
-    orders_db[order_id]['cancelled_at'] = datetime.now().isoformat()
+    order = {**orders_db[order_id], 'status': 'cancelled',
+             'cancelled_at': datetime.now().isoformat()}
+    orders_store.put(order_id, order)
     
-    return jsonify(orders_db[order_id])
+    return jsonify(order)
 
 
 if __name__ == '__main__':
     # Registrar serviço no ESB
     esb.register_service('order-service', 'http://localhost:5012')
+    # Heartbeat para o registro do gateway (com ESB_REGISTRY_URL definido)
+    start_heartbeat('order-service', 'http://localhost:5012')
     
     print("\n📋 Order Service (SOA)")
     print("Porta: 5012")
     print("Registrado no ESB")
     
-    app.run(port=5012, debug=True)
+    # Sem reloader: o processo vigia do Werkzeug também abriria os stores (WAL)
+    app.run(port=5012, debug=True, use_reloader=False)
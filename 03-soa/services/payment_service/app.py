@@ -7,6 +7,7 @@ Serviço independente que se comunica via ESB
 from flask import Flask, jsonify, request
 import sys
 import os
+import threading
 from datetime import datetime
 import requests
 import random
@@ -14,20 +15,34 @@ import random
 # Adicionar path do ESB
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from esb.message_bus import esb
+from shared import SecondaryIndex, day_bucket, install_codecs, open_store, start_heartbeat
+from price_cache import PriceCache, PriceUnavailable, UnknownProduct
 
 app = Flask(__name__)
-
-# Dados simulados
-payments_db = {}
-payment_counter = 1
-
-# Preços dos produtos (simulado)
-product_prices = {
-    1: 1299.99,
-    2: 2499.99,
-    3: 199.99,
-    4: 1899.99
-}
+install_codecs(app)  # corpos msgpack/compactos enviados pelo ESB
+
+# Pagamentos em memória, persistidos em snapshot + WAL
+payments_store = open_store('payments')
+payments_db = payments_store.data
+# O maior id gravado cobre metadados gravados fora de ordem entre threads
+payment_counter = max(payments_store.meta.get('payment_counter', 1), max(payments_db, default=0) + 1)
+counter_lock = threading.Lock()
+
+# Índices secundários (filtros de GET /payments e busca por pedido)
+payments_index = SecondaryIndex(payments_store, {
+    'user_id': lambda payment: payment.get('user_id'),
+    'order_id': lambda payment: payment.get('order_id'),
+    'status': lambda payment: payment.get('status'),
+    'processed_date': lambda payment: day_bucket(payment.get('processed_at')),
+    'idempotency_key': lambda payment: payment.get('idempotency_key'),
+})
+
+# Preços vindos do product-service (cache com TTL + notificações)
+price_cache = PriceCache(
+    os.environ.get('PRODUCT_SERVICE_URL', 'http://localhost:5011'),
+    ttl=float(os.environ.get('PRICE_CACHE_TTL', 60))
+)
+price_cache.warm_in_background()
 
 
 @app.route('/health', methods=['GET'])
@@ -37,8 +52,27 @@ def health():
 
 @app.route('/payments', methods=['GET'])
 def get_payments():
-    """Lista todos os pagamentos"""
-    return jsonify(list(payments_db.values()))
+    """
+    Lista pagamentos com filtros indexados e paginação por cursor
+    ?user_id=1&order_id=7&status=approved&processed_date=2024-01-31&limit=50&cursor=<next_cursor>
+    """
+    filters = {}
+    for field in ('user_id', 'order_id'):
+        if request.args.get(field) is not None:
+            filters[field] = request.args.get(field, type=int)
+    for field in ('status', 'processed_date'):
+        if request.args.get(field):
+            filters[field] = request.args[field]
+    limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+    cursor = request.args.get('cursor', type=int)
+    
+    payment_ids, next_cursor = payments_index.query(filters, cursor=cursor, limit=limit)
+    
+    return jsonify({
+        'payments': [payments_db[payment_id] for payment_id in payment_ids if payment_id in payments_db],
+        'next_cursor': next_cursor,
+        'limit': limit
+    })
 
 
 @app.route('/payments/<int:payment_id>', methods=['GET'])
@@ -62,6 +96,14 @@ def process_payment():
     if not order_id:
         return jsonify({'error': 'order_id é obrigatório'}), 400
     
+    # Repetição do mesmo pagamento (retry de saga): não cobra de novo
+    idempotency_key = data.get('idempotency_key')
+    if idempotency_key:
+        existing, _ = payments_index.query({'idempotency_key': idempotency_key}, limit=1)
+        if existing:
+            payment = payments_db[existing[0]]
+            return jsonify(payment), 200 if payment['status'] != 'declined' else 400
+    
     # Buscar dados do pedido
     try:
         order_response = requests.get(f'http://localhost:5012/orders/{order_id}', timeout=5)
@@ -72,31 +114,39 @@ def process_payment():
     except:
         return jsonify({'error': 'Erro ao buscar pedido'}), 500
     
-    # Calcular total
-    product_id = order['product_id']
-    quantity = order['quantity']
-    unit_price = product_prices.get(product_id, 100.0)
-    total = unit_price * quantity
+    # Calcular total com preços do cache
+    try:
+        prices = price_cache.get_many(item['product_id'] for item in order['items'])
+    except UnknownProduct as exc:
+        return jsonify({'error': 'Produto sem preço', 'product_id': exc.args[0]}), 400
+    except PriceUnavailable as exc:
+        return jsonify({'error': 'Preço indisponível', 'details': str(exc)}), 503
+    total = round(sum(prices[item['product_id']] * item['quantity'] for item in order['items']), 2)
     
     # Simular processamento do pagamento
     # 90% de sucesso, 10% de falha
     success = random.random() > 0.1
     
+    with counter_lock:
+        payment_id = payment_counter
+        payment_counter += 1
+    
     payment = {
-        'id': payment_counter,
+        'id': payment_id,
         'order_id': order_id,
+        'user_id': order.get('user_id'),
         'amount': total,
         'payment_method': payment_method,
         'status': 'approved' if success else 'declined',
         'processed_at': datetime.now().isoformat(),
-        'transaction_id': f'TXN_{payment_counter}_{random.randint(1000, 9999)}'
+        'transaction_id': f'TXN_{payment_id}_{random.randint(1000, 9999)}',
+        'idempotency_key': idempotency_key
     }
     
     if not success:
         payment['error'] = 'Cartão recusado'
     
-    payments_db[payment_counter] = payment
-    payment_counter += 1
+    payments_store.put(payment_id, payment, meta={'payment_counter': payment_id + 1})
     
     # Se pagamento aprovado, confirmar pedido
     if success:
@@ -131,18 +181,48 @@ def refund_payment(payment_id):
     }
     
     # Atualizar pagamento original
-    payments_db[payment_id]['status'] = 'refunded'
-    payments_db[payment_id]['refunded_at'] = datetime.now().isoformat()
+    payments_store.put(payment_id, {**payment, 'status': 'refunded',
+                                    'refunded_at': refund['refunded_at']})
     
     return jsonify(refund)
 
 
+@app.route('/payments/order/<int:order_id>/refund', methods=['POST'])
+def refund_order_payment(order_id):
+    """Estorna o pagamento aprovado de um pedido"""
+    payment_ids, _ = payments_index.query({'order_id': order_id, 'status': 'approved'}, limit=1)
+    if payment_ids:
+        return refund_payment(payment_ids[0])
+    
+    return jsonify({'error': 'Nenhum pagamento aprovado para o pedido'}), 404
+
+
+@app.route('/prices/notify', methods=['POST'])
+def notify_price_change():
+    """Recebe mudanças de preço publicadas pelo product-service"""
+    data = request.json
+    if data.get('product_id') is None:
+        return jsonify({'error': 'product_id é obrigatório'}), 400
+    
+    price_cache.notify(data['product_id'], data.get('price'))
+    return jsonify({'status': 'applied'})
+
+
+@app.route('/prices/cache/stats', methods=['GET'])
+def price_cache_stats():
+    """Acertos, misses coalescidos e idade das entradas do cache de preços"""
+    return jsonify(price_cache.get_stats())
+
+
 if __name__ == '__main__':
     # Registrar serviço no ESB
     esb.register_service('payment-service', 'http://localhost:5013')
+    # Heartbeat para o registro do gateway (com ESB_REGISTRY_URL definido)
+    start_heartbeat('payment-service', 'http://localhost:5013')
     
     print("\n💳 Payment Service (SOA)")
     print("Porta: 5013")
     print("Registrado no ESB")
     
-    app.run(port=5013, debug=True)
+    # Sem reloader: o processo vigia do Werkzeug também abriria os stores (WAL)
+    app.run(port=5013, debug=True, use_reloader=False)
@@ -0,0 +1,195 @@
+"""
+Cache de Preços - Payment Service
+=================================
+Preços vêm do product-service, mas sem uma ida extra por pagamento:
+- Aquecido com GET /products na subida
+- Cada entrada expira após `ttl` segundos e é recarregada no próximo uso
+- Notificações de mudança (POST /prices/notify) atualizam na hora
+- Misses concorrentes do mesmo produto viram uma única chamada upstream
+- Se o product-service cair, o último preço conhecido é servido (stale)
+"""
+
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+import requests
+
+
+class PriceUnavailable(Exception):
+    """Preço desconhecido e product-service indisponível"""
+
+
+class UnknownProduct(Exception):
+    """Produto inexistente no product-service"""
+
+
+class _Flight:
+    """Uma busca upstream em andamento; os demais interessados esperam por ela"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.price: Optional[float] = None
+        self.error: Optional[Exception] = None
+
+
+class PriceCache:
+
+    def __init__(self, product_service_url: str, ttl: float = 60.0, timeout: float = 2.0):
+        self.base_url = product_service_url.rstrip('/')
+        self.ttl = ttl
+        self.timeout = timeout
+        self.session = requests.Session()
+
+        self._prices: Dict[int, float] = {}
+        self._fetched_at: Dict[int, float] = {}
+        self._versions: Dict[int, int] = {}  # sobe a cada notificação
+        self._inflight: Dict[int, _Flight] = {}
+        self._lock = threading.Lock()
+        self.last_warm_at: Optional[float] = None
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'coalesced': 0,
+                      'upstream_calls': 0, 'upstream_errors': 0,
+                      'stale_served': 0, 'notifications': 0}
+
+    # Carga ----------------------------------------------------------------
+
+    def warm(self) -> int:
+        """
+        Carrega todos os preços com GET /products; retorna quantos
+        Produtos notificados durante a carga mantêm o preço da notificação
+        """
+        with self._lock:
+            self.stats['upstream_calls'] += 1
+            versions = dict(self._versions)
+        response = self.session.get(f"{self.base_url}/products", timeout=self.timeout)
+        response.raise_for_status()
+        products = response.json()
+        now = time.monotonic()
+        with self._lock:
+            for product in products:
+                product_id = product['id']
+                if self._versions.get(product_id, 0) != versions.get(product_id, 0):
+                    continue
+                self._prices[product_id] = float(product['price'])
+                self._fetched_at[product_id] = now
+            self.last_warm_at = time.time()
+        return len(products)
+
+    def warm_in_background(self):
+        """Aquece sem segurar a subida do serviço (falha = cache frio)"""
+        def run():
+            try:
+                count = self.warm()
+                print(f"💲 Cache de preços aquecido: {count} produtos")
+            except requests.RequestException as exc:
+                self._count('upstream_errors')
+                print(f"⚠️  Cache de preços frio ({exc.__class__.__name__})")
+        threading.Thread(target=run, daemon=True, name='price-cache-warm').start()
+
+    def _count(self, counter: str):
+        with self._lock:
+            self.stats[counter] += 1
+
+    def _fetch(self, product_id: int) -> float:
+        self._count('upstream_calls')
+        try:
+            response = self.session.get(f"{self.base_url}/products/{product_id}",
+                                        timeout=self.timeout)
+        except requests.RequestException as exc:
+            self._count('upstream_errors')
+            raise PriceUnavailable(f"product-service indisponível: {exc.__class__.__name__}")
+        if response.status_code == 404:
+            raise UnknownProduct(product_id)
+        if response.status_code != 200:
+            self._count('upstream_errors')
+            raise PriceUnavailable(f"product-service respondeu {response.status_code}")
+        return float(response.json()['price'])
+
+    # Consulta -------------------------------------------------------------
+
+    def get(self, product_id: int) -> float:
+        """Preço do produto (cache, ou uma busca upstream compartilhada)"""
+        with self._lock:
+            price = self._prices.get(product_id)
+            if price is not None and time.monotonic() - self._fetched_at[product_id] < self.ttl:
+                self.stats['hits'] += 1
+                return price
+            self.stats['misses' if price is None else 'expired'] += 1
+
+            flight = self._inflight.get(product_id)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[product_id] = _Flight()
+                version = self._versions.get(product_id, 0)
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            return self._resolve(product_id, flight)
+
+        try:
+            flight.price = self._fetch(product_id)
+        except (PriceUnavailable, UnknownProduct) as exc:
+            flight.error = exc
+        finally:
+            with self._lock:
+                # Uma notificação chegou durante a busca: ela é mais nova
+                if flight.price is not None and self._versions.get(product_id, 0) == version:
+                    self._prices[product_id] = flight.price
+                    self._fetched_at[product_id] = time.monotonic()
+                elif product_id in self._prices and flight.error is None:
+                    flight.price = self._prices[product_id]
+                del self._inflight[product_id]
+            flight.done.set()
+        return self._resolve(product_id, flight)
+
+    def _resolve(self, product_id: int, flight: _Flight) -> float:
+        if flight.error is None:
+            return flight.price
+        if isinstance(flight.error, PriceUnavailable):
+            with self._lock:
+                stale = self._prices.get(product_id)
+                if stale is not None:
+                    self.stats['stale_served'] += 1
+                    return stale
+        raise flight.error
+
+    def get_many(self, product_ids: Iterable[int]) -> Dict[int, float]:
+        return {product_id: self.get(product_id) for product_id in set(product_ids)}
+
+    # Notificações ---------------------------------------------------------
+
+    def notify(self, product_id: int, price: Optional[float]):
+        """Aplica uma mudança publicada pelo product-service (None = removido)"""
+        with self._lock:
+            self.stats['notifications'] += 1
+            self._versions[product_id] = self._versions.get(product_id, 0) + 1
+            if price is None:
+                self._prices.pop(product_id, None)
+                self._fetched_at.pop(product_id, None)
+            else:
+                self._prices[product_id] = float(price)
+                self._fetched_at[product_id] = time.monotonic()
+
+    # Métricas -------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores, taxa de acerto e idade das entradas (staleness)"""
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - fetched for fetched in self._fetched_at.values()]
+            inflight = len(self._inflight)
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['misses'] + stats['expired']
+        return {
+            **stats,
+            'entries': len(ages),
+            'inflight': inflight,
+            'ttl_seconds': self.ttl,
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else None,
+            'expired_entries': sum(1 for age in ages if age >= self.ttl),
+            'max_age_seconds': round(max(ages), 3) if ages else None,
+            'avg_age_seconds': round(sum(ages) / len(ages), 3) if ages else None,
+            'last_warm_at': self.last_warm_at
+        }
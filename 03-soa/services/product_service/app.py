@@ -7,15 +7,21 @@ Serviço independente que se comunica via ESB
 from flask import Flask, jsonify, request
 import sys
 import os
+import queue
+import threading
+from contextlib import contextmanager
+import requests
 
 # Adicionar path do ESB
 sys.path.append(os.path.join(os.path.dirname(__file__), '../..'))
 from esb.message_bus import esb
+from shared import install_codecs, open_store, start_heartbeat
 
 app = Flask(__name__)
+install_codecs(app)  # corpos msgpack/compactos enviados pelo ESB
 
-# Dados simulados
-products_db = {
+# Dados simulados (carga inicial do store)
+SEED_PRODUCTS = {
     1: {
         'id': 1,
         'name': 'Smartphone Galaxy',
@@ -46,6 +52,144 @@ products_db = {
     }
 }
 
+# Produtos em memória, persistidos em snapshot + WAL
+products_store = open_store('products')
+if not products_store.data:
+    for seed in SEED_PRODUCTS.values():
+        products_store.put(seed['id'], seed)
+products_db = products_store.data
+
+# Serviços avisados quando um preço muda (cache de preços do payment-service)
+PRICE_SUBSCRIBERS = [url.strip().rstrip('/') for url in
+                     os.environ.get('PRICE_SUBSCRIBERS', 'http://localhost:5013').split(',')
+                     if url.strip()]
+
+
+class StripedLock:
+    """
+    Locks de estoque listrados: N locks e cada produto usa a listra
+    id % N. Reservas de produtos diferentes quase nunca disputam o mesmo
+    lock (um lock global serializaria todas); um lote adquire suas
+    listras sempre em ordem crescente, o que evita deadlock.
+    """
+    
+    def __init__(self, stripes=64):
+        self.stripes = [threading.Lock() for _ in range(stripes)]
+    
+    def stripe_index(self, product_id):
+        return hash(product_id) % len(self.stripes)
+    
+    def lock_for(self, product_id):
+        """Lock que protege o estoque de um produto"""
+        return self.stripes[self.stripe_index(product_id)]
+    
+    @contextmanager
+    def locks_for(self, product_ids):
+        """Adquire as listras de vários produtos (uma vez cada, em ordem)"""
+        acquired = []
+        try:
+            for index in sorted({self.stripe_index(pid) for pid in product_ids}):
+                self.stripes[index].acquire()
+                acquired.append(self.stripes[index])
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+
+# Verificação + baixa de estoque sempre acontecem sob o lock do produto
+stock_locks = StripedLock(int(os.environ.get('STOCK_LOCK_STRIPES', 64)))
+
+# Reservas identificadas (reservation_id): repetir a chamada não baixa nem
+# devolve o estoque duas vezes (retries de saga e filas pelo menos uma vez)
+reservations_store = open_store('reservations')
+reservations_db = reservations_store.data
+reservation_locks = StripedLock(64)
+
+
+def _quantity(value):
+    """Quantidade pedida: inteiro positivo (ValueError para texto, bool, zero ou negativo)"""
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        raise ValueError(f"quantity deve ser um inteiro positivo (recebido: {value!r})")
+    return value
+
+
+def _batch_quantities(items):
+    """
+    Soma as quantidades por produto (o mesmo produto pode repetir)
+    ValueError se algum item não tem product_id ou quantity válidos
+    """
+    if not isinstance(items, list):
+        raise ValueError('items deve ser uma lista')
+    quantities = {}
+    for item in items:
+        if not isinstance(item, dict) or 'product_id' not in item:
+            raise ValueError('Cada item precisa de product_id')
+        try:
+            product_id = int(item['product_id'])
+        except (TypeError, ValueError):
+            raise ValueError(f"product_id inválido: {item['product_id']!r}")
+        quantities[product_id] = quantities.get(product_id, 0) + _quantity(item.get('quantity', 1))
+    return quantities
+
+
+def _check_batch(quantities):
+    """Situação de cada item do lote (chamar com as listras do lote adquiridas)"""
+    results = []
+    for product_id, quantity in quantities.items():
+        product = products_db.get(product_id)
+        results.append({
+            'product_id': product_id,
+            'available': product is not None and product['stock'] >= quantity,
+            'stock': product['stock'] if product else None,
+            'requested': quantity
+        })
+    missing = [r['product_id'] for r in results if r['stock'] is None]
+    unavailable = [r['product_id'] for r in results if not r['available']]
+    return results, missing, unavailable
+
+
+def _set_stock(product_id, stock):
+    """
+    Grava o novo estoque (valor novo, sem alterar o dict no lugar) e
+    retorna a sequência no WAL. Chamado sob o lock do produto; a espera
+    pelo disco (products_store.wait) fica para depois do lock.
+    """
+    return products_store.put(product_id, {**products_db[product_id], 'stock': stock}, sync=False)
+
+
+def try_reserve(product_id, quantity):
+    """
+    Verifica e baixa o estoque de um produto atomicamente
+    Retorna (sucesso, estoque atual ou None se o produto não existe,
+    sequência no WAL ou 0)
+    """
+    with stock_locks.lock_for(product_id):
+        product = products_db.get(product_id)
+        if product is None:
+            return False, None, 0
+        if product['stock'] < quantity:
+            return False, product['stock'], 0
+        stock = product['stock'] - quantity
+        return True, stock, _set_stock(product_id, stock)
+
+
+def reserve_quantities(quantities):
+    """
+    Reserva um lote inteiro, tudo ou nada, sob uma única aquisição das
+    listras do lote. Retorna (reservado, resultados, ausentes,
+    indisponíveis, sequência no WAL ou 0)
+    """
+    with stock_locks.locks_for(quantities):
+        results, missing, unavailable = _check_batch(quantities)
+        if missing or unavailable:
+            return False, results, missing, unavailable, 0
+        sequence = 0
+        for result in results:
+            result['remaining_stock'] = products_db[result['product_id']]['stock'] - result['requested']
+            sequence = _set_stock(result['product_id'], result['remaining_stock'])
+        return True, results, missing, unavailable, sequence
+
 
 @app.route('/health', methods=['GET'])
 def health():
@@ -71,7 +215,10 @@ def get_product(product_id):
 def check_stock(product_id):
     """Verifica estoque do produto"""
     data = request.json
-    quantity = data.get('quantity', 1)
+    try:
+        quantity = _quantity(data.get('quantity', 1))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
     
     if product_id not in products_db:
         return jsonify({'error': 'Produto não encontrado'}), 404
@@ -91,36 +238,223 @@ def check_stock(product_id):
 def reserve_stock(product_id):
     """Reserva estoque do produto"""
     data = request.json
-    quantity = data.get('quantity', 1)
+    try:
+        quantity = _quantity(data.get('quantity', 1))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
     
-    if product_id not in products_db:
-        return jsonify({'error': 'Produto não encontrado'}), 404
+    reserved, stock, sequence = try_reserve(product_id, quantity)
+    if sequence:
+        products_store.wait(sequence)
     
-    product = products_db[product_id]
+    if stock is None:
+        return jsonify({'error': 'Produto não encontrado'}), 404
     
-    if product['stock'] < quantity:
+    if not reserved:
         return jsonify({
             'error': 'Estoque insuficiente',
-            'available': product['stock'],
+            'available': stock,
             'requested': quantity
         }), 400
     
-    # Reservar estoque
-    products_db[product_id]['stock'] -= quantity
-    
     return jsonify({
         'product_id': product_id,
         'reserved': quantity,
-        'remaining_stock': products_db[product_id]['stock']
+        'remaining_stock': stock
+    })
+
+
+@app.route('/products/check-stock:batch', methods=['POST'])
+def check_stock_batch():
+    """Verifica o estoque de um carrinho inteiro em uma chamada"""
+    try:
+        quantities = _batch_quantities(request.json.get('items') or [])
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    with stock_locks.locks_for(quantities):
+        results, missing, unavailable = _check_batch(quantities)
+    
+    return jsonify({
+        'available': bool(results) and not unavailable,
+        'items': results,
+        'missing': missing,
+        'unavailable': unavailable
+    })
+
+
+@app.route('/products/reserve:batch', methods=['POST'])
+def reserve_stock_batch():
+    """
+    Reserva o estoque de um carrinho inteiro: tudo ou nada
+    Validação e baixa acontecem sob uma única aquisição das listras do lote
+    """
+    try:
+        quantities = _batch_quantities(request.json.get('items') or [])
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    if not quantities:
+        return jsonify({'error': 'items é obrigatório'}), 400
+    
+    reservation_id = request.json.get('reservation_id')
+    if reservation_id is None:
+        return _reserve_batch(quantities)
+    
+    with reservation_locks.lock_for(reservation_id):
+        reservation = reservations_db.get(reservation_id)
+        if reservation is not None:
+            # Repetição: devolve a resposta original sem tocar no estoque
+            return jsonify(reservation['response'])
+        response, status_code = _reserve_batch(quantities)
+        if status_code == 200:
+            reservations_store.put(reservation_id, {
+                'items': [{'product_id': pid, 'quantity': q} for pid, q in quantities.items()],
+                'status': 'reserved',
+                'response': response.get_json()
+            })
+        return response, status_code
+
+
+def _reserve_batch(quantities):
+    reserved, results, missing, unavailable, sequence = reserve_quantities(quantities)
+    if sequence:
+        products_store.wait(sequence)
+    if missing:
+        return jsonify({'error': 'Produto não encontrado', 'missing': missing}), 404
+    if unavailable:
+        return jsonify({
+            'error': 'Estoque insuficiente',
+            'unavailable': unavailable,
+            'items': results
+        }), 400
+    
+    return jsonify({
+        'reserved': [{'product_id': r['product_id'], 'reserved': r['requested'],
+                      'remaining_stock': r['remaining_stock']} for r in results]
+    }), 200
+
+
+@app.route('/products/release:batch', methods=['POST'])
+def release_stock_batch():
+    """
+    Devolve o estoque de um carrinho inteiro (cancelamento/compensação)
+    Com reservation_id devolve exatamente o que aquela reserva baixou,
+    uma única vez; reserva desconhecida não devolve nada.
+    """
+    reservation_id = request.json.get('reservation_id')
+    if reservation_id is None:
+        try:
+            quantities = _batch_quantities(request.json.get('items') or [])
+        except ValueError as exc:
+            return jsonify({'error': str(exc)}), 400
+        return _release_batch(quantities)
+    
+    with reservation_locks.lock_for(reservation_id):
+        reservation = reservations_db.get(reservation_id)
+        if reservation is None or reservation['status'] == 'released':
+            return jsonify({'released': [], 'reservation_id': reservation_id})
+        response, status_code = _release_batch(_batch_quantities(reservation['items']))
+        if status_code == 200:
+            reservations_store.put(reservation_id, {**reservation, 'status': 'released'})
+        return response, status_code
+
+
+def _release_batch(quantities):
+    if not quantities:
+        return jsonify({'released': []}), 200
+    
+    with stock_locks.locks_for(quantities):
+        missing = [product_id for product_id in quantities if product_id not in products_db]
+        if missing:
+            return jsonify({'error': 'Produto não encontrado', 'missing': missing}), 404
+        for product_id, quantity in quantities.items():
+            sequence = _set_stock(product_id, products_db[product_id]['stock'] + quantity)
+        stock = {product_id: products_db[product_id]['stock'] for product_id in quantities}
+    products_store.wait(sequence)
+    
+    return jsonify({
+        'released': [{'product_id': product_id, 'released': quantity, 'stock': stock[product_id]}
+                     for product_id, quantity in quantities.items()]
+    }), 200
+
+
+@app.route('/products/<int:product_id>/release', methods=['POST'])
+def release_stock(product_id):
+    """Devolve estoque reservado (cancelamento/compensação)"""
+    data = request.json
+    try:
+        quantity = _quantity(data.get('quantity', 1))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    with stock_locks.lock_for(product_id):
+        if product_id not in products_db:
+            return jsonify({'error': 'Produto não encontrado'}), 404
+        
+        sequence = _set_stock(product_id, products_db[product_id]['stock'] + quantity)
+        stock = products_db[product_id]['stock']
+    products_store.wait(sequence)
+    
+    return jsonify({
+        'product_id': product_id,
+        'released': quantity,
+        'stock': stock
     })
 
 
+# Mudanças de preço saem por uma fila com um único worker: os assinantes
+# recebem na ordem das gravações (duas alterações rápidas não se invertem)
+price_changes = queue.Queue()
+
+
+def _notify_price_changes():
+    while True:
+        product_id, price = price_changes.get()
+        for url in PRICE_SUBSCRIBERS:
+            try:
+                requests.post(f'{url}/prices/notify',
+                              json={'product_id': product_id, 'price': price}, timeout=2)
+            except requests.RequestException:
+                pass
+
+
+threading.Thread(target=_notify_price_changes, daemon=True, name='price-notifier').start()
+
+
+def publish_price_change(product_id, price):
+    """
+    Avisa os assinantes em segundo plano (melhor esforço; o TTL cobre falhas)
+    Chamar sob o lock do produto, para a fila seguir a ordem das gravações
+    """
+    price_changes.put((product_id, price))
+
+
+@app.route('/products/<int:product_id>/price', methods=['PUT'])
+def update_price(product_id):
+    """Altera o preço e notifica os caches de preço"""
+    price = request.json.get('price')
+    if not isinstance(price, (int, float)) or price < 0:
+        return jsonify({'error': 'price deve ser um número não negativo'}), 400
+    
+    with stock_locks.lock_for(product_id):
+        if product_id not in products_db:
+            return jsonify({'error': 'Produto não encontrado'}), 404
+        product = {**products_db[product_id], 'price': price}
+        products_store.put(product_id, product)
+        publish_price_change(product_id, price)
+    
+    return jsonify(product)
+
+
 if __name__ == '__main__':
     # Registrar serviço no ESB
     esb.register_service('product-service', 'http://localhost:5011')
+    # Heartbeat para o registro do gateway (com ESB_REGISTRY_URL definido)
+    start_heartbeat('product-service', 'http://localhost:5011')
     
     print("\n📦 Product Service (SOA)")
     print("Porta: 5011")
     print("Registrado no ESB")
     
-    app.run(port=5011, debug=True)
+    # Sem reloader: o processo vigia do Werkzeug também abriria os stores (WAL)
+    app.run(port=5011, debug=True, use_reloader=False)
@@ -0,0 +1,143 @@
+"""
+Stress de estoque - locks listrados x lock global
+=================================================
+1. Oversell: várias threads disputam as últimas unidades de poucos produtos
+   (reservas unitárias e em lote); a soma vendida nunca passa do estoque.
+2. Throughput: reservas espalhadas por muitos produtos com lock global
+   (1 listra) e com locks listrados. `hold_ms` simula trabalho dentro da
+   seção crítica (ex: gravação em log), quando a disputa pelo lock aparece.
+
+Uso:
+    python stress_stock.py [threads] [hold_ms]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+# Store descartável: o stress não toca os dados do serviço
+os.environ.setdefault('SOA_DATA_DIR', tempfile.mkdtemp(prefix='stress-stock-'))
+
+import app as product_app
+from app import StripedLock, reserve_quantities, try_reserve
+
+
+class HoldingLock:
+    """Lock que segura a seção crítica por hold segundos (I/O simulado)"""
+
+    def __init__(self, hold):
+        self._lock = threading.Lock()
+        self.hold = hold
+
+    def acquire(self):
+        self._lock.acquire()
+        time.sleep(self.hold)
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def use_locks(stripes, hold_ms=0.0):
+    locks = StripedLock(stripes)
+    if hold_ms:
+        locks.stripes = [HoldingLock(hold_ms / 1000) for _ in range(stripes)]
+    product_app.stock_locks = locks
+
+
+def reset_products(count, stock):
+    store = product_app.products_store
+    for product_id in list(store.data):
+        store.delete(product_id, sync=False)
+    for product_id in range(1, count + 1):
+        store.put(product_id, {'id': product_id, 'name': f'Produto {product_id}',
+                               'price': 10.0, 'stock': stock}, sync=False)
+
+
+def oversell_test(threads=32, products=3, stock=500):
+    """Todas as threads compram até esgotar; confere vendido == estoque inicial"""
+    use_locks(64)
+    reset_products(products, stock)
+    sold = [[0] * (products + 1) for _ in range(threads)]
+    barrier = threading.Barrier(threads)
+
+    def buyer(index):
+        rng = random.Random(index)
+        barrier.wait()
+        while any(p['stock'] > 0 for p in product_app.products_db.values()):
+            if rng.random() < 0.5:
+                product_id = rng.randint(1, products)
+                reserved, *_ = try_reserve(product_id, 1)
+                if reserved:
+                    sold[index][product_id] += 1
+            else:
+                cart = {pid: rng.randint(1, 3) for pid in rng.sample(range(1, products + 1), 2)}
+                reserved, *_ = reserve_quantities(cart)
+                if reserved:
+                    for pid, quantity in cart.items():
+                        sold[index][pid] += quantity
+            # sem estoque para lotes, vende o resto unitário
+            if all(p['stock'] < 3 for p in product_app.products_db.values()):
+                for pid in range(1, products + 1):
+                    while try_reserve(pid, 1)[0]:
+                        sold[index][pid] += 1
+
+    workers = [threading.Thread(target=buyer, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    for product_id in range(1, products + 1):
+        total = sum(s[product_id] for s in sold)
+        final = product_app.products_db[product_id]['stock']
+        assert final >= 0, f"estoque negativo no produto {product_id}"
+        assert total + final == stock, f"oversell no produto {product_id}: {total} + {final} != {stock}"
+    print(f"✅ Sem oversell: {threads} threads, {products} produtos x {stock} unidades")
+
+
+def throughput(stripes, threads, hold_ms, products=256, operations=20000):
+    """Reservas por segundo com o número de listras dado"""
+    use_locks(stripes, hold_ms)
+    reset_products(products, operations)
+    per_thread = operations // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        rng = random.Random(index)
+        barrier.wait()
+        for _ in range(per_thread):
+            try_reserve(rng.randint(1, products), 1)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for w in workers:
+        w.join()
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def main(threads=32, hold_ms=0.05):
+    oversell_test(threads)
+
+    operations = 20000 if not hold_ms else 4000
+    print(f"\nThroughput ({threads} threads, seção crítica +{hold_ms} ms):")
+    results = {}
+    for label, stripes in (('lock global', 1), ('64 listras', 64)):
+        results[label] = throughput(stripes, threads, hold_ms, operations=operations)
+        print(f"   {label:<12} {results[label]:>10.0f} reservas/s")
+    print(f"   ganho: {results['64 listras'] / results['lock global']:.1f}x")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:3]
+    main(int(args[0]) if args else 32, float(args[1]) if len(args) > 1 else 0.05)
@@ -0,0 +1,8 @@
+"""Infraestrutura compartilhada pelos serviços SOA"""
+from .durable_store import DurableStore, open_store
+from .heartbeat import start_heartbeat
+from .secondary_index import SecondaryIndex, day_bucket
+from .wire import install_codecs
+
+__all__ = ['DurableStore', 'open_store', 'SecondaryIndex', 'day_bucket', 'start_heartbeat',
+           'install_codecs']
@@ -0,0 +1,329 @@
+"""
+Persistência embarcada - Snapshot + WAL
+=======================================
+Mantém o dicionário de um serviço em memória (leituras na velocidade de um
+dict) e torna cada mutação durável:
+- Write-ahead log append-only (JSON lines) com group commit: escritas
+  concorrentes são agrupadas em um único write + fsync
+- Snapshots compactos periódicos; o WAL anterior ao snapshot é descartado
+- Recuperação: carrega o snapshot e reaplica só a cauda do WAL
+  (uma última linha incompleta, de uma queda no meio da escrita, é ignorada)
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class DurableStore:
+    """
+    Dicionário durável: `data` é lido diretamente; mutações passam por
+    put/delete/set_meta, que aplicam em memória e registram no WAL.
+    Valores são tratados como imutáveis: para alterar, grave um novo dict.
+
+    put/delete retornam o número de sequência do registro; com sync=True
+    (padrão) só retornam depois do fsync. Quem altera dados sob um lock
+    próprio pode usar sync=False e chamar wait(seq) fora do lock.
+    """
+
+    def __init__(self, directory: str, name: str,
+                 commit_interval: float = 0.002,
+                 snapshot_every: int = 10000,
+                 fsync: bool = True):
+        self.directory = directory
+        self.name = name
+        self.commit_interval = commit_interval
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self.data: Dict[Hashable, Any] = {}
+        self.meta: Dict[str, Any] = {}
+
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()  # serializa escrita no WAL e troca de geração
+        self._committed = threading.Condition(self._lock)
+        self._pending = []  # linhas já aplicadas em memória, aguardando o disco
+        self._sequence = 0
+        self._durable_sequence = 0
+        self._failures = []  # (primeiro, último, exceção) de lotes que não chegaram ao disco
+        self._since_snapshot = 0
+        self._generation = 0
+        self._wal = None
+        self._closed = False
+        self._listeners = []
+        self.stats = {'records': 0, 'commits': 0, 'snapshots': 0, 'write_errors': 0,
+                      'recovered_records': 0, 'recovery_ms': 0.0}
+
+        self._recover()
+        self._writer = threading.Thread(target=self._commit_loop, daemon=True,
+                                        name=f'durable-{name}')
+        self._writer.start()
+
+    # Arquivos ------------------------------------------------------------
+
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.directory, f"{self.name}.snapshot.json")
+
+    def _wal_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"{self.name}.wal.{generation:06d}")
+
+    def _wal_generations(self):
+        prefix = f"{self.name}.wal."
+        return sorted(int(f[len(prefix):]) for f in os.listdir(self.directory)
+                      if f.startswith(prefix) and f[len(prefix):].isdigit())
+
+    # Recuperação ---------------------------------------------------------
+
+    def _recover(self):
+        started = time.perf_counter()
+        first_generation = 0
+
+        if os.path.exists(self._snapshot_path()):
+            with open(self._snapshot_path(), 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self.data = {key: value for key, value in snapshot['data']}
+            self.meta = snapshot['meta']
+            first_generation = snapshot['wal_generation']
+
+        replayed = 0
+        generations = [g for g in self._wal_generations() if g >= first_generation]
+        for generation in generations:
+            with open(self._wal_path(generation), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # escrita interrompida: descarta a cauda
+                    self._apply(record)
+                    replayed += 1
+
+        self._generation = (generations[-1] if generations else first_generation) + 1
+        self._wal = open(self._wal_path(self._generation), 'a', encoding='utf-8')
+        self._since_snapshot = replayed
+        self.stats['recovered_records'] = replayed
+        self.stats['recovery_ms'] = round((time.perf_counter() - started) * 1000, 3)
+
+    def _apply(self, record: Dict[str, Any]):
+        op = record['op']
+        if op == 'put':
+            old = self.data.get(record['k'])
+            self.data[record['k']] = record['v']
+            self._notify(record['k'], old, record['v'])
+        elif op == 'del':
+            old = self.data.pop(record['k'], None)
+            if old is not None:
+                self._notify(record['k'], old, None)
+        if record.get('m'):
+            self.meta.update(record['m'])
+
+    def _notify(self, key: Hashable, old: Any, new: Any):
+        for listener in self._listeners:
+            listener(key, old, new)
+
+    def add_listener(self, listener: Callable[[Hashable, Any, Any], None]):
+        """
+        Registra listener(key, antigo, novo) chamado a cada mutação, sob o
+        lock do store (antigo/novo são None na criação/remoção). O estado
+        atual é reenviado como criações, sem janela entre carga e registro.
+        """
+        with self._lock:
+            for key, value in self.data.items():
+                listener(key, None, value)
+            self._listeners.append(listener)
+
+    # Mutações ------------------------------------------------------------
+
+    def _append(self, record: Dict[str, Any]) -> int:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"Store {self.name} fechado")
+            self._apply(record)
+            self._pending.append(line)
+            self._sequence += 1
+            return self._sequence
+
+    def put(self, key: Hashable, value: Any, meta: Optional[Dict[str, Any]] = None,
+            sync: bool = True) -> int:
+        """Grava o valor (inteiro) da chave; meta atualiza contadores no mesmo registro"""
+        record = {'op': 'put', 'k': key, 'v': value}
+        if meta:
+            record['m'] = meta
+        sequence = self._append(record)
+        if sync:
+            self.wait(sequence)
+        return sequence
+
+    def delete(self, key: Hashable, sync: bool = True) -> int:
+        """Remove a chave"""
+        sequence = self._append({'op': 'del', 'k': key})
+        if sync:
+            self.wait(sequence)
+        return sequence
+
+    def set_meta(self, meta: Dict[str, Any], sync: bool = True) -> int:
+        """Atualiza metadados (ex: contadores de id)"""
+        sequence = self._append({'op': 'meta', 'm': meta})
+        if sync:
+            self.wait(sequence)
+        return sequence
+
+    def wait(self, sequence: int):
+        """
+        Bloqueia até o registro `sequence` estar no disco
+        Levanta RuntimeError se o lote do registro falhou na escrita do WAL
+        """
+        with self._committed:
+            while True:
+                for first, last, exc in self._failures:
+                    if first <= sequence <= last:
+                        raise RuntimeError(
+                            f"Store {self.name}: registro {sequence} não foi gravado "
+                            f"({exc.__class__.__name__}: {exc})") from exc
+                if self._durable_sequence >= sequence:
+                    return
+                self._committed.wait()
+
+    # Group commit e snapshots ----------------------------------------------
+
+    def _commit_loop(self):
+        while True:
+            time.sleep(self.commit_interval)
+            with self._io_lock:
+                with self._lock:
+                    if not self._pending:
+                        if self._closed:
+                            return
+                        continue
+                    lines, self._pending = self._pending, []
+                    sequence = self._sequence
+
+                try:
+                    self._wal.write('\n'.join(lines) + '\n')
+                    self._wal.flush()
+                    if self.fsync:
+                        os.fsync(self._wal.fileno())
+                except Exception as exc:
+                    # Falha o lote (quem espera recebe o erro) e segue gravando
+                    print(f"⚠️  Store {self.name}: falha ao gravar {len(lines)} registros "
+                          f"no WAL ({exc.__class__.__name__}: {exc})")
+                    self._rotate_wal()
+                    with self._committed:
+                        self._fail(sequence - len(lines) + 1, sequence, exc)
+                    continue
+
+            with self._committed:
+                self._durable_sequence = max(self._durable_sequence, sequence)
+                self.stats['records'] += len(lines)
+                self.stats['commits'] += 1
+                self._committed.notify_all()
+
+            self._since_snapshot += len(lines)
+            if self._since_snapshot >= self.snapshot_every:
+                try:
+                    self.snapshot()
+                except Exception as exc:
+                    print(f"⚠️  Store {self.name}: falha no snapshot "
+                          f"({exc.__class__.__name__}: {exc})")
+
+    def _fail(self, first: int, last: int, exc: Exception):
+        """Marca os registros first..last como perdidos e acorda quem espera (sob o lock)"""
+        self._failures.append((first, last, exc))
+        self._durable_sequence = max(self._durable_sequence, last)
+        self.stats['write_errors'] += 1
+        self._committed.notify_all()
+
+    def _rotate_wal(self):
+        """
+        Abre uma nova geração do WAL após uma falha de escrita (sob o _io_lock):
+        uma linha parcial interrompe a recuperação do arquivo em que está, então
+        os próximos registros não podem ser gravados depois dela
+        """
+        try:
+            self._wal.close()
+        except Exception:
+            pass
+        try:
+            self._generation += 1
+            self._wal = open(self._wal_path(self._generation), 'a', encoding='utf-8')
+        except Exception:
+            pass  # o arquivo fechado falha o próximo lote, que tenta de novo
+
+    def snapshot(self):
+        """
+        Grava um snapshot compacto e descarta o WAL que ele cobre
+        O WAL muda de geração sob o lock, junto com a cópia do estado.
+        Os valores guardados não devem ser alterados no lugar (put grava
+        sempre um valor novo), então a cópia é consistente.
+        """
+        with self._io_lock, self._lock:
+            # Registros pendentes entram no WAL atual antes da troca
+            lines, self._pending = self._pending, []
+            try:
+                if lines:
+                    self._wal.write('\n'.join(lines) + '\n')
+                self._wal.flush()
+                if self.fsync:
+                    os.fsync(self._wal.fileno())
+            except Exception as exc:
+                self._rotate_wal()
+                if lines:
+                    self._fail(self._sequence - len(lines) + 1, self._sequence, exc)
+                raise
+            self._durable_sequence = self._sequence
+            self._committed.notify_all()
+
+            self._wal.close()
+            self._generation += 1
+            self._wal = open(self._wal_path(self._generation), 'a', encoding='utf-8')
+            generation = self._generation
+            encoded = json.dumps({
+                'wal_generation': generation,
+                'data': list(self.data.items()),
+                'meta': self.meta
+            }, ensure_ascii=False, default=str)
+
+        path = self._snapshot_path()
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(encoded)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+        for old in self._wal_generations():
+            if old < generation:
+                os.remove(self._wal_path(old))
+        self._since_snapshot = 0
+        self.stats['snapshots'] += 1
+
+    def close(self):
+        """Grava o que falta e encerra o writer"""
+        with self._lock:
+            self._closed = True
+        self._writer.join()
+        self._wal.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'keys': len(self.data),
+            'wal_generation': self._generation,
+            'records_since_snapshot': self._since_snapshot,
+            **self.stats
+        }
+
+
+def open_store(name: str) -> DurableStore:
+    """Store configurado por variáveis de ambiente (diretório em SOA_DATA_DIR)"""
+    directory = os.environ.get('SOA_DATA_DIR') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+    return DurableStore(
+        directory, name,
+        commit_interval=float(os.environ.get('SOA_GROUP_COMMIT_MS', 2)) / 1000,
+        snapshot_every=int(os.environ.get('SOA_SNAPSHOT_EVERY', 10000)),
+        fsync=os.environ.get('SOA_FSYNC', '1') == '1'
+    )
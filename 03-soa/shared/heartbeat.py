@@ -0,0 +1,48 @@
+"""
+Heartbeat dos serviços para o registro do ESB
+=============================================
+Cada réplica renova o próprio registro no gateway
+(POST <ESB_REGISTRY_URL>/esb/services/<serviço>/heartbeat) a cada ttl/3
+segundos. Se a réplica morre, o TTL vence e o ESB para de rotear para ela.
+A batida anuncia os codecs que o serviço entende (ver shared.wire).
+Sem ESB_REGISTRY_URL, nada é enviado.
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+import requests
+
+from esb.codec import available_codecs
+
+
+def start_heartbeat(service_name: str, default_endpoint: str) -> Optional[threading.Thread]:
+    """
+    Inicia a thread de heartbeat (configurada por variáveis de ambiente):
+    ESB_REGISTRY_URL (gateway), SERVICE_URL (endpoint público desta réplica,
+    padrão `default_endpoint`) e ESB_HEARTBEAT_TTL (segundos, padrão 15)
+    """
+    registry_url = os.environ.get('ESB_REGISTRY_URL')
+    if not registry_url:
+        return None
+    url = f"{registry_url.rstrip('/')}/esb/services/{service_name}/heartbeat"
+    beat = {
+        'endpoint': os.environ.get('SERVICE_URL', default_endpoint),
+        'ttl': float(os.environ.get('ESB_HEARTBEAT_TTL', 15)),
+        'codecs': list(available_codecs())
+    }
+
+    def run():
+        session = requests.Session()
+        while True:
+            try:
+                session.post(url, json=beat, timeout=2)
+            except requests.RequestException as exc:
+                print(f"⚠️  Heartbeat para {registry_url} falhou: {exc.__class__.__name__}")
+            time.sleep(beat['ttl'] / 3)
+
+    thread = threading.Thread(target=run, daemon=True, name='esb-heartbeat')
+    thread.start()
+    return thread
@@ -0,0 +1,113 @@
+"""
+Índices Secundários em Memória
+==============================
+Mantém, para cada campo indexado, listas ordenadas de ids por valor
+(ex: status -> 'confirmed' -> [3, 8, 21]). O índice acompanha o
+DurableStore via listener, então fica correto após cada mutação e após a
+recuperação do WAL.
+
+Consultas usam paginação por cursor (o último id devolvido): a página
+seguinte começa com um bisect na lista do filtro mais seletivo, e o custo
+acompanha o tamanho da página, não o tamanho do store.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+_MISSING = object()
+
+
+def day_bucket(timestamp: Optional[str]) -> Optional[str]:
+    """Bucket diário de um timestamp ISO (2024-01-31T10:00:00 -> 2024-01-31)"""
+    return timestamp[:10] if timestamp else None
+
+
+def _contains(keys: List[Hashable], key: Hashable) -> bool:
+    i = bisect_left(keys, key)
+    return i < len(keys) and keys[i] == key
+
+
+def _discard(keys: List[Hashable], key: Hashable):
+    i = bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+
+
+class SecondaryIndex:
+    """
+    Índices por campo sobre um DurableStore de valores dict
+    fields: nome do filtro -> função que extrai o valor indexado do registro
+    """
+
+    def __init__(self, store, fields: Dict[str, Callable[[Dict[str, Any]], Hashable]]):
+        self.fields = fields
+        self._ids: List[Hashable] = []
+        self._postings: Dict[str, Dict[Hashable, List[Hashable]]] = {name: {} for name in fields}
+        self._lock = threading.Lock()
+        store.add_listener(self._on_change)
+
+    def _on_change(self, key: Hashable, old: Optional[Dict[str, Any]],
+                   new: Optional[Dict[str, Any]]):
+        with self._lock:
+            if old is None:
+                insort(self._ids, key)
+            elif new is None:
+                _discard(self._ids, key)
+
+            for name, extract in self.fields.items():
+                old_value = extract(old) if old is not None else _MISSING
+                new_value = extract(new) if new is not None else _MISSING
+                if old_value == new_value:
+                    continue
+                postings = self._postings[name]
+                if old_value is not _MISSING:
+                    keys = postings.get(old_value)
+                    if keys is not None:
+                        _discard(keys, key)
+                        if not keys:
+                            del postings[old_value]
+                if new_value is not _MISSING:
+                    insort(postings.setdefault(new_value, []), key)
+
+    def query(self, filters: Dict[str, Hashable], cursor: Optional[Hashable] = None,
+              limit: int = 50) -> Tuple[List[Hashable], Optional[Hashable]]:
+        """
+        Ids que atendem a todos os filtros (igualdade), em ordem crescente,
+        depois do cursor. Retorna (ids da página, próximo cursor ou None)
+        """
+        for name in filters:
+            if name not in self.fields:
+                raise ValueError(f"Campo {name} não indexado")
+
+        with self._lock:
+            candidates = [self._postings[name].get(value, []) for name, value in filters.items()]
+            if not candidates:
+                candidates = [self._ids]
+            # Percorre a lista mais curta e confere as demais por bisect
+            candidates.sort(key=len)
+            driver, others = candidates[0], candidates[1:]
+
+            page = []
+            i = bisect_right(driver, cursor) if cursor is not None else 0
+            while i < len(driver) and len(page) <= limit:
+                key = driver[i]
+                if all(_contains(keys, key) for keys in others):
+                    page.append(key)
+                i += 1
+
+        if len(page) > limit:
+            return page[:limit], page[limit - 1]
+        return page, None
+
+    def count(self, name: str, value: Hashable) -> int:
+        with self._lock:
+            return len(self._postings[name].get(value, ()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Total indexado e número de valores distintos por campo"""
+        with self._lock:
+            return {
+                'ids': len(self._ids),
+                'fields': {name: len(postings) for name, postings in self._postings.items()}
+            }
@@ -0,0 +1,62 @@
+"""
+Codecs do ESB no lado do serviço (Flask)
+========================================
+install_codecs(app) faz o serviço entender os corpos que o ESB envia no
+codec negociado (msgpack e compacto, além de json):
+- request.json / request.get_json() decodificam pelo Content-Type (o
+  compacto usa o schema do cabeçalho X-ESB-Schema)
+- jsonify responde em msgpack quando a requisição aceita msgpack
+  (Accept do ESB); clientes comuns continuam recebendo json
+O heartbeat anuncia available_codecs() para o registro do ESB negociar.
+"""
+
+from flask import Flask, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from flask.wrappers import Request
+from werkzeug.exceptions import BadRequest
+
+from esb.codec import (CODECS, JSON, JSON_TYPE, MSGPACK, MSGPACK_TYPE, SCHEMA_HEADER,
+                       CodecError, codec_for_content_type, schema_for)
+
+_MISSING = object()
+
+
+class CodecRequest(Request):
+    """get_json (e request.json) também para msgpack e o formato compacto"""
+
+    _codec_body = _MISSING
+
+    def get_json(self, force: bool = False, silent: bool = False, cache: bool = True):
+        codec = codec_for_content_type(self.headers.get('Content-Type'))
+        if codec is None or codec.name == JSON:
+            return super().get_json(force=force, silent=silent, cache=cache)
+        if self._codec_body is not _MISSING:
+            return self._codec_body
+        try:
+            body = codec.decode(self.get_data(cache=True),
+                                schema_for(self.headers.get(SCHEMA_HEADER)))
+        except CodecError as exc:
+            if silent:
+                return None
+            raise BadRequest(f"Corpo {codec.name} inválido: {exc}")
+        if cache:
+            self._codec_body = body
+        return body
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """jsonify em msgpack quando o chamador (o ESB) prefere msgpack"""
+
+    def response(self, *args, **kwargs):
+        if MSGPACK in CODECS and has_request_context() and \
+                request.accept_mimetypes.best_match((JSON_TYPE, MSGPACK_TYPE)) == MSGPACK_TYPE:
+            payload = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(CODECS[MSGPACK].encode(payload),
+                                            mimetype=MSGPACK_TYPE)
+        return super().response(*args, **kwargs)
+
+
+def install_codecs(app: Flask) -> Flask:
+    app.request_class = CodecRequest
+    app.json = CodecJSONProvider(app)
+    return app